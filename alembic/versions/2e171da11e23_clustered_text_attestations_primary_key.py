@@ -0,0 +1,59 @@
+"""Use (wordform_id, document_id) as primary key of text_attestations
+
+Revision ID: 2e171da11e23
+Revises: dc2c23228be4
+Create Date: 2026-10-19 11:24:05.902716
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2e171da11e23'
+down_revision = 'dc2c23228be4'
+branch_labels = None
+depends_on = None
+
+
+def _partitioned():
+    result = op.get_bind().execute("""
+SELECT COUNT(*) FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'text_attestations' AND PARTITION_NAME IS NOT NULL
+    """)
+    return result.scalar() > 0
+
+
+def _single_column_indexes(column):
+    """Names of the secondary indexes on only `column`."""
+    result = op.get_bind().execute("""
+SELECT INDEX_NAME FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'text_attestations' AND INDEX_NAME != 'PRIMARY'
+GROUP BY INDEX_NAME
+HAVING COUNT(*) = 1 AND MAX(COLUMN_NAME) = %s
+    """, (column,))
+    return [row[0] for row in result]
+
+
+def upgrade():
+    # the rows are clustered by wordform; in a partitioned table, the primary
+    # key must contain the partitioning column
+    primary_key = ['wordform_id', 'document_id'] + (['corpus_id'] if _partitioned() else [])
+    op.execute('ALTER TABLE text_attestations '
+               'MODIFY wordform_id BIGINT NOT NULL, MODIFY document_id BIGINT NOT NULL, '
+               'DROP PRIMARY KEY, DROP COLUMN attestation_id, '
+               f'ADD PRIMARY KEY ({", ".join(primary_key)})')
+    # the primary key makes the index on wordform_id (of the foreign key) redundant
+    for name in _single_column_indexes('wordform_id'):
+        op.drop_index(name, 'text_attestations')
+    if not _single_column_indexes('document_id'):
+        op.create_index('ix_text_attestations_document_id', 'text_attestations', ['document_id'])
+
+
+def downgrade():
+    primary_key = ['attestation_id'] + (['corpus_id'] if _partitioned() else [])
+    op.execute('ALTER TABLE text_attestations '
+               'DROP PRIMARY KEY, '
+               'ADD COLUMN attestation_id BIGINT NOT NULL AUTO_INCREMENT FIRST, '
+               f'ADD PRIMARY KEY ({", ".join(primary_key)}), '
+               'ADD INDEX ix_text_attestations_wordform_id (wordform_id), '
+               'MODIFY wordform_id BIGINT NULL, MODIFY document_id BIGINT NULL')
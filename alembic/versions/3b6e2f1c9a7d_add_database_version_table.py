@@ -0,0 +1,28 @@
+"""Add database_version table
+
+Revision ID: 3b6e2f1c9a7d
+Revises: fecf6a206bfc
+Create Date: 2020-01-20 10:12:44.139201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b6e2f1c9a7d'
+down_revision = 'fecf6a206bfc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('database_version',
+                    sa.Column('database_version_id', sa.BigInteger(), nullable=False),
+                    sa.Column('generation', sa.BigInteger(), nullable=False),
+                    sa.Column('updated_at', sa.DateTime(), nullable=True),
+                    sa.PrimaryKeyConstraint('database_version_id'))
+
+
+def downgrade():
+    op.drop_table('database_version')
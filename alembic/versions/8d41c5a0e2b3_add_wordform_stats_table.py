@@ -0,0 +1,32 @@
+"""Add wordform_stats table
+
+Revision ID: 8d41c5a0e2b3
+Revises: 3b6e2f1c9a7d
+Create Date: 2020-01-24 14:31:08.517923
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41c5a0e2b3'
+down_revision = '3b6e2f1c9a7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('wordform_stats',
+                    sa.Column('wordform_id', sa.BigInteger(), nullable=False),
+                    sa.Column('num_corpora', sa.Integer(), nullable=False),
+                    sa.Column('num_lexica', sa.Integer(), nullable=False),
+                    sa.Column('min_year', sa.Integer(), nullable=True),
+                    sa.Column('max_year', sa.Integer(), nullable=True),
+                    sa.Column('num_paradigms', sa.Integer(), nullable=False),
+                    sa.Column('frequency', sa.BigInteger(), nullable=False),
+                    sa.PrimaryKeyConstraint('wordform_id'))
+
+
+def downgrade():
+    op.drop_table('wordform_stats')
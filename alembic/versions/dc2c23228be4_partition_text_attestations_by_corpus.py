@@ -0,0 +1,53 @@
+"""Partition text_attestations by corpus
+
+Revision ID: dc2c23228be4
+Revises: 8d41c5a0e2b3
+Create Date: 2026-10-19 10:02:31.418211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dc2c23228be4'
+down_revision = '8d41c5a0e2b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('text_attestations', sa.Column('corpus_id', sa.BigInteger(), nullable=True))
+
+    # fill in the corpus ids (0 for documents without a corpus)
+    op.execute("""
+UPDATE text_attestations ta JOIN corpusId_x_documentId cIxdI ON ta.document_id = cIxdI.document_id
+SET ta.corpus_id = cIxdI.corpus_id
+WHERE ta.corpus_id IS NULL
+    """)
+    op.execute('UPDATE text_attestations SET corpus_id = 0 WHERE corpus_id IS NULL')
+
+    # partitioned tables can't have foreign keys (their indexes are kept), and
+    # the primary key must contain the partitioning column
+    bind = op.get_bind()
+    foreign_keys = bind.execute("""
+SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'text_attestations' AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+    """).fetchall()
+    for (name,) in foreign_keys:
+        op.execute(f'ALTER TABLE text_attestations DROP FOREIGN KEY `{name}`')
+    op.execute('ALTER TABLE text_attestations MODIFY corpus_id BIGINT NOT NULL, '
+               'DROP PRIMARY KEY, ADD PRIMARY KEY (attestation_id, corpus_id)')
+
+    # one LIST partition per corpus
+    corpus_ids = [0] + [row[0] for row in bind.execute('SELECT corpus_id FROM corpora ORDER BY corpus_id')]
+    partitions = ', '.join(f'PARTITION p{corpus_id} VALUES IN ({corpus_id})' for corpus_id in corpus_ids)
+    op.execute(f'ALTER TABLE text_attestations PARTITION BY LIST (corpus_id) ({partitions})')
+
+
+def downgrade():
+    op.execute('ALTER TABLE text_attestations REMOVE PARTITIONING')
+    op.execute('ALTER TABLE text_attestations DROP PRIMARY KEY, ADD PRIMARY KEY (attestation_id)')
+    op.drop_column('text_attestations', 'corpus_id')
+    op.create_foreign_key(None, 'text_attestations', 'wordforms', ['wordform_id'], ['wordform_id'])
+    op.create_foreign_key(None, 'text_attestations', 'documents', ['document_id'], ['document_id'])
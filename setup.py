@@ -50,7 +50,7 @@ setup(
         "Flask-SQLAlchemy-Session",
         "sklearn",
         "python-dotenv",
-        "flask",
+        "flask>=2.2",
         "click",
         "gunicorn",
         "bokeh"
@@ -73,9 +73,11 @@ setup(
         'cryptography',
         'pylint>=2.4',
         'nltk',
+        'faker',
     ],
     extras_require={
         'dev': ['prospector[with_pyroma]', 'yapf', 'isort'],
-        'benchmark': ['pyfakefs'],
+        'benchmark': ['pyfakefs', 'faker'],
+        'snapshot': ['pyarrow', 'duckdb', 'duckdb_engine'],
     }
 )
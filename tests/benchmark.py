@@ -4,6 +4,7 @@ import logging
 
 import numpy as np
 import pandas as pd
+import scipy.sparse
 
 from faker import Faker
 
@@ -14,6 +15,30 @@ from ticclat.dbutils import add_lexicon, add_lexicon_with_links
 LOGGER = logging.getLogger(__name__)
 
 
+def _rng(rng=None):
+    """Return `rng`, or a random generator seeded from the global NumPy random state."""
+    if rng is None:
+        rng = np.random.default_rng(np.random.randint(2**32))
+    return rng
+
+
+def random_vocabulary(num_wordforms, length_min=2, length_max=15,
+                      alphabet='abcdefghijklmnopqrstuvwxyz', rng=None):
+    """Return a sorted list of `num_wordforms` unique random (ASCII) wordforms."""
+    rng = _rng(rng)
+    letters = np.frombuffer(alphabet.encode('ascii'), dtype=np.uint8)
+    vocabulary = np.array([], dtype=f'S{length_max}')
+    while len(vocabulary) < num_wordforms:
+        num = num_wordforms - len(vocabulary)
+        lengths = rng.integers(length_min, length_max + 1, num)
+        chars = letters[rng.integers(0, len(letters), (num, length_max))]
+        # trailing zero bytes are dropped by the bytes dtype
+        chars[np.arange(length_max) >= lengths[:, None]] = 0
+        words = np.ascontiguousarray(chars).view(f'S{length_max}').ravel()
+        vocabulary = np.unique(np.concatenate([vocabulary, words]))
+    return vocabulary.astype(str).tolist()
+
+
 def random_corpus(num_documents, num_tokens_min, num_tokens_max, vocabulary):
     """Generator that yields random bags of words (documents)."""
     fake = Faker()
@@ -64,6 +89,109 @@ def ingest_corpora(session, num_corpora, num_documents_min, num_documents_max,
                         corpus_name=name, document_metadata=metadata)
 
 
+class FixedVocabulary:
+    """The vocabulary of a generated term-document matrix.
+
+    Stands in for the fitted scikit-learn vectorizers returned by
+    `ticclat.tokenize` (`add_corpus_core` only uses `vocabulary_`).
+    """
+
+    def __init__(self, terms):
+        self.vocabulary_ = {term: i for i, term in enumerate(terms)}
+
+
+def zipf_probabilities(num_terms, exponent=1.07):
+    """Return the probabilities of the terms of rank 1 to `num_terms` according to Zipf's law."""
+    weights = np.arange(1, num_terms + 1, dtype=np.float64) ** -exponent
+    return weights / weights.sum()
+
+
+def zipf_document_lengths(num_documents, num_tokens_min, num_tokens_max, exponent=2.0, rng=None):
+    """Return `num_documents` document lengths from a Zipf distribution starting at `num_tokens_min`."""
+    rng = _rng(rng)
+    factors = np.minimum(rng.zipf(exponent, num_documents), num_tokens_max // num_tokens_min + 1)
+    return np.minimum(num_tokens_min * factors, num_tokens_max)
+
+
+def zipf_terms_documents_matrix(num_documents, vocabulary, num_tokens_min, num_tokens_max,
+                                exponent=1.07, rng=None, chunk_size=10**7):
+    """Return a random term-document matrix with Zipf distributed term frequencies.
+
+    The terms are ranked by length (shortest first), so the most frequent
+    terms are short, as in natural language. The tokens are sampled in chunks
+    of about `chunk_size` tokens, so corpora of 10^8 tokens and more can be
+    generated without much memory.
+
+    Returns:
+        corpus: a sparse (CSR) terms documents matrix (documents x terms);
+            terms that were not sampled are left out
+        vocabulary: a `FixedVocabulary` of the terms in the matrix
+    """
+    rng = _rng(rng)
+    terms = np.array(sorted(vocabulary, key=len))
+    cdf = np.cumsum(zipf_probabilities(len(terms), exponent))
+    lengths = zipf_document_lengths(num_documents, num_tokens_min, num_tokens_max, rng=rng)
+    cumulative_lengths = np.cumsum(lengths)
+
+    chunks = []
+    start = 0
+    while start < num_documents:
+        offset = cumulative_lengths[start - 1] if start > 0 else 0
+        end = max(start + 1, int(np.searchsorted(cumulative_lengths, offset + chunk_size, side='right')))
+        chunk_lengths = lengths[start:end]
+        term_ids = np.minimum(np.searchsorted(cdf, rng.random(chunk_lengths.sum()), side='right'),
+                              len(terms) - 1)
+        document_ids = np.repeat(np.arange(len(chunk_lengths)), chunk_lengths)
+        # duplicate (document, term) entries are summed
+        chunks.append(scipy.sparse.csr_matrix(
+            (np.ones(len(term_ids), dtype=np.int64), (document_ids, term_ids)),
+            shape=(len(chunk_lengths), len(terms))))
+        start = end
+
+    corpus = scipy.sparse.vstack(chunks, format='csr')
+    used = np.unique(corpus.indices)
+    return corpus[:, used], FixedVocabulary(terms[used].tolist())
+
+
+def zipf_corpus_metadata(num_documents, language, year_min, year_max, growth=0.02,
+                         range_fraction=0.2, rng=None):
+    """Return a mock corpus metadata dataframe with realistic years.
+
+    The number of documents per year grows exponentially (by `growth` per
+    year). For `range_fraction` of the documents, only a range of years
+    (``year_from``-``year_to``) is known.
+    """
+    rng = _rng(rng)
+    years = np.arange(year_min, year_max + 1)
+    weights = np.exp(growth * (years - year_min))
+    pub_year = rng.choice(years, num_documents, p=weights / weights.sum())
+    has_range = rng.random(num_documents) < range_fraction
+    year_from = np.where(has_range, pub_year - rng.integers(0, 10, num_documents), pub_year)
+    year_to = np.where(has_range, pub_year + rng.integers(0, 10, num_documents), pub_year)
+
+    return pd.DataFrame({'language': language,
+                         'pub_year': pub_year,
+                         'year_from': np.maximum(year_from, year_min),
+                         'year_to': np.minimum(year_to, year_max)})
+
+
+def generate_zipf_corpora(num_corpora, num_documents_min, num_documents_max,
+                          language, year_min, year_max, num_tokens_min,
+                          num_tokens_max, vocabulary, exponent=1.07, rng=None):
+    """Generator that yields Zipfian corpus term-documents matrices.
+
+    A fast alternative to `generate_corpora` (with the same output) that
+    samples term ids with NumPy instead of generating word lists.
+    """
+    rng = _rng(rng)
+    for _ in range(num_corpora):
+        num_documents = int(rng.integers(num_documents_min, num_documents_max + 1))
+        metadata = zipf_corpus_metadata(num_documents, language, year_min, year_max, rng=rng)
+        corpus, vectorizer = zipf_terms_documents_matrix(num_documents, vocabulary, num_tokens_min,
+                                                         num_tokens_max, exponent=exponent, rng=rng)
+        yield corpus, vectorizer, metadata
+
+
 def generate_lexica(num_lexica, num_wf_min, num_wf_max, vocabulary):
     """Generator that yields randomized lexicon wordform lists."""
     fake = Faker()
@@ -104,6 +232,66 @@ def generate_linked_lexica(num_lexica, num_wf_min, num_wf_max, vocabulary):
         yield wfs
 
 
+def write_paradigms_file(path, vocabulary, paradigm_size_min=2, paradigm_size_max=8):
+    """Write randomized morphological paradigms of `vocabulary` in the format of
+    `dbutils.add_morphological_paradigms`.
+
+    Consecutive wordforms of a shuffled vocabulary form a paradigm; the first
+    one is the lemma (``HCL``), the others are variants (``HCM``).
+
+    Returns the number of paradigm codes written.
+    """
+    wordforms = np.random.permutation(vocabulary)
+    i = 0
+    paradigm = 0
+    with open(path, 'w') as out_file:
+        out_file.write('\t\t\t\t\t\t\t\t\n')  # the first line is skipped
+        while i < len(wordforms):
+            paradigm += 1
+            # the code components have 4 digits
+            Z, Y, X = 1, paradigm // 9999 + 1, paradigm % 9999 + 1
+            size = np.random.randint(paradigm_size_min, paradigm_size_max + 1)
+            for W, wordform in enumerate(wordforms[i:i + size], start=1):
+                word_type = 'HCL' if W == 1 else 'HCM'
+                code = f'Z{Z:04d}Y{Y:04d}X{X:04d}W{W:08d}V0001_{word_type}001'
+                out_file.write(f'{wordform}\t\t{code}\t\t\t\t\t\t\n')
+            i += size
+    return len(wordforms)
+
+
+# common OCR confusions: (correct characters, misrecognized characters)
+OCR_CONFUSIONS = [('m', 'rn'), ('rn', 'm'), ('e', 'c'), ('c', 'e'), ('i', 'l'), ('l', 'i'),
+                  ('n', 'u'), ('u', 'n'), ('h', 'b'), ('b', 'h'), ('s', 'f'), ('f', 's'),
+                  ('u', 'ii'), ('v', 'y'), ('o', 'c'), ('a', 'o'), ('t', 'l'), ('d', 'cl')]
+
+
+def ocr_variant(wordform, rng=None):
+    """Return `wordform` with one random OCR confusion (or a random substituted character)."""
+    rng = _rng(rng)
+    confusions = [(correct, ocr) for correct, ocr in OCR_CONFUSIONS if correct in wordform]
+    if not confusions:
+        position = rng.integers(len(wordform))
+        return wordform[:position] + chr(rng.integers(ord('a'), ord('z') + 1)) + wordform[position + 1:]
+    correct, ocr = confusions[rng.integers(len(confusions))]
+    positions = [i for i in range(len(wordform)) if wordform.startswith(correct, i)]
+    position = positions[rng.integers(len(positions))]
+    return wordform[:position] + ocr + wordform[position + len(correct):]
+
+
+def ocr_variant_pairs(vocabulary, num_pairs, exponent=1.07, rng=None):
+    """Return a dataframe of OCR variants (column 'from') of wordforms in `vocabulary` (column 'to').
+
+    At most `num_pairs` unique pairs are returned. The wordforms are drawn with the Zipf probabilities used by
+    `zipf_terms_documents_matrix`, so frequent wordforms get more variants.
+    """
+    rng = _rng(rng)
+    terms = np.array(sorted(vocabulary, key=len))
+    correct = rng.choice(terms, num_pairs, p=zipf_probabilities(len(terms), exponent))
+    pairs = pd.DataFrame({'from': [ocr_variant(wordform, rng) for wordform in correct],
+                          'to': correct})
+    return pairs[pairs['from'] != pairs['to']].drop_duplicates().reset_index(drop=True)
+
+
 def ingest_linked_lexica(session, num_lexica, num_wf_min, num_wf_max,
                          vocabulary):
     """Run multiple (random built) linked lexicon ingestions."""
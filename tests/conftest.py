@@ -3,8 +3,11 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
 from tests.helpers import load_test_db_data
+from ticclat.flask_app.cache import query_cache
 from ticclat.flask_app.flask_app import create_app
-from ticclat.ticclat_schema import Base
+from ticclat.flask_app.metrics import metrics
+from ticclat.flask_app.resolver import wordform_resolver
+from ticclat.ticclat_schema import Base, DatabaseVersion
 import pytest
 
 
@@ -36,6 +39,11 @@ def dbsession(engine, tables):
     # use the connection with the already started transaction
     session = Session(bind=connection)
 
+    # cached query results of previous tests are not valid for this test
+    query_cache.clear()
+    wordform_resolver.clear()
+    metrics.clear()
+
     yield session
 
     session.close()
@@ -45,6 +53,34 @@ def dbsession(engine, tables):
     connection.close()
 
 
+@pytest.fixture
+def sqlite_tables():
+    """Tables of `sqlite_session` (override this fixture in a module to use other tables)."""
+    return [DatabaseVersion.__table__]
+
+
+@pytest.fixture
+def sqlite_rows():
+    """Rows added to `sqlite_session` (override this fixture in a module to add test data)."""
+    return []
+
+
+@pytest.fixture
+def sqlite_session(sqlite_tables, sqlite_rows):
+    """Returns a session on an in-memory SQLite database, for tests that don't
+    need MySQL.
+    """
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine, tables=sqlite_tables)
+    session = Session(bind=engine)
+    session.add_all(sqlite_rows)
+    session.flush()
+
+    yield session
+
+    session.close()
+
+
 @pytest.yield_fixture
 def test_data(dbsession):
     # load test data
@@ -0,0 +1,273 @@
+"""Load test the Flask app with concurrent HTTP requests.
+
+The load test sends a weighted mix of requests (see `DEFAULT_MIX`) to a
+running app, from a number of concurrent clients (threads with a persistent
+HTTP connection each). The wordforms in the requests are drawn from the
+``wordform_frequency`` table of the database in ``DATABASE_URL``, weighted by
+frequency. Alternatively, the requests of an access log (in the common or
+combined log format, as written by gunicorn and nginx) are replayed.
+
+It reports the throughput (requests/s), the latency percentiles and the error
+rate, overall and per route::
+
+    $ gunicorn ticclat.flask_app.wsgi:app --bind 127.0.0.1:8000 --workers 4 &
+    $ python -m tests.run_loadtest --url http://127.0.0.1:8000 --concurrency 16 --duration 60
+    $ python -m tests.run_loadtest --url http://127.0.0.1:8000 --access-log access.log
+
+With ``--serve``, the app is started with gunicorn (``--workers``) on the
+address of ``--url`` for the duration of the test.
+"""
+import argparse
+import http.client
+import json
+import logging
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+from tests.run_benchmark import percentiles, sample_wordforms
+from ticclat.dbutils import get_session_maker, session_scope
+
+LOGGER = logging.getLogger(__name__)
+
+# route name: (weight, URL template); the templates are filled in with a wordform sample
+DEFAULT_MIX = {
+    'word': (5, '/word/{wordform}'),
+    'variants': (3, '/variants/{wordform}'),
+    'lexica': (3, '/lexica/{wordform}'),
+    'word_frequency_per_corpus_per_year': (3, '/word_frequency_per_corpus_per_year/{wordform}'),
+    'regexp_search': (1, '/regexp_search/^{prefix}'),
+    'suffixes': (1, '/suffixes/{suffix}'),
+    'network': (1, '/network/{wordform}'),
+}
+
+# the request line in the common/combined log format: "GET /path HTTP/1.1"
+LOG_REQUEST = re.compile(r'"(?P<method>GET|HEAD) (?P<path>\S+) HTTP/[0-9.]+"')
+
+
+def parse_access_log(lines) -> list:
+    """Return the (route name, path) of the GET and HEAD requests in access log `lines`.
+
+    The route name is the first segment of the path.
+    """
+    requests = []
+    for line in lines:
+        match = LOG_REQUEST.search(line)
+        if match:
+            path = match.group('path')
+            requests.append((path.lstrip('/').split('/', 1)[0].split('?', 1)[0] or '/', path))
+    return requests
+
+
+def mixed_requests(num, wordforms, mix=None, rng=None) -> list:
+    """Return `num` (route name, path) pairs from the weighted `mix` of routes."""
+    mix = mix or DEFAULT_MIX
+    rng = rng or np.random.default_rng()
+    names = list(mix)
+    weights = np.array([mix[name][0] for name in names], dtype=float)
+    routes = rng.choice(len(names), size=num, p=weights / weights.sum())
+    samples = rng.choice(len(wordforms), size=num)
+
+    requests = []
+    for route, sample in zip(routes, samples):
+        wordform = wordforms[sample]
+        path = mix[names[route]][1].format(wordform=quote(wordform, safe=''),
+                                           prefix=quote(wordform[:3], safe=''),
+                                           suffix=quote(wordform[-2:], safe=''))
+        requests.append((names[route], path))
+    return requests
+
+
+class LoadTest:
+    """Sends requests from `concurrency` threads and records the status and latency of each."""
+
+    def __init__(self, url, requests, concurrency=8, duration=None, timeout=60):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.requests = requests
+        self.concurrency = concurrency
+        self.duration = duration
+        self.timeout = timeout
+        self.results = []  # (route name, status (0 for connection errors), seconds)
+        self.seconds = 0.0
+        self._next = 0
+        self._lock = threading.Lock()
+        self._deadline = None
+
+    def _next_request(self):
+        with self._lock:
+            if self._deadline is None:
+                # without a duration, every request is sent once
+                if self._next >= len(self.requests):
+                    return None
+            elif time.perf_counter() >= self._deadline:
+                return None
+            request = self.requests[self._next % len(self.requests)]
+            self._next += 1
+            return request
+
+    def _worker(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        results = []
+        while True:
+            request = self._next_request()
+            if request is None:
+                break
+            name, path = request
+            start = time.perf_counter()
+            try:
+                connection.request('GET', self.prefix + path)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = 0
+            results.append((name, status, time.perf_counter() - start))
+        connection.close()
+        with self._lock:
+            self.results.extend(results)
+
+    def run(self):
+        """Send the requests and return the report (see `report`)."""
+        self.results = []
+        self._next = 0
+        start = time.perf_counter()
+        self._deadline = start + self.duration if self.duration else None
+        threads = [threading.Thread(target=self._worker) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.seconds = time.perf_counter() - start
+        return report(self.results, self.seconds)
+
+
+def _summarize(results, seconds) -> dict:
+    statuses = Counter(str(status) for _, status, _ in results)
+    errors = sum(1 for _, status, _ in results if status == 0 or status >= 500)
+    summary = {
+        'requests': len(results),
+        'requests_per_second': len(results) / seconds if seconds else None,
+        'error_rate': errors / len(results) if results else None,
+        'statuses': dict(statuses),
+    }
+    summary.update(percentiles([latency for _, _, latency in results]))
+    return summary
+
+
+def report(results, seconds) -> dict:
+    """Summarize the results of a load test, overall and per route.
+
+    Responses with a status of 500 or higher and connection errors (status 0)
+    count as errors.
+    """
+    per_route = defaultdict(list)
+    for result in results:
+        per_route[result[0]].append(result)
+    return {
+        'seconds': seconds,
+        'total': _summarize(results, seconds),
+        'routes': {name: _summarize(route_results, seconds)
+                   for name, route_results in sorted(per_route.items())},
+    }
+
+
+def sample_wordforms_from_database(num) -> list:
+    """Draw `num` wordforms from ``wordform_frequency`` of the database in ``DATABASE_URL``."""
+    with session_scope(get_session_maker()) as session:
+        return sample_wordforms(session, num)
+
+
+def serve(url, workers):
+    """Start the app with gunicorn on the address of `url`; returns the process once the app responds."""
+    parts = urlsplit(url)
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'ticclat.flask_app.wsgi:app',
+                                '--bind', f'{parts.hostname}:{parts.port or 80}',
+                                '--workers', str(workers), '--timeout', '120'])
+    for _ in range(120):
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=5)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            connection.close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn exited')
+            time.sleep(1)
+    process.terminate()
+    raise RuntimeError(f'The app did not start on {url}')
+
+
+def print_report(result, out=sys.stdout):
+    """Print a table with the results per route."""
+    print(f'{"route":40} {"requests":>9} {"req/s":>8} {"errors":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}',
+          file=out)
+    for name, summary in list(result['routes'].items()) + [('TOTAL', result['total'])]:
+        if not summary['requests']:
+            continue
+        print(f'{name:40} {summary["requests"]:9d} {summary["requests_per_second"]:8.1f} '
+              f'{summary["error_rate"]:7.1%} {summary["p50_ms"]:8.1f} {summary["p95_ms"]:8.1f} '
+              f'{summary["p99_ms"]:8.1f}', file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='base URL of the app')
+    parser.add_argument('--concurrency', type=int, default=8, help='number of concurrent clients (default 8)')
+    parser.add_argument('--duration', type=float,
+                        help='number of seconds to send requests (default: send every request once)')
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='number of requests to generate from the mix (default 1000)')
+    parser.add_argument('--samples', type=int, default=1000,
+                        help='number of wordforms to draw from wordform_frequency (default 1000)')
+    parser.add_argument('--mix', type=json.loads,
+                        help='JSON object with the weight per route name of the default mix')
+    parser.add_argument('--access-log', help='replay the requests in this access log instead of the mix')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--serve', action='store_true', help='start the app with gunicorn')
+    parser.add_argument('--workers', type=int, default=4, help='number of gunicorn workers (default 4)')
+    parser.add_argument('--output', help='write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)-8s %(name)s\t%(message)s')
+
+    if args.access_log:
+        with open(args.access_log) as in_file:
+            requests = parse_access_log(in_file)
+    else:
+        np.random.seed(args.seed)
+        mix = DEFAULT_MIX
+        if args.mix:
+            mix = {name: (weight, DEFAULT_MIX[name][1]) for name, weight in args.mix.items()}
+        wordforms = sample_wordforms_from_database(args.samples)
+        requests = mixed_requests(args.requests, wordforms, mix, np.random.default_rng(args.seed))
+    LOGGER.info('Sending %s requests', len(requests))
+
+    process = serve(args.url, args.workers) if args.serve else None
+    try:
+        result = LoadTest(args.url, requests, args.concurrency, args.duration).run()
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    result['concurrency'] = args.concurrency
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w') as out_file:
+            json.dump(result, out_file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from ticclat.flask_app.autocomplete import AutocompleteIndex, \
+    write_autocomplete_index
+
+
+def make_index(tmpdir):
+    df = pd.DataFrame({'wordform': ['iedereen', 'aandacht', 'iederene',
+                                    'ieder', 'banaan', 'één', 'eed'],
+                       'frequency': [4, 3, None, 10, 231, 2, 4]})
+    write_autocomplete_index(df, str(tmpdir))
+
+    index = AutocompleteIndex()
+    assert index.load(str(tmpdir))
+
+    return index
+
+
+def test_autocomplete_index_complete(tmpdir):
+    index = make_index(tmpdir)
+
+    assert len(index) == 7
+    assert index.complete('ied') == [{'wordform': 'ieder', 'frequency': 10},
+                                     {'wordform': 'iedereen', 'frequency': 4},
+                                     {'wordform': 'iederene', 'frequency': 0}]
+
+
+def test_autocomplete_index_limit(tmpdir):
+    index = make_index(tmpdir)
+
+    assert index.complete('ied', limit=1) == [{'wordform': 'ieder', 'frequency': 10}]
+    assert index.complete('', limit=2) == [{'wordform': 'banaan', 'frequency': 231},
+                                           {'wordform': 'ieder', 'frequency': 10}]
+
+
+def test_autocomplete_index_non_ascii(tmpdir):
+    index = make_index(tmpdir)
+
+    assert index.complete('é') == [{'wordform': 'één', 'frequency': 2}]
+    assert index.complete('e') == [{'wordform': 'eed', 'frequency': 4}]
+
+
+def test_autocomplete_index_no_match(tmpdir):
+    index = make_index(tmpdir)
+
+    assert index.complete('x') == []
+    assert index.complete('iedereenx') == []
+
+
+def test_autocomplete_index_not_loaded(monkeypatch):
+    monkeypatch.delenv('AUTOCOMPLETE_INDEX', raising=False)
+    index = AutocompleteIndex()
+
+    assert not index.load()
+    assert not index.loaded
@@ -0,0 +1,71 @@
+import logging
+
+import numpy as np
+import pytest
+
+from tests.benchmark import random_vocabulary, zipf_terms_documents_matrix, ocr_variant_pairs
+from tests.run_benchmark import PhaseTimer, compare, throughput
+
+
+def test_phase_timer():
+    logger = logging.getLogger('ticclat.dbutils')
+    with PhaseTimer() as timer:
+        logger.info('Adding %s wordforms.', 10)
+        logger.info('Adding %s wordforms.', 20)
+        logger.info('Done.')
+
+    phases = timer.phases()
+    assert set(phases) == {'(start)', 'Adding %s wordforms.', 'Done.'}
+    assert sum(phases.values()) == pytest.approx(timer.seconds)
+    assert not logger.handlers
+
+
+def test_throughput():
+    runs = [{'rows': 10, 'seconds': 1.0, 'phases': {'a': 0.5, 'b': 0.5}},
+            {'rows': 30, 'seconds': 1.0, 'phases': {'a': 1.0}}]
+
+    result = throughput(runs)
+
+    assert result['rows_per_second'] == 20
+    assert result['phases']['a'] == {'seconds': 1.5, 'rows_per_second': 40 / 1.5}
+
+
+def test_compare():
+    baseline = {'ingestion': {'add_lexicon': {'rows_per_second': 1000.0}},
+                'queries': {'get_lexica_data': {'p50_ms': 10.0, 'p95_ms': 20.0, 'mean_ms': 10.0}}}
+    results = {'ingestion': {'add_lexicon': {'rows_per_second': 700.0}},
+               'queries': {'get_lexica_data': {'p50_ms': 11.0, 'p95_ms': 30.0, 'mean_ms': 100.0}},
+               'routes': {'word': {'p50_ms': 5.0}}}
+
+    regressions = compare(results, baseline, tolerance=0.2)
+
+    assert [r[0] for r in regressions] == ['ingestion.add_lexicon.rows_per_second',
+                                           'queries.get_lexica_data.p95_ms']
+
+
+def test_zipf_terms_documents_matrix():
+    rng = np.random.default_rng(1)
+    vocabulary = random_vocabulary(1000, rng=rng)
+
+    corpus, vectorizer = zipf_terms_documents_matrix(50, vocabulary, 100, 1000, rng=rng, chunk_size=5000)
+
+    assert corpus.shape == (50, len(vectorizer.vocabulary_))
+    assert set(vectorizer.vocabulary_) <= set(vocabulary)
+    # every term occurs and every document has at least num_tokens_min tokens
+    assert (np.asarray(corpus.sum(axis=0)) > 0).all()
+    assert (np.asarray(corpus.sum(axis=1)) >= 100).all()
+    # the shortest term is the most frequent one
+    counts = np.asarray(corpus.sum(axis=0)).ravel()
+    terms = {i: term for term, i in vectorizer.vocabulary_.items()}
+    assert len(terms[counts.argmax()]) == 2
+
+
+def test_ocr_variant_pairs():
+    rng = np.random.default_rng(1)
+    vocabulary = random_vocabulary(100, rng=rng)
+
+    pairs = ocr_variant_pairs(vocabulary, 50, rng=rng)
+
+    assert 0 < len(pairs) <= 50
+    assert set(pairs['to']) <= set(vocabulary)
+    assert (pairs['from'] != pairs['to']).all()
@@ -0,0 +1,161 @@
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from ticclat.flask_app.cache import QueryCache, FileCacheBackend, \
+    get_database_version
+from ticclat.ticclat_schema import DatabaseVersion
+
+
+def make_counter():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    return compute, calls
+
+
+def test_database_version_empty(sqlite_session):
+    assert get_database_version(sqlite_session) == (0, None)
+
+
+def test_get_or_compute_hit(sqlite_session):
+    cache = QueryCache()
+    cache.setup(max_size=10, ttl=60, check_interval=0)
+    compute, calls = make_counter()
+
+    assert cache.get_or_compute('key', compute, sqlite_session) == 1
+    assert cache.get_or_compute('key', compute, sqlite_session) == 1
+
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_generation_invalidates(sqlite_session):
+    cache = QueryCache()
+    cache.setup(max_size=10, ttl=60, check_interval=0)
+    compute, calls = make_counter()
+
+    cache.get_or_compute('key', compute, sqlite_session)
+
+    sqlite_session.add(DatabaseVersion(database_version_id=1, generation=1))
+    sqlite_session.flush()
+
+    assert cache.get_or_compute('key', compute, sqlite_session) == 2
+    assert cache.stats()['generations'] == {'sqlite://': 1}
+    assert len(calls) == 2
+
+
+def test_lru_eviction(sqlite_session):
+    cache = QueryCache()
+    cache.setup(max_size=2, ttl=60, check_interval=0)
+
+    for key in ('a', 'b', 'a', 'c'):
+        cache.get_or_compute(key, lambda k=key: k, sqlite_session)
+
+    # 'b' was the least recently used entry
+    compute, calls = make_counter()
+    cache.get_or_compute('a', compute, sqlite_session)
+    assert calls == []
+    cache.get_or_compute('b', compute, sqlite_session)
+    assert calls == [1]
+
+
+def test_disabled(sqlite_session):
+    cache = QueryCache()
+    cache.setup(max_size=0)
+    compute, calls = make_counter()
+
+    cache.get_or_compute('key', compute, sqlite_session)
+    cache.get_or_compute('key', compute, sqlite_session)
+
+    assert len(calls) == 2
+
+
+def test_memoize(sqlite_session):
+    cache = QueryCache()
+    cache.setup(max_size=10, ttl=60, check_interval=0)
+    calls = []
+
+    @cache.memoize
+    def query(session, word, limit=1):
+        calls.append(word)
+        return word * limit
+
+    assert query(sqlite_session, 'a', limit=2) == 'aa'
+    assert query(sqlite_session, 'a', limit=2) == 'aa'
+    assert query(sqlite_session, 'b') == 'b'
+    assert calls == ['a', 'b']
+
+
+def test_cached_none(sqlite_session):
+    cache = QueryCache()
+    cache.setup(max_size=10, ttl=60, check_interval=0)
+    calls = []
+
+    assert cache.get_or_compute('key', lambda: calls.append(1), sqlite_session) is None
+    assert cache.get_or_compute('key', lambda: calls.append(1), sqlite_session) is None
+
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.get('missing', sqlite_session) is None
+
+
+def test_memoize_returns_copies(sqlite_session):
+    cache = QueryCache()
+    cache.setup(max_size=10, ttl=60, check_interval=0)
+
+    @cache.memoize
+    def query(session):
+        return {'words': ['a']}
+
+    query(sqlite_session)['words'].append('b')
+
+    assert query(sqlite_session) == {'words': ['a']}
+
+
+def test_memoize_per_database(tmpdir):
+    sessions = []
+    for name in ('live', 'snapshot'):
+        engine = create_engine(f'sqlite:///{tmpdir / name}.db')
+        DatabaseVersion.__table__.create(engine)
+        sessions.append(Session(bind=engine))
+    live_session, snapshot_session = sessions
+    snapshot_session.add(DatabaseVersion(database_version_id=1, generation=1))
+    snapshot_session.flush()
+
+    cache = QueryCache()
+    cache.setup(max_size=10, ttl=60, check_interval=0)
+
+    @cache.memoize
+    def query(session):
+        return str(session.get_bind().url)
+
+    for _ in range(2):
+        assert query(live_session).endswith('live.db')
+        assert query(snapshot_session).endswith('snapshot.db')
+
+    assert cache.stats()['hits'] == 2
+    assert sorted(cache.stats()['generations'].values()) == [0, 1]
+    for session in sessions:
+        session.close()
+
+
+def test_file_backend_shared(sqlite_session, tmpdir):
+    backend = FileCacheBackend(str(tmpdir))
+    cache_1 = QueryCache()
+    cache_1.setup(max_size=10, ttl=60, check_interval=0, backend=backend)
+    cache_2 = QueryCache()
+    cache_2.setup(max_size=10, ttl=60, check_interval=0, backend=backend)
+    compute, calls = make_counter()
+
+    cache_1.get_or_compute(('key', 1), compute, sqlite_session)
+    assert cache_2.get_or_compute(('key', 1), compute, sqlite_session) == 1
+    assert len(calls) == 1
+    assert cache_2.stats()['hits'] == 1
+
+    backend.clear()
+    assert backend.get('anything', ttl=60) is None
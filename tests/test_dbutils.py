@@ -9,13 +9,17 @@ import pandas as pd
 from sqlalchemy import and_
 
 from ticclat.ticclat_schema import Wordform, Lexicon, Anahash, \
-    WordformLinkSource, MorphologicalParadigm
-from ticclat.utils import read_json_lines, read_ticcl_variants_file
+    WordformLinkSource, MorphologicalParadigm, WordformStats, WordformFrequencies, \
+    TextAttestation
+from ticclat.utils import read_json_lines, read_ticcl_variants_file, WordformMapping
 from ticclat.dbutils import bulk_add_wordforms, add_lexicon, \
     get_word_frequency_df, bulk_add_anahashes, \
     connect_anahashes_to_wordforms, update_anahashes, get_wf_mapping, \
     add_lexicon_with_links, write_wf_links_data, add_morphological_paradigms, \
-    empty_table, add_ticcl_variants
+    empty_table, add_ticcl_variants, create_wordform_stats_table, \
+    create_wf_frequencies_table, shadow_table, partition_text_attestations, \
+    drop_corpus_attestations, get_anahashes, iterate_wordforms_without_anahash
+from ticclat.sacoreutils import text_attestations_partitions, add_corpus_partition
 
 from . import data_dir
 
@@ -239,6 +243,38 @@ def test_connect_anahashes_to_wordforms_empty(dbsession):
     assert [wf.anahash.anahash for wf in wrdfrms] == list(a['anahash'])
 
 
+def test_get_anahashes(dbsession):
+    a = pd.DataFrame({'wordform': ['wf1', 'wf2', 'wf3'],
+                      'anahash': [20, 10, 20]}).set_index('wordform')
+
+    bulk_add_anahashes(dbsession, a)
+    ah_ids = {ah.anahash: ah.anahash_id for ah in dbsession.query(Anahash).all()}
+
+    pairs = get_anahashes(dbsession, a, WordformMapping(['wf1', 'wf2', 'wf3'], [1, 2, 3]))
+
+    assert list(pairs['wordform_id']) == [1, 2, 3]
+    assert list(pairs['anahash_id']) == [ah_ids[20], ah_ids[10], ah_ids[20]]
+
+    with pytest.raises(KeyError):
+        get_anahashes(dbsession, a.replace(10, 30), {'wf1': 1, 'wf2': 2, 'wf3': 3})
+
+
+def test_iterate_wordforms_without_anahash(dbsession):
+    wfs = pd.DataFrame()
+    wfs['wordform'] = ['wf1', 'wf2', 'wf3', 'wf4', 'wf5']
+
+    bulk_add_wordforms(dbsession, wfs)
+
+    a = pd.DataFrame({'wordform': ['wf2'], 'anahash': [1]}).set_index('wordform')
+    bulk_add_anahashes(dbsession, a)
+    connect_anahashes_to_wordforms(dbsession, a, get_word_frequency_df(dbsession, add_ids=True)['wordform_id'].to_dict())
+
+    chunks = list(iterate_wordforms_without_anahash(dbsession, batch_size=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    assert sorted(sum(chunks, [])) == ['wf1', 'wf3', 'wf4', 'wf5']
+
+
 @pytest.mark.skipif(shutil.which('TICCL_anahash') is not None, reason='Install TICCL before testing this.')
 @pytest.mark.datafiles(os.path.join(data_dir(), 'alphabet'))
 def test_update_anahashes(dbsession, datafiles):
@@ -322,7 +358,7 @@ def test_get_wf_mapping_lexicon(dbsession):
     wf_mapping = get_wf_mapping(dbsession, lexicon=lex)
 
     for w in wfs['wordform']:
-        assert w in wf_mapping.keys()
+        assert w in wf_mapping
 
 
 def test_get_wf_mapping_lexicon_no_id(dbsession):
@@ -353,7 +389,7 @@ def test_get_wf_mapping_lexicon_id(dbsession):
     wf_mapping = get_wf_mapping(dbsession, lexicon_id=lexicon_id)
 
     for w in wfs['wordform']:
-        assert w in wf_mapping.keys()
+        assert w in wf_mapping
 
 
 def test_write_wf_links_data(dbsession, fs):
@@ -541,6 +577,43 @@ def test_ingest_add_morp_pars_with_empty_table(dbsession, datafiles):
     assert n == 3
 
 
+@pytest.mark.datafiles(os.path.join(data_dir(), 'morph_par.tsv'))
+def test_ingest_add_morp_pars_with_shadow_table(dbsession, datafiles):
+    add_morphological_paradigms(dbsession, datafiles.listdir()[0])
+
+    with shadow_table(dbsession, MorphologicalParadigm) as table:
+        add_morphological_paradigms(dbsession, datafiles.listdir()[0], table_object=table)
+        # the live table is still there while the shadow table is loaded
+        assert dbsession.query(MorphologicalParadigm).count() == 3
+
+    n = dbsession.query(MorphologicalParadigm).count()
+    assert n == 3
+
+    tables = dbsession.execute("SHOW TABLES LIKE 'morphological_paradigms%'").fetchall()
+    assert [t[0] for t in tables] == ['morphological_paradigms']
+
+
+def test_shadow_table_validation(dbsession):
+    bulk_add_wordforms(dbsession, pd.DataFrame({'wordform': ['wf1', 'wf2']}))
+    create_wf_frequencies_table(dbsession)
+    assert dbsession.query(WordformFrequencies).count() == 2
+
+    # an empty shadow table does not replace the live table
+    with pytest.raises(ValueError):
+        with shadow_table(dbsession, WordformFrequencies):
+            pass
+
+    assert dbsession.query(WordformFrequencies).count() == 2
+    tables = dbsession.execute("SHOW TABLES LIKE 'wordform_frequency%'").fetchall()
+    assert [t[0] for t in tables] == ['wordform_frequency']
+
+    with pytest.raises(ValueError):
+        with shadow_table(dbsession, WordformFrequencies, expected_rows=3) as table:
+            dbsession.execute(table.insert(), [{'wordform_id': 1, 'wordform': 'wf1', 'frequency': 1}])
+
+    assert dbsession.query(WordformFrequencies).count() == 2
+
+
 # @pytest.mark.datafiles(os.path.join(data_dir(), 'env_no_port'))
 # def test_load_envvars_file_no_port(datafiles):
 #     load_envvars_file(datafiles.listdir()[0])
@@ -601,3 +674,48 @@ def test_add_ticcl_variants(dbsession, datafiles):
         assert not link.wordform_to_correct
 
         assert link.ld == 1
+
+
+def test_create_wordform_stats_table(dbsession, test_data):
+    expected = pd.read_csv(os.path.join(os.path.dirname(__file__), 'db_data', 'wordform_stats.tsv'), sep='\t')
+    dbsession.query(WordformStats).delete()
+
+    create_wordform_stats_table(dbsession)
+
+    result = pd.read_sql('SELECT * FROM wordform_stats ORDER BY wordform_id', dbsession.connection())
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_partition_text_attestations(dbsession, test_data):
+    dbsession.execute(TextAttestation.__table__.update().values(corpus_id=None))
+
+    partition_text_attestations(dbsession)
+
+    assert text_attestations_partitions(dbsession) == ['p0', 'p1', 'p2']
+    # the corpus ids are filled in from corpusId_x_documentId
+    corpus_ids = {ta.document_id: ta.corpus_id for ta in dbsession.query(TextAttestation).all()}
+    assert corpus_ids == {1: 1, 2: 2, 3: 1, 4: 2, 5: 1}
+
+    # partitioning twice does nothing
+    partition_text_attestations(dbsession)
+    add_corpus_partition(dbsession, 3)
+    add_corpus_partition(dbsession, 3)
+    assert text_attestations_partitions(dbsession) == ['p0', 'p1', 'p2', 'p3']
+
+
+@pytest.mark.parametrize('partitioned', [False, True])
+def test_drop_corpus_attestations(dbsession, test_data, partitioned):
+    if partitioned:
+        partition_text_attestations(dbsession)
+
+    drop_corpus_attestations(dbsession, 1)
+
+    assert {ta.corpus_id for ta in dbsession.query(TextAttestation).all()} == {2}
+    assert text_attestations_partitions(dbsession) == (['p0', 'p2'] if partitioned else [])
+
+    # the frequencies of the attestations in corpus 1 are subtracted
+    frequencies = {row.wordform: row.frequency for row in dbsession.query(WordformFrequencies).all()}
+    assert frequencies['aandacht'] == 2
+    assert frequencies['banaan'] == 229
+    assert frequencies['etter'] == 0
+    assert frequencies['dromedaris'] == 7
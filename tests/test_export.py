@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse
+from sqlalchemy import select
+
+from ticclat.export import export_corpus, load_corpus_matrix, save_corpus_matrix
+from ticclat.sacoreutils import add_corpus_core
+from ticclat.ticclat_schema import Corpus, TextAttestation, corpusId_x_documentId
+from ticclat.tokenize import terms_documents_matrix_word_lists
+
+from . import data_dir
+from .helpers import load_test_db_data, nltk_tokenize
+
+
+def test_export_corpus(dbsession):
+    load_test_db_data(dbsession)
+
+    corpus = export_corpus(dbsession, 'Dummy corpus 2')
+
+    assert corpus.matrix.shape == (len(corpus.documents), len(corpus.wordforms))
+    assert corpus.documents['document_id'].is_monotonic_increasing
+    assert list(corpus.wordform_ids) == sorted(corpus.wordform_ids)
+    assert corpus.vocabulary_ == {wf: i for i, wf in enumerate(corpus.wordforms)}
+
+
+def test_export_corpus_unknown(dbsession):
+    with pytest.raises(ValueError):
+        export_corpus(dbsession, 'does not exist')
+
+
+def test_export_corpus_missing_document(dbsession):
+    load_test_db_data(dbsession)
+    corpus_id, document_id = dbsession.execute(
+        select([TextAttestation.corpus_id, TextAttestation.document_id])).first()
+    dbsession.execute(corpusId_x_documentId.delete()
+                      .where(corpusId_x_documentId.c.corpus_id == corpus_id)
+                      .where(corpusId_x_documentId.c.document_id == document_id))
+    corpus_name = dbsession.execute(select([Corpus.name]).where(Corpus.corpus_id == corpus_id)).scalar()
+
+    with pytest.raises(ValueError, match='not in the corpus'):
+        export_corpus(dbsession, corpus_name)
+
+
+@pytest.mark.datafiles(os.path.join(data_dir(), 'test_corpus.txt'))
+def test_export_corpus_round_trip(dbsession, datafiles, tmp_path):
+    texts_file = os.path.join(str(datafiles), 'test_corpus.txt')
+    corpus_m, v = terms_documents_matrix_word_lists(nltk_tokenize(texts_file))
+    add_corpus_core(dbsession, corpus_m, v, 'test corpus', pd.DataFrame())
+
+    corpus = export_corpus(dbsession, 'test corpus', batch_size=2)
+
+    # same matrix, with the columns in the order of the exported vocabulary
+    columns = [v.vocabulary_[wf] for wf in corpus.wordforms]
+    assert sorted(corpus.wordforms) == sorted(v.vocabulary_)
+    np.testing.assert_array_equal(corpus.matrix.toarray(), corpus_m[:, columns].toarray())
+
+    # and back again
+    path = tmp_path / 'corpus.npz'
+    save_corpus_matrix(path, corpus)
+    loaded = load_corpus_matrix(path)
+
+    np.testing.assert_array_equal(loaded.matrix.toarray(), corpus.matrix.toarray())
+    np.testing.assert_array_equal(scipy.sparse.load_npz(path).toarray(), corpus.matrix.toarray())
+    assert loaded.wordforms == corpus.wordforms
+    assert list(loaded.wordform_ids) == list(corpus.wordform_ids)
+    pd.testing.assert_frame_equal(loaded.documents, corpus.documents, check_dtype=False)
@@ -0,0 +1,34 @@
+import threading
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from ticclat.flask_app.fanout import run_concurrently
+
+
+def make_task(value):
+    def task(session):
+        return value, session.execute('SELECT 1').scalar(), threading.current_thread().name
+    return task
+
+
+def test_run_concurrently_engine(tmpdir):
+    engine = create_engine(f'sqlite:///{tmpdir}/fanout.db')
+    session = Session(bind=engine)
+
+    results = run_concurrently(session, make_task('a'), make_task('b'), make_task('c'))
+
+    assert [result[:2] for result in results] == [('a', 1), ('b', 1), ('c', 1)]
+    assert all(result[2].startswith('ticclat-fanout') for result in results)
+
+
+def test_run_concurrently_connection():
+    engine = create_engine('sqlite://')
+    connection = engine.connect()
+    session = Session(bind=connection)
+
+    results = run_concurrently(session, make_task('a'), make_task('b'))
+
+    # a session bound to a connection runs the tasks in the current thread
+    assert [result[:2] for result in results] == [('a', 1), ('b', 1)]
+    assert all(result[2] == threading.current_thread().name for result in results)
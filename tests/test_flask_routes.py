@@ -5,16 +5,22 @@
 Note
     See conftest.py for the flask_test_client. Test data from `tests/db_data` is (re-)loaded for each test.
 """
+import json
 from urllib.parse import urlencode
 import pytest
 
+from ticclat.flask_app.flask_app import create_app
+from ticclat.flask_app.paradigm_index import paradigm_index
+from ticclat.slow_queries import slow_query_log
+
 
 def test_root(flask_test_client):
     response = flask_test_client.get('/')
     assert response.status_code == 200
     expected_set = {
-        "/", "/corpora", "/corrections/<word_name>", "/lemmas_for_wordform/<word_form>", "/lexica/<word_name>",
-        "/morphological_variants_for_lemma/<paradigm_id>", "/network/<wordform>", "/paradigm_count",
+        "/", "/autocomplete/<prefix>", "/batch/lexica", "/batch/word", "/batch/word_frequency_per_corpus",
+        "/cache_stats", "/corpora", "/corrections/<word_name>", "/lemmas_for_wordform/<word_form>", "/lexica/<word_name>",
+        "/metrics", "/morphological_variants_for_lemma/<paradigm_id>", "/network/<wordform>", "/paradigm_count",
         "/plots/corpus_size", "/plots/lexicon_size", "/plots/paradigm_size", "/plots/word_count_per_year",
         "/regexp_search/<regexp>", "/static/<path:filename>", "/suffixes/<suffix_1>", "/suffixes/<suffix_1>/<suffix_2>",
         "/tables", "/tables/<table_name>", "/ticcl_variants/<word_form>", "/variants/<word_name>",
@@ -30,6 +36,90 @@ def test_root(flask_test_client):
     assert set(response.json) == expected_set
 
 
+@pytest.mark.parametrize("prefix,expected", [
+    ("ie", [{'frequency': 4, 'wordform': 'iedereen'}]),
+    ("d", [{'frequency': 7, 'wordform': 'dromedaris'}, {'frequency': 3, 'wordform': 'drmoedaris'}]),
+    ("idonotexist", []),
+])
+def test_autocomplete(flask_test_client, prefix, expected):
+    response = flask_test_client.get(f'/autocomplete/{prefix}')
+    assert response.status_code == 200
+    assert response.json == expected
+
+
+@pytest.mark.parametrize("limit,status,num_completions", [
+    ('1', 200, 1),
+    ('-1', 200, 1),
+    ('1000', 200, 2),
+    ('abc', 400, None),
+])
+def test_autocomplete_limit(flask_test_client, limit, status, num_completions):
+    response = flask_test_client.get(f'/autocomplete/d?limit={limit}')
+    assert response.status_code == status
+    if num_completions is not None:
+        assert len(response.json) == num_completions
+
+
+def test_cache_stats(flask_test_client):
+    flask_test_client.get('/corpora')
+    flask_test_client.get('/corpora')
+    response = flask_test_client.get('/cache_stats')
+    assert response.status_code == 200
+    assert response.json['hits'] >= 1
+    assert response.json['misses'] >= 1
+
+
+def test_slow_queries(flask_test_client):
+    # the route is only registered when the log is enabled
+    assert flask_test_client.get('/debug/slow_queries').status_code == 404
+
+
+def test_slow_queries_enabled(dbsession, test_data):
+    slow_query_log.setup(threshold=0)
+    try:
+        client = create_app(dbsession=dbsession).test_client()
+        client.get('/lexica/dromedaris')
+        response = client.get('/debug/slow_queries')
+        assert response.status_code == 200
+        assert 'Access-Control-Allow-Origin' not in response.headers
+        assert response.json['enabled']
+        routes = {entry['route']['endpoint'] for entry in response.json['queries']}
+        assert 'lexica' in routes
+        assert any(entry['plan'] for entry in response.json['queries'])
+    finally:
+        slow_query_log.setup(threshold=None)
+
+
+def test_metrics(flask_test_client):
+    flask_test_client.get('/corpora')
+    response = flask_test_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'ETag' not in response.headers
+    lines = response.data.decode('utf-8').splitlines()
+    assert 'ticclat_request_duration_seconds_count{endpoint="corpora"} 1' in lines
+    assert 'ticclat_responses_total{endpoint="corpora",status="200"} 1' in lines
+    assert any(line.startswith('ticclat_sql_statements_total{endpoint="corpora"}') for line in lines)
+    serialization = [line for line in lines
+                     if line.startswith('ticclat_serialization_duration_seconds_total{endpoint="corpora"}')]
+    assert len(serialization) == 1 and float(serialization[0].split()[-1]) > 0
+
+
+def test_conditional_response(flask_test_client):
+    response = flask_test_client.get('/corpora')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert 'Cache-Control' in response.headers
+
+    response = flask_test_client.get('/corpora', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    response = flask_test_client.get('/corpora', headers={'If-None-Match': 'W/"outdated"'})
+    assert response.status_code == 200
+
+
 def test_corpora(flask_test_client):
     response = flask_test_client.get('/corpora')
     assert response.status_code == 200
@@ -41,6 +131,20 @@ def test_corpora(flask_test_client):
     assert first_corpus['word_count'] > 0
 
 
+@pytest.mark.parametrize("headers,query_string", [
+    ({'Accept': 'application/x-ndjson'}, ''),
+    ({}, '?format=ndjson'),
+])
+def test_corpora_ndjson(flask_test_client, headers, query_string):
+    expected = flask_test_client.get('/corpora').json
+
+    response = flask_test_client.get(f'/corpora{query_string}', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert [json.loads(line) for line in response.data.splitlines()] == expected
+
+
 @pytest.mark.parametrize("wordform_input,expected", [
     ("aandacht", [{'W': 1, 'X': 1, 'Y': 1, 'Z': 1, 'paradigm_id': 1, 'wordform': 'aandacht'}]),
     ("drmoedaris", [{'W': 2, 'X': 1, 'Y': 1, 'Z': 1, 'paradigm_id': 3, 'wordform': 'dromedaris'}]),
@@ -84,7 +188,7 @@ def test_lexica(flask_test_client, wordform_input, expected):
     (1, [{'V': 1, 'W': 1, 'X': 1, 'Y': 1, 'Z': 1, 'frequency': 5.0, 'max_year': 1980.0, 'min_year': 1510.0,
           'num_corpora': 2, 'num_lexica': 0, 'num_paradigms': 1, 'word_type_code': 'HCL', 'wordform': 'aandacht',
           'wordform_id': 1}]),
-    (3, [{'V': 1, 'W': 2, 'X': 1, 'Y': 1, 'Z': 1, 'frequency': 4.0, 'max_year': 1510.0, 'min_year': 1510.0,
+    (3, [{'V': 1, 'W': 2, 'X': 1, 'Y': 1, 'Z': 1, 'frequency': 2.0, 'max_year': 1510.0, 'min_year': 1510.0,
           'num_corpora': 1, 'num_lexica': 2, 'num_paradigms': 1, 'word_type_code': 'HCL', 'wordform': 'dromedaris',
           'wordform_id': 3},
          {'V': 2, 'W': 2, 'X': 1, 'Y': 1, 'Z': 1, 'frequency': 4.0, 'max_year': 1510.0, 'min_year': 1510.0,
@@ -97,6 +201,10 @@ def test_morphological_variants_for_lemma(flask_test_client, paradigm_id, expect
     assert response.status_code == 200
     assert response.json == expected
 
+    response = flask_test_client.get(f'/morphological_variants_for_lemma/{paradigm_id}?format=ndjson')
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.data.splitlines()] == expected
+
 
 def test_network(flask_test_client):
     response = flask_test_client.get('/network/dromedaris')
@@ -122,9 +230,9 @@ def test_tables(flask_test_client):
     assert response.status_code == 200
     response_list = response.json
     assert set(response_list) == {
-        'anahashes', 'corpora', 'corpusId_x_documentId', 'documents', 'external_links', 'lexica',
+        'anahashes', 'corpora', 'corpusId_x_documentId', 'database_version', 'documents', 'external_links', 'lexica',
         'lexical_source_wordform', 'morphological_paradigms', 'source_x_wordform_link', 'text_attestations',
-        'ticcl_variants', 'wordform_frequency', 'wordform_links', 'wordforms'
+        'ticcl_variants', 'wordform_frequency', 'wordform_links', 'wordform_stats', 'wordforms'
     }
 
 
@@ -182,6 +290,20 @@ def test_variants_by_wxyz(flask_test_client, wxyz, expected):
     assert response.json == expected
 
 
+@pytest.mark.parametrize("index_enabled", [False, True])
+@pytest.mark.parametrize("url", [
+    '/paradigm_count?X=abc',
+    '/variants_by_wxyz?w=1&x=abc&y=1&z=1',
+])
+def test_non_integer_args(flask_test_client, index_enabled, url):
+    paradigm_index.setup(enabled=index_enabled)
+    try:
+        response = flask_test_client.get(url)
+        assert response.status_code == 400
+    finally:
+        paradigm_index.setup()
+
+
 @pytest.mark.parametrize("wordform,expected", [
     ('aandacht', {'anahash_variants': ['aandacht'], 'lexicon_variants': [], 'morph_variants': ['aandacht']}),
     ('drmoedaris', {'anahash_variants': ['dromedaris', 'drmoedaris'], 'lexicon_variants': [],
@@ -194,6 +316,40 @@ def test_word(flask_test_client, wordform, expected):
     assert response.json == expected
 
 
+def test_batch_word(flask_test_client):
+    response = flask_test_client.post('/batch/word', json={'wordforms': ['aandacht', 'drmoedaris', 'idonotexist']})
+    assert response.status_code == 200
+    assert response.json == {
+        'aandacht': {'anahash_variants': ['aandacht'], 'lexicon_variants': [], 'morph_variants': ['aandacht']},
+        'drmoedaris': {'anahash_variants': ['dromedaris', 'drmoedaris'], 'lexicon_variants': [],
+                       'morph_variants': ['dromedaris', 'drmoedaris']},
+        'idonotexist': {'anahash_variants': [], 'lexicon_variants': [], 'morph_variants': []},
+    }
+
+
+def test_batch_lexica(flask_test_client):
+    wordforms = ['idonotexist', 'foxtrot', 'dromedaris', 'drmoedaris']
+    response = flask_test_client.post('/batch/lexica', json=wordforms)
+    assert response.status_code == 200
+    for wordform in wordforms:
+        assert response.json[wordform] == flask_test_client.get(f'/lexica/{wordform}').json
+
+
+def test_batch_word_frequency_per_corpus(flask_test_client):
+    response = flask_test_client.post('/batch/word_frequency_per_corpus', json=['aandacht', 'idonotexist'])
+    assert response.status_code == 200
+    assert response.json == {
+        'aandacht': [{'corpus_name': 'Dummy corpus 1', 'relative_frequency': 34658.44106332097},
+                     {'corpus_name': 'Dummy corpus 2', 'relative_frequency': 1516.3640319967974}],
+        'idonotexist': [],
+    }
+
+
+def test_batch_bad_request(flask_test_client):
+    response = flask_test_client.post('/batch/word', json={'wordforms': 'aandacht'})
+    assert response.status_code == 400
+
+
 @pytest.mark.parametrize("wordform,expected", [
     ('aandacht', [{'corpus_name': 'Dummy corpus 1', 'relative_frequency': 34658.44106332097},
                   {'corpus_name': 'Dummy corpus 2', 'relative_frequency': 1516.3640319967974}]),
@@ -0,0 +1,40 @@
+import contextlib
+
+import pytest
+
+import ticclat.ingest
+from ticclat.ingest import ingest_all
+
+
+class FakeSource:
+    def __init__(self, name, ingested):
+        self.name = name
+        self.ingested = ingested
+
+    def ingest(self, session_maker, **kwargs):
+        self.ingested.append(self.name)
+
+
+@pytest.fixture
+def ingested(monkeypatch):
+    ingested = []
+    sources = {name: FakeSource(name, ingested) for name in ('corpus', 'lexicon', 'wf_freqs')}
+    monkeypatch.setattr(ticclat.ingest, 'ALL_SOURCES', sources)
+    monkeypatch.setattr(ticclat.ingest, 'session_scope', lambda session_maker: contextlib.nullcontext())
+    monkeypatch.setattr(ticclat.ingest, 'bump_database_generation', lambda session: None)
+    return ingested
+
+
+def test_ingest_all_skips_opt_in_sources(ingested):
+    ingest_all(session_maker=None)
+    assert ingested == ['corpus', 'lexicon']
+
+
+def test_ingest_all_exclude_skips_opt_in_sources(ingested):
+    ingest_all(session_maker=None, exclude=['corpus'])
+    assert ingested == ['lexicon']
+
+
+def test_ingest_all_include_opt_in_source(ingested):
+    ingest_all(session_maker=None, include=['wf_freqs'])
+    assert ingested == ['wf_freqs']
@@ -0,0 +1,61 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from tests.run_loadtest import LoadTest, mixed_requests, parse_access_log
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status = 500 if self.path.startswith('/network') else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_parse_access_log():
+    lines = [
+        '127.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET /word/aap HTTP/1.1" 200 123 "-" "curl/7.68"',
+        '127.0.0.1 - - [19/Oct/2026:10:00:01 +0000] "POST /batch/word HTTP/1.1" 200 123',
+        '127.0.0.1 - - [19/Oct/2026:10:00:02 +0000] "GET /paradigm_count?X=1 HTTP/1.1" 200 12',
+        'not a log line',
+    ]
+    assert parse_access_log(lines) == [('word', '/word/aap'), ('paradigm_count', '/paradigm_count?X=1')]
+
+
+def test_mixed_requests():
+    requests = mixed_requests(100, ['aap', 'noot mies'], rng=np.random.default_rng(1))
+
+    assert len(requests) == 100
+    assert {'word', 'variants', 'lexica'} <= {name for name, _ in requests}
+    assert ('word', '/word/noot%20mies') in requests
+
+
+def test_load_test(server):
+    requests = [('word', '/word/aap'), ('network', '/network/aap')] * 10
+
+    result = LoadTest(server, requests, concurrency=4).run()
+
+    assert result['total']['requests'] == 20
+    assert result['routes']['word']['error_rate'] == 0
+    assert result['routes']['network']['error_rate'] == 1
+    assert result['routes']['network']['statuses'] == {'500': 10}
+    assert result['total']['p50_ms'] > 0
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from ticclat.flask_app.paradigm_index import ParadigmIndex
+
+
+def make_index():
+    df = pd.read_csv(Path(__file__).parent / 'db_data' / 'morphological_paradigms.tsv', sep='\t')
+    index = ParadigmIndex(enabled=True)
+    index.build(df, generation=1)
+    return index
+
+
+def test_paradigm_index_pack_unpack():
+    index = make_index()
+
+    code = index.pack(1, 2, 1, 3)
+    assert {k: int(v[0]) for k, v in index.unpack([code]).items()} == {'Z': 1, 'Y': 2, 'X': 1, 'W': 3}
+    # the packed codes are ordered like (Z, Y, X, W)
+    assert index.pack(1, 1, 2, 1) < index.pack(1, 2, 1, 1) < index.pack(2, 0, 0, 0)
+
+
+def test_paradigm_index_members():
+    index = make_index()
+
+    assert index.members(1, 1, 1, 2)['wordform_id'].tolist() == [3, 4]
+    assert index.members(1, 1, 1, 2, word_type_codes=['HCL'])['wordform_id'].tolist() == [3]
+    assert index.members(1, 1, 1, 99).empty
+
+
+def test_paradigm_index_siblings_and_lemmas():
+    index = make_index()
+
+    assert index.siblings(4)['wordform_id'].tolist() == [3, 4]
+    lemmas = index.lemmas(10)
+    assert lemmas[['paradigm_id', 'wordform_id', 'W', 'X', 'Y', 'Z']].to_dict(orient='records') == \
+        [{'paradigm_id': 9, 'wordform_id': 9, 'W': 3, 'X': 1, 'Y': 2, 'Z': 1}]
+    assert index.siblings(12345).empty
+
+
+def test_paradigm_index_count():
+    index = make_index()
+
+    assert index.count().to_dict(orient='records') == [
+        {'X': 1, 'Y': 1, 'Z': 1, 'num_paradigms': 5},
+        {'X': 1, 'Y': 2, 'Z': 1, 'num_paradigms': 4},
+        {'X': 2, 'Y': 1, 'Z': 1, 'num_paradigms': 1}
+    ]
+    assert index.count(Y=2).to_dict(orient='records') == [{'X': 1, 'Y': 2, 'Z': 1, 'num_paradigms': 4}]
+    assert index.count(X=2, Z=1).to_dict(orient='records') == [{'X': 2, 'Y': 1, 'Z': 1, 'num_paradigms': 1}]
+
+
+def test_paradigm_index_negative_codes():
+    df = pd.DataFrame({'paradigm_id': [1], 'Z': [-1], 'Y': [1], 'X': [1], 'W': [1],
+                       'word_type_code': ['HCL'], 'wordform_id': [1]})
+
+    with pytest.raises(ValueError):
+        ParadigmIndex().build(df)
+
+
+def test_paradigm_index_disabled(monkeypatch):
+    monkeypatch.delenv('PARADIGM_INDEX', raising=False)
+    index = ParadigmIndex()
+    index.setup()
+
+    assert not index.ensure_loaded(session=None)
+
+
+def test_paradigm_index_out_of_range_codes():
+    index = make_index()
+    too_large_w = 1 << index.bits[3]
+
+    # a W that does not fit in its bits must not spill into X (and match W=0 of X=2)
+    assert not index.members(1, 1, 2, 1).empty
+    assert index.members(1, 1, 1, too_large_w + 1).empty
+    assert index.members(1, 1, 1, -1).empty
+    assert index.count(X=-1).empty
+    assert index.count(Y=1 << index.bits[1]).empty
+    assert not index.count(Y=1).empty
+
+
+def test_paradigm_index_reload_publishes_new_state():
+    index = make_index()
+    state = index.state
+
+    index.build(pd.DataFrame({'paradigm_id': [1], 'Z': [100], 'Y': [1], 'X': [1], 'W': [1],
+                              'word_type_code': ['HCL'], 'wordform_id': [1]}), generation=2)
+
+    # the old state is left intact for readers that still use it
+    assert index.state is not state
+    assert state.generation == 1 and index.generation == 2
+    assert index.bits[0] == 7 and state.bits[0] == 1
+    assert index.members(100, 1, 1, 1)['wordform_id'].tolist() == [1]
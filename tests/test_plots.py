@@ -0,0 +1,46 @@
+import pytest
+
+from ticclat.flask_app.cache import query_cache
+from ticclat.flask_app.db import database
+from ticclat.flask_app.plots import blueprint
+from ticclat.ticclat_schema import DatabaseVersion
+
+
+@pytest.fixture
+def rendered(monkeypatch, sqlite_session):
+    monkeypatch.setattr(database, 'session', sqlite_session)
+
+    calls = []
+
+    def render_plot(name, var=None):
+        calls.append((name, var))
+        return f'{name} {len(calls)}'.encode('utf-8')
+
+    monkeypatch.setattr(blueprint, 'render_plot', render_plot)
+    query_cache.setup(max_size=10, ttl=60, check_interval=0)
+    yield sqlite_session, calls
+    query_cache.setup()
+
+
+def test_get_plot_cached(rendered):
+    session, calls = rendered
+
+    assert blueprint.get_plot('corpus_size') == b'corpus_size 1'
+    assert blueprint.get_plot('corpus_size') == b'corpus_size 1'
+    assert calls == [('corpus_size', None)]
+
+    # a new database generation renders the plot again
+    session.add(DatabaseVersion(database_version_id=1, generation=1))
+    session.flush()
+
+    assert blueprint.get_plot('corpus_size') == b'corpus_size 2'
+
+
+def test_get_plot_cache_disabled(rendered):
+    _, calls = rendered
+    query_cache.setup(max_size=0)
+
+    blueprint.get_plot('corpus_size')
+    blueprint.get_plot('corpus_size')
+
+    assert len(calls) == 2
@@ -0,0 +1,56 @@
+import pytest
+
+from ticclat.flask_app.cache import query_cache
+from ticclat.flask_app.resolver import WordformResolver
+from ticclat.ticclat_schema import Wordform, DatabaseVersion
+
+
+@pytest.fixture
+def sqlite_tables():
+    return [DatabaseVersion.__table__, Wordform.__table__]
+
+
+@pytest.fixture
+def sqlite_rows():
+    return [Wordform(wordform_id=1, wordform='aap', wordform_lowercase='aap'),
+            Wordform(wordform_id=2, wordform='noot', wordform_lowercase='noot')]
+
+
+@pytest.fixture(autouse=True)
+def check_generation():
+    query_cache.setup(check_interval=0)
+    query_cache.clear()
+
+
+def test_resolve(sqlite_session):
+    resolver = WordformResolver()
+    resolver.setup(max_size=10)
+
+    assert resolver.resolve(sqlite_session, 'aap') == 1
+    assert resolver.resolve(sqlite_session, 'mies') is None
+    assert resolver.resolve_many(sqlite_session, ['aap', 'noot', 'mies']) == {'aap': 1, 'noot': 2}
+
+    # 'aap' and 'mies' (a negative result) were cached
+    assert resolver.stats() == {'hits': 2, 'misses': 3, 'size': 3, 'max_size': 10}
+
+
+def test_resolve_lru(sqlite_session):
+    resolver = WordformResolver()
+    resolver.setup(max_size=2)
+
+    resolver.resolve_many(sqlite_session, ['aap', 'noot', 'mies'])
+
+    assert resolver.stats()['size'] == 2
+
+
+def test_resolve_generation_invalidates(sqlite_session):
+    resolver = WordformResolver()
+    resolver.setup(max_size=10)
+
+    assert resolver.resolve(sqlite_session, 'mies') is None
+
+    sqlite_session.add(Wordform(wordform_id=3, wordform='mies', wordform_lowercase='mies'))
+    sqlite_session.add(DatabaseVersion(database_version_id=1, generation=1))
+    sqlite_session.flush()
+
+    assert resolver.resolve(sqlite_session, 'mies') == 3
@@ -2,11 +2,13 @@ import os
 import pytest
 
 import pandas as pd
+import scipy.sparse
 
-from ticclat.ticclat_schema import Wordform, Corpus
+from ticclat.ticclat_schema import Wordform, Corpus, TextAttestation
 from ticclat.tokenize import terms_documents_matrix_word_lists
 
-from ticclat.sacoreutils import add_corpus_core
+from ticclat.sacoreutils import add_corpus_core, get_tas, text_attestations_partitions
+from ticclat.dbutils import partition_text_attestations
 
 from .helpers import nltk_tokenize
 
@@ -52,7 +54,40 @@ def test_add_corpus_core_nltk(dbsession, datafiles):
     for d, num_tas in zip(corpus.corpus_documents, [3, 3, 2]):
         assert len(d.document_wordforms) == num_tas
         for ta in d.document_wordforms:
+            assert ta.corpus_id == corpus.corpus_id
             if d.document_id == 3 and ta.ta_wordform.wordform == 'wf1':
                 assert ta.frequency == 2
             else:
                 assert ta.frequency == 1
+
+
+def test_get_tas_sorted_by_primary_key():
+    # documents x terms, with a duplicate entry for document 0, term 1
+    corpus_m = scipy.sparse.coo_matrix(([1, 2, 3, 4, 5], ([0, 0, 1, 1, 0], [1, 0, 1, 2, 1])), shape=(2, 3))
+    wf_mapping = {'a': 7, 'b': 5, 'c': 6}
+    word_from_tdmatrix_id = {0: 'a', 1: 'b', 2: 'c'}
+
+    tas = list(get_tas(corpus_m, [10, 20], wf_mapping, word_from_tdmatrix_id, corpus_id=3))
+
+    assert tas == [{'wordform_id': 5, 'document_id': 10, 'corpus_id': 3, 'frequency': 6},
+                   {'wordform_id': 5, 'document_id': 20, 'corpus_id': 3, 'frequency': 3},
+                   {'wordform_id': 6, 'document_id': 20, 'corpus_id': 3, 'frequency': 4},
+                   {'wordform_id': 7, 'document_id': 10, 'corpus_id': 3, 'frequency': 2}]
+
+
+@pytest.mark.datafiles(os.path.join(data_dir(), 'test_corpus.txt'))
+def test_add_corpus_core_partitioned_is_not_committed(dbsession, datafiles):
+    # (this commits the transaction of the test)
+    partition_text_attestations(dbsession)
+
+    texts_file = os.path.join(str(datafiles), 'test_corpus.txt')
+    corpus_m, v = terms_documents_matrix_word_lists(nltk_tokenize(texts_file))
+    add_corpus_core(dbsession, corpus_m, v, 'test corpus', pd.DataFrame())
+
+    corpus = dbsession.query(Corpus).one()
+    assert text_attestations_partitions(dbsession) == ['p0', f'p{corpus.corpus_id}']
+    assert {ta.corpus_id for ta in dbsession.query(TextAttestation).all()} == {corpus.corpus_id}
+
+    # adding the partition did not commit the corpus
+    with dbsession.get_bind().engine.connect() as connection:
+        assert connection.execute('SELECT COUNT(*) FROM corpora').scalar() == 0
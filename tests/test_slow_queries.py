@@ -0,0 +1,56 @@
+from sqlalchemy import create_engine, text
+
+from ticclat.slow_queries import slow_query_log, explain
+
+
+def test_slow_query_log():
+    engine = create_engine('sqlite://')
+    slow_query_log.setup(threshold=0, max_entries=2)
+    slow_query_log.instrument(engine)
+    try:
+        with engine.connect() as connection:
+            for i in range(3):
+                connection.execute(text('SELECT :value'), value=i)
+
+        entries = slow_query_log.entries()
+        # only the last two statements are kept
+        assert len(entries) == 2
+        assert sorted(entry['parameters'] for entry in entries) == [['1'], ['2']]
+        assert entries[0]['statement'] == 'SELECT ?'
+        assert entries[0]['route'] is None
+        # EXPLAIN FORMAT=JSON is only supported by MySQL
+        assert entries[0]['plan'] is None
+    finally:
+        slow_query_log.setup(threshold=None)
+
+
+def test_slow_query_log_disabled():
+    engine = create_engine('sqlite://')
+    slow_query_log.setup(threshold=None)
+    slow_query_log.instrument(engine)
+
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+
+    assert not slow_query_log.enabled
+    assert slow_query_log.entries() == []
+
+
+def test_explain_only_select():
+    engine = create_engine('sqlite://')
+    assert explain(engine, 'DELETE FROM wordforms', ()) is None
+
+
+def test_slow_query_log_route_info():
+    engine = create_engine('sqlite://')
+    slow_query_log.setup(threshold=0)
+    slow_query_log.route_info = lambda: {'endpoint': 'test', 'path': '/test?'}
+    slow_query_log.instrument(engine)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+
+        assert slow_query_log.entries()[0]['route'] == {'endpoint': 'test', 'path': '/test?'}
+    finally:
+        slow_query_log.route_info = None
+        slow_query_log.setup(threshold=None)
@@ -0,0 +1,58 @@
+import pytest
+
+from tests.helpers import load_test_db_data
+from ticclat.flask_app import queries
+from ticclat.flask_app.cache import query_cache
+from ticclat.ticclat_schema import Document
+
+pytest.importorskip('pyarrow')
+pytest.importorskip('duckdb_engine')
+
+from ticclat import snapshot  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def test_export_snapshot(dbsession, tmp_path):
+    load_test_db_data(dbsession)
+
+    manifest = snapshot.export_snapshot(dbsession.connection(), tmp_path / 'snapshot', chunk_size=3)
+
+    assert manifest['tables']['wordforms']['rows'] == 10
+    assert manifest['tables']['wordforms']['files'] == 4
+    assert manifest['tables']['lexical_source_wordform']['partition_by'] == 'lexicon_id'
+    assert manifest['tables']['external_links'] == {'rows': 0, 'files': 1, 'partition_by': None}
+    assert (tmp_path / 'snapshot' / 'lexical_source_wordform' / 'lexicon_id=1').is_dir()
+
+
+@pytest.mark.parametrize('query', [
+    queries.count_wfs_in_lexica,
+    queries.wfs_min_num_lexica,
+    queries.num_wfs_per_anahash,
+    lambda session: queries.count_wfs_per_document_corpus(session, 'Dummy corpus 2'),
+    lambda session: queries.count_unique_wfs_in_corpus(session, 'Dummy corpus 2'),
+])
+def test_snapshot_queries(dbsession, tmp_path, query):
+    load_test_db_data(dbsession)
+    snapshot.export_snapshot(dbsession.connection(), tmp_path / 'snapshot')
+    snapshot_session = snapshot.get_snapshot_session(tmp_path / 'snapshot')
+
+    expected = sorted(tuple(row) for row in query(dbsession))
+    assert sorted(tuple(row) for row in query(snapshot_session)) == expected
+
+
+def test_snapshot_memoized_queries(dbsession, tmp_path):
+    load_test_db_data(dbsession)
+    snapshot.export_snapshot(dbsession.connection(), tmp_path / 'snapshot')
+    snapshot_session = snapshot.get_snapshot_session(tmp_path / 'snapshot')
+    expected = queries.get_corpora_year_range(snapshot_session)
+    # the live database changes after the snapshot was made (without a new generation)
+    dbsession.execute(Document.__table__.update().values(pub_year=3000))
+    dbsession.flush()
+
+    query_cache.setup(max_size=10, ttl=60, check_interval=0)
+    try:
+        for _ in range(2):
+            assert queries.get_corpora_year_range(snapshot_session) == expected
+            assert queries.get_corpora_year_range(dbsession) == (3000, 3000)
+        assert query_cache.stats()['hits'] == 2
+    finally:
+        query_cache.setup()
@@ -1,10 +1,12 @@
 import pytest
 import os
 
+import numpy as np
 import pandas as pd
 
 from ticclat.utils import chunk_df, read_json_lines, write_json_lines, \
-    json_line, iterate_wf, chunk_json_lines, read_ticcl_variants_file
+    json_line, iterate_wf, chunk_json_lines, read_ticcl_variants_file, \
+    WordformMapping, map_wordforms
 
 from . import data_dir
 
@@ -127,3 +129,55 @@ def test_read_ticcl_variants_file(datafiles):
     print(df)
 
     assert df.shape == (2, 7)
+
+
+def test_wordform_mapping():
+    wf_mapping = WordformMapping(['wf1', 'wf2', 'wf3', 'wf2'], [10, 20, 30, 21])
+
+    assert len(wf_mapping) == 3
+    assert wf_mapping.nbytes == 3 * 24
+    assert wf_mapping['wf1'] == 10
+    # for duplicate wordforms, the last id is used
+    assert wf_mapping['wf2'] == 21
+    assert 'wf3' in wf_mapping
+    assert 'wf4' not in wf_mapping
+    assert wf_mapping.get('wf4', -1) == -1
+
+    np.testing.assert_array_equal(wf_mapping.get_ids(['wf3', 'wf1', 'wf3']), [30, 10, 30])
+    np.testing.assert_array_equal(wf_mapping.get_ids(['wf3', 'wf4'], missing=0), [30, 0])
+    with pytest.raises(KeyError):
+        wf_mapping.get_ids(['wf3', 'wf4'])
+    with pytest.raises(KeyError):
+        wf_mapping['wf4']
+
+
+def test_wordform_mapping_empty():
+    wf_mapping = WordformMapping([], [])
+
+    assert len(wf_mapping) == 0
+    assert 'wf1' not in wf_mapping
+    assert list(wf_mapping.get_ids([])) == []
+
+
+def test_wordform_mapping_hash_collisions(monkeypatch):
+    # all wordforms get the same first hash, so they are told apart by the second one
+    def hash_array(values, hash_key, categorize):
+        if hash_key == WordformMapping.HASH_KEYS[0]:
+            return np.zeros(len(values), dtype=np.uint64)
+        return np.array([int(value[2:]) for value in values], dtype=np.uint64)
+    monkeypatch.setattr(pd.util, 'hash_array', hash_array)
+
+    wordforms = [f'wf{i}' for i in range(10)]
+    wf_mapping = WordformMapping(wordforms, range(100, 110))
+
+    np.testing.assert_array_equal(wf_mapping.get_ids(wordforms[::-1]), range(109, 99, -1))
+    assert 'wf10' not in wf_mapping
+
+
+def test_map_wordforms():
+    wordforms = {'wf1': 1, 'wf2': 2}
+
+    for wf_mapping in (wordforms, WordformMapping.from_dict(wordforms)):
+        np.testing.assert_array_equal(map_wordforms(wf_mapping, pd.Series(['wf2', 'wf1'])), [2, 1])
+        with pytest.raises(KeyError):
+            map_wordforms(wf_mapping, ['wf3'])
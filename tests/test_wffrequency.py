@@ -0,0 +1,63 @@
+import os
+import pytest
+
+import pandas as pd
+
+from ticclat.ticclat_schema import WordformFrequencies
+from ticclat.tokenize import terms_documents_matrix_word_lists
+from ticclat.dbutils import add_lexicon, create_wf_frequencies_table
+from ticclat.sacoreutils import add_corpus_core, merge_wordform_frequencies
+
+from .helpers import nltk_tokenize
+
+from . import data_dir
+
+
+def get_frequencies(dbsession):
+    return {row.wordform: row.frequency for row in dbsession.query(WordformFrequencies).all()}
+
+
+def add_test_corpus(dbsession, datafiles, corpus_name):
+    texts_file = os.path.join(str(datafiles), 'test_corpus.txt')
+    corpus_m, v = terms_documents_matrix_word_lists(nltk_tokenize(texts_file))
+    add_corpus_core(dbsession, corpus_m, v, corpus_name, pd.DataFrame())
+
+
+def test_merge_wordform_frequencies(dbsession):
+    merge_wordform_frequencies(dbsession, [{'wordform_id': 1, 'wordform': 'wf1', 'frequency': 3},
+                                           {'wordform_id': 2, 'wordform': 'wf2', 'frequency': 0}])
+    merge_wordform_frequencies(dbsession, [{'wordform_id': 1, 'wordform': 'wf1', 'frequency': 2},
+                                           {'wordform_id': 3, 'wordform': 'wf3', 'frequency': 1}])
+
+    assert get_frequencies(dbsession) == {'wf1': 5, 'wf2': 0, 'wf3': 1}
+
+
+def test_add_lexicon_adds_zero_frequencies(dbsession):
+    wfs = pd.DataFrame()
+    wfs['wordform'] = ['wf1', 'wf2']
+
+    add_lexicon(dbsession, lexicon_name='test lexicon', vocabulary=True, wfs=wfs)
+
+    assert get_frequencies(dbsession) == {'wf1': 0, 'wf2': 0}
+
+
+@pytest.mark.datafiles(os.path.join(data_dir(), 'test_corpus.txt'))
+def test_add_corpus_updates_frequencies(dbsession, datafiles):
+    wfs = pd.DataFrame()
+    wfs['wordform'] = ['wf1', 'wf6']
+    add_lexicon(dbsession, lexicon_name='test lexicon', vocabulary=True, wfs=wfs)
+
+    add_test_corpus(dbsession, datafiles, 'test corpus')
+
+    expected = {'wf1': 3, 'wf2': 2, 'wf3': 2, 'wf4': 1, 'wf5': 1, 'wf6': 0}
+    assert get_frequencies(dbsession) == expected
+
+    add_test_corpus(dbsession, datafiles, 'test corpus 2')
+
+    expected = {wf: 2 * freq for wf, freq in expected.items()}
+    assert get_frequencies(dbsession) == expected
+
+    # a full rebuild gives the same frequencies
+    create_wf_frequencies_table(dbsession)
+
+    assert get_frequencies(dbsession) == expected
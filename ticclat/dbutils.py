@@ -6,9 +6,10 @@ import os
 import re
 import json
 import logging
-from pathlib import Path
+import datetime
 import tempfile
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import defaultdict
 
 import numpy as np
@@ -17,8 +18,10 @@ import pandas as pd
 import sh
 from tqdm import tqdm
 
-from sqlalchemy import create_engine, select, bindparam, and_
+from sqlalchemy import create_engine, select, and_, func, MetaData, \
+    Table, Column, BigInteger
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable, CreateIndex, Index
 
 # for create_database:
 import MySQLdb
@@ -27,11 +30,14 @@ from sqlalchemy_utils.functions import drop_database
 
 from ticclat.ticclat_schema import Base, Wordform, Lexicon, Anahash, \
     lexical_source_wordform, WordformLink, WordformLinkSource, \
-    MorphologicalParadigm, WordformFrequencies
+    MorphologicalParadigm, WordformFrequencies, WordformStats, DatabaseVersion, \
+    Corpus, TextAttestation
 from ticclat.utils import chunk_df, anahash_df, write_json_lines, \
     read_json_lines, get_temp_file, json_line, split_component_code, \
-    morph_iterator, preprocess_wordforms
-from ticclat.sacoreutils import bulk_add_anahashes_core, sql_query_batches, sql_insert_batches
+    morph_iterator, preprocess_wordforms, WordformMapping, map_wordforms
+from ticclat.sacoreutils import bulk_add_anahashes_core, sql_insert_batches, \
+    merge_wordform_frequencies, text_attestations_partitions
+from ticclat.slow_queries import slow_query_log
 
 LOGGER = logging.getLogger(__name__)
 
@@ -59,6 +65,7 @@ def get_engine(without_database=False):
     if without_database:
         url = url.replace(get_db_name(), "")
     engine = create_engine(url)
+    slow_query_log.instrument(engine)
     return engine
 
 
@@ -178,6 +185,12 @@ def add_lexicon(session, lexicon_name, vocabulary, wfs, preprocess_wfs=True):
           'wordform_id': wf['wordform_id']} for wf in result]
     )
 
+    # new wordforms get a row (with frequency 0) in the wordform_frequency table
+    merge_wordform_frequencies(session, ({'wordform_id': wf['wordform_id'],
+                                          'wordform': wf['wordform'],
+                                          'frequency': 0} for wf in result),
+                               total=len(result))
+
     LOGGER.info('Lexicon was added.')
 
     return lexicon
@@ -210,10 +223,11 @@ def get_word_frequency_df(session, add_ids=False):
 
 def get_wf_mapping(session, lexicon=None, lexicon_id=None):
     """
-    Create a dictionary with a mapping of wordforms to wordform_id.
+    Create a mapping of the wordforms of a lexicon to wordform_id.
 
-    The keys of the dictionary are wordforms, the values are the IDs
-    of those wordforms in the database wordforms table.
+    Returns a `utils.WordformMapping` of the wordforms to the IDs of those
+    wordforms in the database wordforms table. Look up whole columns of
+    wordforms at once with `utils.map_wordforms`.
     """
     msg = 'Getting the wordform mapping of lexicon "{}"'
 
@@ -236,15 +250,10 @@ def get_wf_mapping(session, lexicon=None, lexicon_id=None):
     LOGGER.debug(select_statement)
     result = session.execute(select_statement).fetchall()
 
-    wf_mapping = defaultdict(int)
-    for row in result:
-        wf_mapping[row['wordform']] = row[lexical_source_wordform.c.wordform_id]
-
-    # Make sure a KeyError is raised, if we try to look up a word that is not
-    # in the database (because we preprocessed it)
-    wf_mapping.default_factory = None
-
-    return wf_mapping
+    # A KeyError is raised if we try to look up a word that is not in the
+    # database (because we preprocessed it)
+    return WordformMapping([row['wordform'] for row in result],
+                           [row[lexical_source_wordform.c.wordform_id] for row in result])
 
 
 def bulk_add_anahashes(session, anahashes, tqdm_factory=None, batch_size=10000):
@@ -288,35 +297,38 @@ def bulk_add_anahashes(session, anahashes, tqdm_factory=None, batch_size=10000):
 
 def get_anahashes(session, anahashes, wf_mapping, batch_size=50000):
     """
-    Generator of dictionaries with anahash ID and wordform ID pairs.
+    Get the database IDs of wordforms and their anahashes.
 
-    Given `anahashes`, a dataframe with wordforms and corresponding anahashes,
-    yield dictionaries containing two entries each: key 'a_id' has the value
-    of the anahash ID in the database, key 'wf_id' has the value of the
-    wordform ID in the database.
+    Given `anahashes`, a dataframe with wordforms (index) and corresponding
+    anahashes, return a dataframe with the wordform ID ('wordform_id') and
+    the anahash ID ('anahash_id') in the database of every wordform. The
+    wordform IDs are looked up in `wf_mapping` (a `utils.WordformMapping` or
+    a dictionary) and the anahash IDs are merged in from the anahashes table.
+    A KeyError is raised for wordforms or anahashes that are not in the
+    database.
     """
-    unique_hashes = anahashes.copy().drop_duplicates(subset='anahash')
+    unique_hashes = anahashes.drop_duplicates(subset='anahash')
 
     with tqdm(total=unique_hashes.shape[0], mininterval=2.0) as pbar:
-        ah_mapping = {}
+        ah_ids = []
 
         for chunk in chunk_df(unique_hashes, batch_size=batch_size):
-            # Find out which anahashes are not yet in the database.
-            ahs = set(list(chunk['anahash']))
+            select_statement = select([Anahash.anahash, Anahash.anahash_id]) \
+                .where(Anahash.anahash.in_(chunk['anahash'].tolist()))
+            ah_ids.extend(session.execute(select_statement).fetchall())
+            pbar.update(chunk.shape[0])
 
-            select_statement = select([Anahash]).where(Anahash.anahash.in_(ahs))
-            result = session.execute(select_statement).fetchall()
+    ah_ids = pd.DataFrame(ah_ids, columns=['anahash', 'anahash_id'], dtype=np.int64)
 
-            for row in result:
-                ah_mapping[row[1]] = row[0]
-            pbar.update(chunk.shape[0])
+    pairs = pd.DataFrame({'wordform_id': map_wordforms(wf_mapping, anahashes.index),
+                          'anahash': anahashes['anahash'].to_numpy(dtype=np.int64)})
+    pairs = pairs.merge(ah_ids, on='anahash', how='left', validate='many_to_one')
+
+    missing = pairs['anahash_id'].isna()
+    if missing.any():
+        raise KeyError(int(pairs.loc[missing, 'anahash'].iloc[0]))
 
-    with tqdm(total=anahashes.shape[0], mininterval=2.0) as pbar:
-        for wordform, row in anahashes.iterrows():
-            # SQLAlchemy doesn't allow the use of column names in update
-            # statements, so we use something else.
-            yield {'a_id': ah_mapping[row['anahash']], 'wf_id': wf_mapping[wordform]}
-            pbar.update(1)
+    return pairs[['wordform_id', 'anahash_id']].astype(np.int64)
 
 
 def connect_anahashes_to_wordforms(session, anahashes, df, batch_size=50000):
@@ -326,60 +338,98 @@ def connect_anahashes_to_wordforms(session, anahashes, df, batch_size=50000):
     Given `anahashes`, a dataframe with wordforms and corresponding anahashes,
     create the relations between the two in the wordforms and anahashes tables
     by setting the anahash_id foreign key in the wordforms table.
+
+    The (wordform_id, anahash_id) pairs are bulk inserted into a temporary
+    staging table, which is joined to the wordforms table in a single UPDATE
+    (instead of one UPDATE per wordform).
     """
     LOGGER.info('Connecting anahashes to wordforms.')
 
     LOGGER.debug('Getting wordform/anahash_id pairs.')
-    with get_temp_file() as anahash_to_wf_file:
-        total_lines_written = write_json_lines(anahash_to_wf_file,
-                                               get_anahashes(session, anahashes, df))
+    pairs = get_anahashes(session, anahashes, df, batch_size=batch_size) \
+        .drop_duplicates(subset='wordform_id', keep='last')
+
+    staging = Table('wordform_anahash_import', MetaData(),
+                    Column('wordform_id', BigInteger, primary_key=True, autoincrement=False),
+                    Column('anahash_id', BigInteger, nullable=False),
+                    prefixes=['TEMPORARY'])
+    session.execute(f'DROP TEMPORARY TABLE IF EXISTS {staging.name}')
+    session.execute(CreateTable(staging))
+
+    LOGGER.debug('Loading the pairs into the staging table.')
+    sql_insert_batches(session, staging,
+                       ({'wordform_id': wordform_id, 'anahash_id': anahash_id}
+                        for wordform_id, anahash_id in zip(pairs['wordform_id'].tolist(),
+                                                           pairs['anahash_id'].tolist())),
+                       total=pairs.shape[0], batch_size=batch_size)
+
+    LOGGER.debug('Adding the connections wordform -> anahash_id.')
+    session.execute(f"""
+UPDATE wordforms
+JOIN {staging.name} ON wordforms.wordform_id = {staging.name}.wordform_id
+SET wordforms.anahash_id = {staging.name}.anahash_id
+    """)
+    session.execute(f'DROP TEMPORARY TABLE {staging.name}')
+
+    LOGGER.info('Added the anahash of %s wordforms.', pairs.shape[0])
+
+    return pairs.shape[0]
+
+
+def iterate_wordforms_without_anahash(session, batch_size=500000):
+    """Generator that yields lists of at most `batch_size` wordforms without anahash.
 
-        update_statement = Wordform.__table__.update(). \
-            where(Wordform.wordform_id == bindparam('wf_id')). \
-            values(anahash_id=bindparam('a_id'))
+    The wordforms are read with a server-side cursor, so they are streamed to
+    the client instead of being exported to a file on the database server.
+    """
+    q = select([Wordform.wordform]).where(Wordform.anahash_id.is_(None))
+    result = session.connection().execution_options(stream_results=True).execute(q)
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [row[0] for row in rows]
+    finally:
+        result.close()
 
-        LOGGER.debug('Adding the connections wordform -> anahash_id.')
-        sql_query_batches(session, update_statement, read_json_lines(anahash_to_wf_file),
-                          total_lines_written, batch_size)
 
-    LOGGER.info('Added the anahash of %s wordforms.', total_lines_written)
+def ticcl_anahash_file(alphabet_file, file_path):
+    """Run TICCL-anahash on a file of wordforms and return the path of its output.
 
-    return total_lines_written
+    `file_path` contains a wordform and a frequency (separated by a tab) per
+    line; the output file contains a wordform and its anahash per line.
+    """
+    try:
+        sh.TICCL_anahash(['--list', '--alph', alphabet_file, file_path])
+    except sh.ErrorReturnCode as exception:
+        raise ValueError('Running TICCL-anahash failed: {}'.format(exception.stdout))
+    return file_path + '.list'
 
 
-def update_anahashes_new(session, alphabet_file):
+def update_anahashes_new(session, alphabet_file, batch_size=500000, workers=None):
     """
     Add anahashes for all wordforms that do not have an anahash value yet.
 
     Requires ticcl to be installed!
 
+    The wordforms are streamed to the client in chunks of `batch_size` (see
+    `iterate_wordforms_without_anahash`) and written to local files, which
+    are hashed by TICCL-anahash in a pool of `workers` threads while the
+    export continues. The hashed chunks are loaded into a temporary table
+    with ``LOAD DATA LOCAL`` as soon as the export is done, while the
+    remaining chunks are still being hashed. So the database server doesn't
+    need access to the files of the ingest process.
+
     Inputs:
         session: SQLAlchemy session object.
         alphabet_file (str): the path to the alphabet file for ticcl.
+        batch_size (int): number of wordforms per chunk.
+        workers (int): number of TICCL-anahash processes that run concurrently
+            (default: the number of CPUs).
     """
-    tmp_file_path = str(Path(tempfile.tempdir) / 'mysql/wordforms.csv')
-
-    LOGGER.info("Exporting wordforms to file")
-    if os.path.exists(tmp_file_path):
-        os.remove(tmp_file_path)
-
-    session.execute(f"""
-SELECT wordform, 1 INTO OUTFILE '{tmp_file_path}'
-FIELDS TERMINATED BY '\t' LINES TERMINATED BY '\n'
-FROM wordforms
-WHERE anahash_id IS NULL;
-    """)
-
-    LOGGER.info("Generating anahashes")
-    try:
-        sh.TICCL_anahash(['--list', '--alph', alphabet_file, tmp_file_path])
-    except sh.ErrorReturnCode as exception:
-        raise ValueError('Running TICCL-anahash failed: {}'.format(exception.stdout))
-
-    ticcled_file_path = tmp_file_path + '.list'
-
     # drop old table if it's there
-    session.execute("DROP TABLE IF EXISTS ticcl_import")
+    session.execute("DROP TEMPORARY TABLE IF EXISTS ticcl_import")
 
     # create temp table
     session.execute("""
@@ -389,15 +439,26 @@ CREATE TEMPORARY TABLE ticcl_import (
 );
     """)
 
-    LOGGER.info("Loading ticcled file into temp table")
-    session.execute("""
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        LOGGER.info("Exporting wordforms and generating anahashes")
+        futures = []
+        for i, wordforms in enumerate(iterate_wordforms_without_anahash(session, batch_size=batch_size)):
+            file_path = os.path.join(tmp_dir, f'wordforms_{i}.csv')
+            with open(file_path, 'w', encoding='utf-8') as chunk_file:
+                for wordform in wordforms:
+                    chunk_file.write(f'{wordform}\t1\n')
+            futures.append(executor.submit(ticcl_anahash_file, alphabet_file, file_path))
+
+        # the export has to be finished before loading, because the temporary
+        # table and the server-side cursor share the session's connection
+        LOGGER.info("Loading ticcled files into temp table")
+        for future in tqdm(as_completed(futures), total=len(futures), mininterval=2.0):
+            session.execute("""
 LOAD DATA LOCAL INFILE :file_path INTO TABLE ticcl_import
-FIELDS TERMINATED BY '\t' LINES TERMINATED BY '\n'
+FIELDS TERMINATED BY '\t' ESCAPED BY '' LINES TERMINATED BY '\n'
 (wordform, anahash)
-    """, {'file_path': ticcled_file_path})
-
-    if os.path.exists(tmp_file_path):
-        os.remove(tmp_file_path)
+            """, {'file_path': future.result()})
 
     LOGGER.info("Storing new anahashes")
     session.execute("""INSERT IGNORE INTO anahashes(anahash) SELECT anahash FROM ticcl_import""")
@@ -410,6 +471,8 @@ LEFT JOIN anahashes ON ticcl_import.anahash = anahashes.anahash
 SET wordforms.anahash_id = anahashes.anahash_id WHERE 1
     """)
 
+    session.execute("DROP TEMPORARY TABLE ticcl_import")
+
 
 def update_anahashes(session, alphabet_file, tqdm_factory=None, batch_size=50000):
     """Add anahashes for all wordforms that do not have an anahash value yet.
@@ -427,7 +490,7 @@ def update_anahashes(session, alphabet_file, tqdm_factory=None, batch_size=50000
         LOGGER.info('All wordforms have an anahash value.')
         return
 
-    wf_mapping = df['wordform_id'].to_dict(defaultdict(int))
+    wf_mapping = WordformMapping(df.index, df['wordform_id'])
 
     anahashes = anahash_df(df[['frequency']], alphabet_file)
 
@@ -455,9 +518,10 @@ def write_wf_links_data(session, wf_mapping, links_df, wf_from_name,
     num_wf_links = 0
     num_wf_link_sources = 0
     wf_links = defaultdict(bool)
-    for _, row in tqdm(links_df.iterrows(), total=links_df.shape[0]):
-        wf_from = wf_mapping[row[wf_from_name]]
-        wf_to = wf_mapping[row[wf_to_name]]
+    wf_from_ids = map_wordforms(wf_mapping, links_df[wf_from_name]).tolist()
+    wf_to_ids = map_wordforms(wf_mapping, links_df[wf_to_name]).tolist()
+    for (_, row), wf_from, wf_to in zip(tqdm(links_df.iterrows(), total=links_df.shape[0]),
+                                        wf_from_ids, wf_to_ids):
 
         # Don't add links to self! and keep track of what was added,
         # because duplicates may occur
@@ -560,9 +624,12 @@ def add_lexicon_with_links(session, lexicon_name, vocabulary, wfs, from_column,
     return lexicon
 
 
-def add_morphological_paradigms(session, in_file):
+def add_morphological_paradigms(session, in_file, table_object=MorphologicalParadigm):
     """
     Add morphological paradigms to database from CSV file.
+
+    The paradigms are inserted into `table_object`, which can also be a shadow
+    table of morphological_paradigms (see `shadow_table`).
     """
     data = pd.read_csv(in_file, sep='\t', index_col=False,
                        names=['wordform', 'corpus_freq', 'component_codes',
@@ -595,7 +662,7 @@ def add_morphological_paradigms(session, in_file):
         total_lines_written = write_json_lines(mp_file, morph_iterator(morph_paradigms_per_wordform, mapping))
         LOGGER.info('Wrote %s morphological variants.', total_lines_written)
         LOGGER.info('Inserting morphological variants to the database.')
-        sql_insert_batches(session, MorphologicalParadigm,
+        sql_insert_batches(session, table_object,
                            read_json_lines(mp_file), batch_size=50000)
 
 
@@ -627,6 +694,80 @@ def create_ticclat_database(delete_existing=False):
 
     # create tables
     Base.metadata.create_all(engine)
+    partition_text_attestations(engine)
+
+
+def partition_text_attestations(session):
+    """
+    Partition the text_attestations table by corpus.
+
+    Corpus-scoped queries that filter on `TextAttestation.corpus_id` then only
+    read the partition of the corpus, and the attestations of a corpus can be
+    removed by dropping its partition (see `drop_corpus_attestations`).
+
+    The corpus ids of existing attestations are filled in from
+    corpusId_x_documentId (attestations of documents without a corpus get
+    corpus id 0). Because MySQL does not support foreign keys on partitioned
+    tables, and every unique key must contain the partitioning column, the
+    foreign keys are dropped (their indexes are kept) and corpus_id is added
+    to the primary key. There is a LIST partition per corpus; `add_corpus_core`
+    adds the partitions of new corpora.
+    """
+    if text_attestations_partitions(session):
+        LOGGER.info('Table text_attestations is already partitioned.')
+        return
+
+    LOGGER.info('Filling in the corpus ids of the text attestations.')
+    session.execute("""
+UPDATE text_attestations ta JOIN corpusId_x_documentId cIxdI ON ta.document_id = cIxdI.document_id
+SET ta.corpus_id = cIxdI.corpus_id
+WHERE ta.corpus_id IS NULL
+    """)
+    session.execute('UPDATE text_attestations SET corpus_id = 0 WHERE corpus_id IS NULL')
+
+    foreign_keys = session.execute("""
+SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'text_attestations' AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+    """).fetchall()
+    for (name,) in foreign_keys:
+        session.execute(f'ALTER TABLE text_attestations DROP FOREIGN KEY `{name}`')
+    primary_key = [row[0] for row in session.execute("""
+SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'text_attestations' AND CONSTRAINT_NAME = 'PRIMARY'
+ORDER BY ORDINAL_POSITION
+    """)]
+    session.execute(f'ALTER TABLE text_attestations MODIFY corpus_id BIGINT NOT NULL, '
+                    f'DROP PRIMARY KEY, ADD PRIMARY KEY ({", ".join(primary_key + ["corpus_id"])})')
+
+    corpus_ids = [0] + [row[0] for row in session.execute(select([Corpus.corpus_id]).order_by(Corpus.corpus_id))]
+    LOGGER.info('Partitioning text_attestations by corpus (%s partitions).', len(corpus_ids))
+    partitions = ', '.join(f'PARTITION p{corpus_id} VALUES IN ({corpus_id})' for corpus_id in corpus_ids)
+    session.execute(f'ALTER TABLE text_attestations PARTITION BY LIST (corpus_id) ({partitions})')
+
+
+def drop_corpus_attestations(session, corpus_id):
+    """
+    Remove the text attestations of corpus `corpus_id` (e.g. to re-ingest it).
+
+    The frequencies of the attestations are subtracted from the
+    wordform_frequency table. If text_attestations is partitioned, the
+    partition of the corpus is dropped, which is much faster than deleting
+    the rows.
+    """
+    LOGGER.info('Subtracting the frequencies of corpus %s from wordform_frequency.', corpus_id)
+    q = select([TextAttestation.wordform_id, Wordform.wordform, func.sum(TextAttestation.frequency)]) \
+        .select_from(TextAttestation.__table__.join(Wordform)) \
+        .where(TextAttestation.corpus_id == corpus_id) \
+        .group_by(TextAttestation.wordform_id, Wordform.wordform)
+    merge_wordform_frequencies(session, ({'wordform_id': wordform_id, 'wordform': wordform, 'frequency': -int(frequency or 0)}
+                                         for wordform_id, wordform, frequency in session.execute(q).fetchall()))
+
+    if f'p{corpus_id}' in text_attestations_partitions(session):
+        LOGGER.info('Dropping partition of corpus %s.', corpus_id)
+        session.execute(f'ALTER TABLE text_attestations DROP PARTITION p{int(corpus_id)}')
+    else:
+        LOGGER.info('Deleting the text attestations of corpus %s.', corpus_id)
+        session.execute(TextAttestation.__table__.delete().where(TextAttestation.corpus_id == corpus_id))
 
 
 def empty_table(session, table_class):
@@ -646,30 +787,182 @@ def empty_table(session, table_class):
                                  tables=[table_class.__table__])
 
 
+@contextmanager
+def shadow_table(session, table_class, expected_rows=None, min_rows=1, max_shrink=0.5):
+    """
+    Rebuild a database table in a shadow table and swap it with the live table.
+
+    Yields a copy of the table (named ``<table>_new``, without its secondary
+    indexes) to load the new data into. When the block is done, the indexes
+    are built, the number of rows is validated and the shadow table replaces
+    the live table in a single (atomic) ``RENAME TABLE`` statement. The live
+    table can be queried during the whole rebuild. If loading or validating
+    fails, the shadow table is dropped and the live table is left untouched.
+
+    Note that MySQL commits the transaction of the session when creating the
+    shadow table, and again when swapping the tables.
+
+    - table_class: the ticclat_schema class corresponding to the table
+    - expected_rows: if not None, the exact number of rows the new table
+      should have (`min_rows` and `max_shrink` are then not checked)
+    - min_rows: the minimum number of rows the new table should have
+    - max_shrink: maximum fraction of rows the new table can have less than
+      the live table (to detect truncated input)
+    """
+    table = table_class.__table__
+    # Make sure the table exists (create it if it doesn't)
+    Base.metadata.create_all(session.get_bind(), tables=[table])
+
+    # copy the table (and the tables its foreign keys refer to, so these can
+    # be compiled) to a separate MetaData object, with the new name; the
+    # indexes are created after loading the data
+    metadata = MetaData()
+    for foreign_key in table.foreign_keys:
+        foreign_key.column.table.tometadata(metadata)
+    shadow = table.tometadata(metadata, name=f'{table.name}_new')
+    old_name = f'{table.name}_old'
+
+    session.execute(f'DROP TABLE IF EXISTS {shadow.name}, {old_name}')
+    session.execute(CreateTable(shadow))
+    try:
+        yield shadow
+
+        LOGGER.info('Building the indexes of table "%s".', shadow.name)
+        for index in table.indexes:
+            # keep the names of the indexes of the live table
+            session.execute(CreateIndex(Index(index.name, *[shadow.c[column.name] for column in index.columns],
+                                              unique=index.unique)))
+
+        num_rows = session.execute(select([func.count()]).select_from(shadow)).scalar()
+        num_live_rows = session.execute(select([func.count()]).select_from(table)).scalar()
+        LOGGER.info('Table "%s" has %s rows (%s rows in "%s").', shadow.name,
+                    num_rows, num_live_rows, table.name)
+        if expected_rows is not None:
+            if num_rows != expected_rows:
+                raise ValueError(f'Table "{shadow.name}" has {num_rows} rows, expected {expected_rows}.')
+        elif num_rows < min_rows:
+            raise ValueError(f'Table "{shadow.name}" has {num_rows} rows, expected at least {min_rows}.')
+        elif num_rows < (1 - max_shrink) * num_live_rows:
+            raise ValueError(f'Table "{shadow.name}" has {num_rows} rows, '
+                             f'much less than the {num_live_rows} rows in "{table.name}".')
+    except:  # noqa: E722
+        session.execute(f'DROP TABLE IF EXISTS {shadow.name}')
+        raise
+
+    LOGGER.info('Swapping tables "%s" and "%s".', shadow.name, table.name)
+    session.execute(f'RENAME TABLE {table.name} TO {old_name}, {shadow.name} TO {table.name}')
+    session.execute(f'DROP TABLE {old_name}')
+
+
 def create_wf_frequencies_table(session):
     """
     Create wordform_frequencies table in the database.
 
     The text_attestations frequencies are summed and stored in this table.
     This can be used to save time when needing total-database frequencies.
+
+    `add_corpus_core` and `add_lexicon` keep the table up to date
+    incrementally, so this (slow) full rebuild is only needed once for an
+    existing database, or to reconcile the table with text_attestations.
     """
     LOGGER.info('Creating wordform_frequencies table.')
-    # Make sure the wordform_frequency table exists (create it if it doesn't)
-    Base.metadata.create_all(session.get_bind(),
-                             tables=[WordformFrequencies.__table__])
-
-    empty_table(session, WordformFrequencies)
+    num_wordforms = session.query(Wordform).count()
 
-    session.execute("""
-INSERT INTO wordform_frequency
+    # the table is rebuilt in a shadow table, with one row per wordform
+    with shadow_table(session, WordformFrequencies, expected_rows=num_wordforms) as table:
+        session.execute(f"""
+INSERT INTO {table.name}
 SELECT
        wordforms.wordform_id,
        wordforms.wordform,
-       SUM(frequency) AS frequency
+       COALESCE(SUM(frequency), 0) AS frequency
 FROM
      wordforms LEFT JOIN text_attestations ta ON wordforms.wordform_id = ta.wordform_id
 GROUP BY wordforms.wordform, wordforms.wordform_id
-    """)
+        """)
+
+
+def create_wordform_stats_table(session):
+    """
+    Create wordform_stats table in the database.
+
+    For all wordforms in the morphological paradigms, the number of corpora
+    and lexica the wordform occurs in, the range of years it is attested in,
+    the number of paradigms it is part of and its total frequency are stored
+    in this table. Each statistic is aggregated in a separate subquery, to
+    avoid aggregating over the cross product of attestations, lexica and
+    paradigms.
+
+    Run this after ingesting corpora, lexica and morphological paradigms.
+    """
+    LOGGER.info('Creating wordform_stats table.')
+    num_wordforms = session.execute(
+        select([func.count(MorphologicalParadigm.wordform_id.distinct())])).scalar()
+
+    # the table is rebuilt in a shadow table, with one row per wordform in the paradigms
+    with shadow_table(session, WordformStats, expected_rows=num_wordforms) as table:
+        session.execute(f"""
+INSERT INTO {table.name}(wordform_id, num_corpora, num_lexica, min_year, max_year, num_paradigms, frequency)
+SELECT p.wordform_id,
+       COALESCE(c.num_corpora, 0),
+       COALESCE(l.num_lexica, 0),
+       a.min_year,
+       a.max_year,
+       p.num_paradigms,
+       COALESCE(a.frequency, 0)
+FROM (SELECT wordform_id, COUNT(DISTINCT Z, Y, X, W) AS num_paradigms
+      FROM morphological_paradigms
+      GROUP BY wordform_id) AS p
+         LEFT JOIN (SELECT ta.wordform_id,
+                           SUM(ta.frequency) AS frequency,
+                           MIN(CASE
+                                   WHEN d.pub_year IS NOT NULL THEN d.pub_year
+                                   ELSE ROUND((d.year_from + d.year_to) / 2)
+                               END) AS min_year,
+                           MAX(CASE
+                                   WHEN d.pub_year IS NOT NULL THEN d.pub_year
+                                   ELSE ROUND((d.year_from + d.year_to) / 2)
+                               END) AS max_year
+                    FROM text_attestations ta
+                             LEFT JOIN documents d ON ta.document_id = d.document_id
+                    WHERE ta.wordform_id IN (SELECT wordform_id FROM morphological_paradigms)
+                    GROUP BY ta.wordform_id) AS a ON p.wordform_id = a.wordform_id
+         LEFT JOIN (SELECT ta.wordform_id, COUNT(DISTINCT cIxdI.corpus_id) AS num_corpora
+                    FROM text_attestations ta
+                             JOIN corpusId_x_documentId cIxdI ON ta.document_id = cIxdI.document_id
+                    WHERE ta.wordform_id IN (SELECT wordform_id FROM morphological_paradigms)
+                    GROUP BY ta.wordform_id) AS c ON p.wordform_id = c.wordform_id
+         LEFT JOIN (SELECT wordform_id, COUNT(DISTINCT lexicon_id) AS num_lexica
+                    FROM lexical_source_wordform
+                    GROUP BY wordform_id) AS l ON p.wordform_id = l.wordform_id
+        """)
+
+
+def bump_database_generation(session):
+    """
+    Increase the generation counter in the database_version table.
+
+    Call this after data has been ingested, so caches of query results (e.g.
+    in the Flask app) know their contents are outdated.
+
+    Returns:
+        int: the new generation.
+    """
+    # Make sure the database_version table exists (create it if it doesn't)
+    Base.metadata.create_all(session.get_bind(),
+                             tables=[DatabaseVersion.__table__])
+
+    version = session.query(DatabaseVersion).first()
+    if version is None:
+        version = DatabaseVersion(generation=0)
+        session.add(version)
+    version.generation += 1
+    version.updated_at = datetime.datetime.utcnow()
+    session.flush()
+
+    LOGGER.info('Database generation is now %s.', version.generation)
+
+    return version.generation
 
 
 def add_ticcl_variants(session, name, df, **kwargs):
@@ -0,0 +1,165 @@
+"""
+Export corpora from the TICCLAT database to sparse term-document matrices.
+
+This is the inverse of `ticclat.sacoreutils.add_corpus_core`: the text
+attestations of a corpus are read with a server-side cursor and assembled
+into a `scipy.sparse.csr_matrix` (documents x wordforms), together with the
+metadata of the documents (in the order of the rows) and the vocabulary (in
+the order of the columns)::
+
+    corpus = export_corpus(session, 'SoNaR500')
+    save_corpus_matrix('sonar.npz', corpus)
+    corpus = load_corpus_matrix('sonar.npz')
+
+A `CorpusMatrix` can be passed as the `vectorizer` of `add_corpus_core`.
+"""
+
+import io
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from sqlalchemy import select, func
+
+from ticclat.ticclat_schema import Corpus, Document, TextAttestation, Wordform, corpusId_x_documentId
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class CorpusMatrix:
+    """Term-document matrix of a corpus, with its document metadata and vocabulary.
+
+    Attributes:
+        matrix: sparse matrix of wordform frequencies (documents x wordforms).
+        documents: dataframe with the metadata of the documents (one row per
+            row of `matrix`, including the ``document_id``).
+        wordforms: list of the wordforms of the columns of `matrix`.
+        wordform_ids: array with the database ids of the wordforms.
+    """
+
+    matrix: scipy.sparse.csr_matrix
+    documents: pd.DataFrame
+    wordforms: list
+    wordform_ids: np.ndarray
+
+    @property
+    def vocabulary_(self) -> dict:
+        """Mapping of wordforms to column indices (like the scikit-learn vectorizers)."""
+        return {wordform: i for i, wordform in enumerate(self.wordforms)}
+
+
+def _corpus_id(session, corpus_name):
+    corpus_id = session.execute(select([Corpus.corpus_id]).where(Corpus.name == corpus_name)).scalar()
+    if corpus_id is None:
+        raise ValueError(f'Corpus "{corpus_name}" does not exist.')
+    return corpus_id
+
+
+def iterate_attestations(connection, corpus_id, batch_size=100000):
+    """Generator that yields the text attestations of a corpus as arrays.
+
+    The attestations are read with a server-side cursor, ordered by document.
+
+    Yields:
+        (document_ids, wordform_ids, frequencies) arrays of at most
+        `batch_size` attestations.
+    """
+    q = select([TextAttestation.document_id, TextAttestation.wordform_id,
+                func.coalesce(TextAttestation.frequency, 0)]) \
+        .where(TextAttestation.corpus_id == corpus_id) \
+        .order_by(TextAttestation.document_id)
+    result = connection.execution_options(stream_results=True).execute(q)
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = np.array(rows, dtype=np.int64).reshape(-1, 3)
+            yield batch[:, 0], batch[:, 1], batch[:, 2]
+    finally:
+        result.close()
+
+
+def _document_rows(document_ids, doc_ids, corpus_name):
+    """Return the indices of `doc_ids` in the (sorted) array `document_ids`."""
+    rows = np.searchsorted(document_ids, doc_ids)
+    found = rows < len(document_ids)
+    found[found] = document_ids[rows[found]] == doc_ids[found]
+    if not found.all():
+        missing = np.unique(doc_ids[~found])
+        raise ValueError(f'Corpus "{corpus_name}" has text attestations of documents that are '
+                         f'not in the corpus (document ids {missing[:10].tolist()}).')
+    return rows
+
+
+def export_corpus(session, corpus_name, batch_size=100000) -> CorpusMatrix:
+    """Export corpus `corpus_name` to a term-document matrix.
+
+    The rows of the matrix are the documents of the corpus ordered by
+    ``document_id`` (as added by `add_corpus_core`); the columns are the
+    wordforms that occur in the corpus, ordered by ``wordform_id``.
+    """
+    corpus_id = _corpus_id(session, corpus_name)
+    connection = session.connection()
+
+    LOGGER.info('Reading the documents')
+    documents = pd.read_sql(select([Document.__table__])
+                            .select_from(Document.__table__.join(corpusId_x_documentId))
+                            .where(corpusId_x_documentId.c.corpus_id == corpus_id)
+                            .order_by(Document.document_id), connection)
+    document_ids = documents['document_id'].to_numpy()
+
+    LOGGER.info('Reading the text attestations')
+    rows, columns, frequencies = [], [], []
+    for doc_ids, wf_ids, freqs in iterate_attestations(connection, corpus_id, batch_size):
+        rows.append(_document_rows(document_ids, doc_ids, corpus_name))
+        columns.append(wf_ids)
+        frequencies.append(freqs)
+    rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+    columns = np.concatenate(columns) if columns else np.array([], dtype=np.int64)
+    frequencies = np.concatenate(frequencies) if frequencies else np.array([], dtype=np.int64)
+
+    # map the wordform ids to column indices
+    wordform_ids, columns = np.unique(columns, return_inverse=True)
+
+    LOGGER.info('Reading the vocabulary')
+    q = select([Wordform.wordform_id, Wordform.wordform]) \
+        .where(Wordform.wordform_id.in_(
+            select([TextAttestation.wordform_id])
+            .where(TextAttestation.corpus_id == corpus_id))) \
+        .order_by(Wordform.wordform_id)
+    vocabulary = dict(connection.execute(q).fetchall())
+
+    matrix = scipy.sparse.csr_matrix((frequencies, (rows, columns.ravel())),
+                                     shape=(len(document_ids), len(wordform_ids)))
+    return CorpusMatrix(matrix=matrix, documents=documents,
+                        wordforms=[vocabulary[wf_id] for wf_id in wordform_ids.tolist()],
+                        wordform_ids=wordform_ids)
+
+
+def save_corpus_matrix(path, corpus: CorpusMatrix) -> None:
+    """Save `corpus` to a (compressed) ``.npz`` file.
+
+    The file is compatible with `scipy.sparse.load_npz` (which only reads
+    the matrix); use `load_corpus_matrix` to read everything.
+    """
+    matrix = corpus.matrix.tocsr()
+    np.savez_compressed(path, format=b'csr', shape=matrix.shape, data=matrix.data,
+                        indices=matrix.indices, indptr=matrix.indptr,
+                        wordforms=np.array(corpus.wordforms, dtype=str),
+                        wordform_ids=corpus.wordform_ids,
+                        documents=np.array(corpus.documents.to_json(orient='table', index=False)))
+
+
+def load_corpus_matrix(path) -> CorpusMatrix:
+    """Load a corpus saved with `save_corpus_matrix`."""
+    with np.load(path, allow_pickle=False) as loaded:
+        matrix = scipy.sparse.csr_matrix((loaded['data'], loaded['indices'], loaded['indptr']),
+                                         shape=tuple(loaded['shape']))
+        documents = pd.read_json(io.StringIO(str(loaded['documents'])), orient='table')
+        return CorpusMatrix(matrix=matrix, documents=documents,
+                            wordforms=loaded['wordforms'].tolist(),
+                            wordform_ids=loaded['wordform_ids'])
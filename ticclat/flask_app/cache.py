@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""Contains the :class:`QueryCache` class and a 'singleton' instance called `query_cache`.
+
+Most of the data served by the Flask app only changes when data is ingested
+(see :mod:`ticclat.ingest`). Ingestion increases the generation counter in the
+``database_version`` table (:func:`ticclat.dbutils.bump_database_generation`),
+and every cache key contains the generation, so cached results are
+invalidated as soon as new data is ingested. Cache keys also contain the URL
+of the database the session is bound to, so results (and generations) of
+different databases, e.g. a snapshot (:mod:`ticclat.snapshot`) and the live
+database, are never mixed up.
+
+The cache is a (per process) LRU cache with a time-to-live. Optionally, a
+shared backend can be added that is checked when a result is not found in the
+local cache, so results can be shared between gunicorn workers (and survive
+worker restarts caused by ``--max-requests``).
+
+The cache is configured using environment variables:
+
+- ``TICCLAT_CACHE_SIZE``: maximum number of entries in the local cache (default
+  1024, 0 disables caching);
+- ``TICCLAT_CACHE_TTL``: time-to-live of entries in seconds (default 3600);
+- ``TICCLAT_CACHE_CHECK_INTERVAL``: number of seconds between checks of the
+  database generation (default 10);
+- ``TICCLAT_CACHE_DIR``: directory for the shared :class:`FileCacheBackend`
+  (default: no shared backend).
+"""
+import copy
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from flask import request, Response
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from ticclat.flask_app.db import database
+from ticclat.ticclat_schema import DatabaseVersion
+
+logger = logging.getLogger(__name__)
+
+# returned by QueryCache.get for keys that are not in the cache (None can be a cached value)
+_MISSING = object()
+
+
+def get_database_version(session):
+    """Get the generation and the time of the last update of the database.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): SQLAlchemy session object.
+
+    Returns:
+        generation (int): 0 if no data was ingested (yet)
+        updated_at (datetime.datetime or None): UTC time of the last update
+    """
+    q = select([DatabaseVersion.generation, DatabaseVersion.updated_at]) \
+        .order_by(DatabaseVersion.database_version_id).limit(1)
+    row = session.execute(q).fetchone()
+    if row is None:
+        return 0, None
+    return int(row.generation), row.updated_at
+
+
+class FileCacheBackend:
+    """Shared cache backend that stores pickled values in a directory.
+
+    Writes are atomic (a temporary file is renamed), so multiple processes can
+    use the same directory. Any object with the same ``get``/``set``/``clear``
+    methods (e.g. a thin wrapper around a Redis client) can be used instead.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, key: str) -> Path:
+        return self.path / hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, ttl: float):
+        """Return the value stored for `key`, or None if it is missing or expired."""
+        file_name = self._file(key)
+        try:
+            if time.time() - file_name.stat().st_mtime > ttl:
+                return None
+            with open(file_name, 'rb') as file_handle:
+                return pickle.load(file_handle)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+
+    def set(self, key: str, value) -> None:
+        """Store `value` for `key`."""
+        file_handle, tmp_name = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(file_handle, 'wb') as tmp_file:
+            pickle.dump(value, tmp_file)
+        os.replace(tmp_name, self._file(key))
+
+    def clear(self) -> None:
+        """Remove all stored values."""
+        for file_name in self.path.iterdir():
+            file_name.unlink()
+
+
+def _bind_url(session) -> str:
+    """Return the URL (without password) of the database `session` is bound to."""
+    return repr(session.get_bind().engine.url)
+
+
+@dataclass
+class QueryCache:
+    """LRU/TTL cache for query results, invalidated by the database generation.
+
+    Note:
+        There should only be one instance (also in this module, called `query_cache`).
+    """
+
+    max_size: int = 1024
+    ttl: float = 3600
+    check_interval: float = 10
+    backend: object = None
+    hits: int = 0
+    misses: int = 0
+    _entries: OrderedDict = field(default_factory=OrderedDict)
+    # database URL -> (generation, updated_at, time of the last check)
+    _generations: dict = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def setup(self, max_size: int = None, ttl: float = None,
+              check_interval: float = None, backend=None) -> None:
+        """Configure the cache and empty it.
+
+        Values that are not provided are read from the ``TICCLAT_CACHE_*``
+        environment variables (see the module documentation).
+        """
+        env = os.environ.get
+        self.max_size = int(env('TICCLAT_CACHE_SIZE', 1024)) if max_size is None else max_size
+        self.ttl = float(env('TICCLAT_CACHE_TTL', 3600)) if ttl is None else ttl
+        self.check_interval = float(env('TICCLAT_CACHE_CHECK_INTERVAL', 10)) \
+            if check_interval is None else check_interval
+        if backend is None and env('TICCLAT_CACHE_DIR'):
+            backend = FileCacheBackend(env('TICCLAT_CACHE_DIR'))
+        self.backend = backend
+        self.clear()
+
+    def clear(self) -> None:
+        """Empty the local cache and reset the counters and generation."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self._generations.clear()
+
+    @property
+    def enabled(self) -> bool:
+        """True if results should be cached."""
+        return self.max_size > 0
+
+    def _version(self, session):
+        """Return the URL, generation and update time of the database of `session`.
+
+        The database is queried at most once every `check_interval` seconds.
+        If the generation changed, the local cache entries of the database are
+        removed.
+        """
+        if session is None:
+            session = database.session
+        url = _bind_url(session)
+        now = time.monotonic()
+        version = self._generations.get(url)
+        if version is not None and now - version[2] < self.check_interval:
+            return url, version[0], version[1]
+
+        try:
+            generation, updated_at = get_database_version(session)
+        except SQLAlchemyError as exception:
+            logger.warning(f'Could not read the database generation: {exception}')
+            generation, updated_at = 0, None
+
+        with self._lock:
+            if version is not None and generation != version[0]:
+                prefix = f'{url}:'
+                for full_key in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[full_key]
+            self._generations[url] = (generation, updated_at, now)
+        return url, generation, updated_at
+
+    def generation(self, session=None) -> int:
+        """Return the generation of the database of `session` (default: the session of the app).
+
+        The database is queried at most once every `check_interval` seconds.
+        If the generation changed, the cached results of the database are removed.
+        """
+        return self._version(session)[1]
+
+    def last_modified(self, session=None):
+        """Return the (UTC) time of the last update of the database, or None if unknown.
+
+        Like :meth:`generation`, the database is queried at most once every
+        `check_interval` seconds.
+        """
+        return self._version(session)[2]
+
+    def _key(self, session, key) -> str:
+        url, generation, _ = self._version(session)
+        return f'{url}:{generation}:{key!r}'
+
+    def get(self, key, session=None, default=None):
+        """Return the cached value for `key`, or `default` if it is not in the cache.
+
+        Args:
+            key: hashable and ``repr``-able identifier of the value (e.g. a tuple
+                of the function name and its arguments).
+            session: SQLAlchemy session used to check the database generation
+                (default: the session of the app).
+        """
+        if not self.enabled:
+            return default
+
+        full_key = self._key(session, key)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[1]
+
+        value = _MISSING
+        if self.backend is not None:
+            # the backend returns None for missing keys
+            backend_value = self.backend.get(full_key, self.ttl)
+            if backend_value is not None:
+                value = backend_value
+
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._store(full_key, value, now)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, session=None) -> None:
+        """Store `value` for `key` in the local cache (and the shared backend)."""
+        if not self.enabled:
+            return
+
+        full_key = self._key(session, key)
+        if self.backend is not None:
+            self.backend.set(full_key, value)
+        with self._lock:
+            self._store(full_key, value, time.monotonic())
+
+    def _store(self, full_key, value, now) -> None:
+        self._entries[full_key] = (now, value)
+        self._entries.move_to_end(full_key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, session=None):
+        """Return the cached value for `key`, or call `compute()` and cache its result.
+
+        Args:
+            key: see :meth:`get`.
+            compute: function without arguments that returns the value.
+            session: see :meth:`get`.
+        """
+        value = self.get(key, session, default=_MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, session)
+        return value
+
+    def memoize(self, func):
+        """Decorator that caches the result of a query function.
+
+        The first argument of the function must be the SQLAlchemy session; the
+        other arguments are part of the cache key. Every call returns a (deep)
+        copy of the cached result, so callers can modify it (e.g. add columns
+        to a DataFrame) without changing the cached value.
+        """
+        @functools.wraps(func)
+        def wrapper(session, *args, **kwargs):
+            key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            return copy.deepcopy(self.get_or_compute(key, lambda: func(session, *args, **kwargs), session))
+        return wrapper
+
+    def cached_response(self, view):
+        """Decorator that caches the body of successful responses of a route.
+
+        The cache key is the full path (including query string) of the request.
+        Streamed responses are not cached.
+        """
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = ('response', request.full_path, request.accept_mimetypes.to_header())
+            cached = self.get(key)
+            if cached is not None:
+                status, headers, data = cached
+                return Response(data, status=status, headers=headers)
+
+            response = view(*args, **kwargs)
+            if response.status_code == 200 and not response.is_streamed:
+                self.set(key, (response.status_code, list(response.headers.items()), response.get_data()))
+            return response
+        return wrapper
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the size of the cache."""
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'generations': {url: version[0] for url, version in self._generations.items()},
+            'shared_backend': type(self.backend).__name__ if self.backend is not None else None,
+        }
+
+
+# The global query cache 'singleton'
+query_cache: QueryCache = QueryCache()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""HTTP conditional responses for the read-only routes of the Flask app.
+
+The data served by the app only changes when data is ingested, which increases
+the generation in the ``database_version`` table. The ETag of a response is
+derived from this generation and the request (path, query string and
+``Accept`` header), and the Last-Modified header is the time of the last
+ingestion. Because the ETag can be computed without running any query,
+requests with a matching ``If-None-Match`` (or ``If-Modified-Since``) header
+are answered with ``304 Not Modified`` before the route itself runs.
+
+The ``Cache-Control`` header of these responses can be set using the
+environment variable ``TICCLAT_CACHE_CONTROL`` (default:
+``public, max-age=60``).
+"""
+import calendar
+import hashlib
+import os
+
+from flask import current_app, request, g
+
+from ticclat.flask_app.cache import query_cache
+
+# endpoints that return data that does not (only) depend on the database version
+UNCACHED_ENDPOINTS = {'static', 'cache_stats', '_metrics', 'slow_queries'}
+
+
+def _is_cacheable_request() -> bool:
+    return request.method in ('GET', 'HEAD') and request.endpoint is not None \
+        and request.endpoint not in UNCACHED_ENDPOINTS
+
+
+def _etag() -> str:
+    variant = f'{request.full_path}\n{request.headers.get("Accept", "")}'
+    digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:16]
+    return f'g{query_cache.generation()}-{digest}'
+
+
+def _timestamp(date_time) -> int:
+    # naive datetimes in the database are UTC
+    return calendar.timegm(date_time.utctimetuple())
+
+
+def _add_validators(response):
+    response.set_etag(g.etag, weak=True)
+    if g.last_modified is not None:
+        response.last_modified = g.last_modified
+    response.headers['Cache-Control'] = os.environ.get('TICCLAT_CACHE_CONTROL', 'public, max-age=60')
+    response.vary.add('Accept')
+    return response
+
+
+def check_not_modified():
+    """Return a 304 response if the client already has the current version."""
+    if not _is_cacheable_request():
+        return None
+
+    g.etag = _etag()
+    g.last_modified = query_cache.last_modified()
+
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(g.etag)
+    elif request.if_modified_since is not None and g.last_modified is not None:
+        not_modified = _timestamp(g.last_modified) <= _timestamp(request.if_modified_since)
+
+    if not_modified:
+        return _add_validators(current_app.response_class(status=304))
+    return None
+
+
+def add_validators(response):
+    """Add ETag, Last-Modified and Cache-Control headers to successful responses."""
+    if response.status_code == 200 and 'etag' in g:
+        _add_validators(response)
+    return response
+
+
+def init_conditional_responses(app):
+    """Register the conditional response handlers with the Flask `app`."""
+    app.before_request(check_not_modified)
+    app.after_request(add_validators)
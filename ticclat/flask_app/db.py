@@ -4,10 +4,20 @@
 import os
 from dataclasses import dataclass
 import sqlalchemy
+from flask import has_request_context, request
 from sqlalchemy import MetaData
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
+from ticclat.slow_queries import slow_query_log
+
+
+def current_route():
+    """Return the endpoint and path of the current request (None outside a request)."""
+    if not has_request_context():
+        return None
+    return {'endpoint': request.endpoint, 'path': request.full_path}
+
 
 @dataclass
 class Database:
@@ -35,6 +45,10 @@ class Database:
         else:
             database_url = os.environ.get("DATABASE_URL", default='').strip()
             self.engine = sqlalchemy.create_engine(database_url)
+        # record slow statements (if configured using TICCLAT_SLOW_QUERY_MS),
+        # with the route that ran them
+        slow_query_log.route_info = current_route
+        slow_query_log.instrument(self.engine)
         self.md = sqlalchemy.MetaData()
 
 
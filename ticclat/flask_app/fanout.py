@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Run the independent queries of a request concurrently.
+
+Some routes (e.g. ``/word`` and ``/corrections``) run several queries that do
+not depend on each other. :func:`run_concurrently` runs them in a (process
+wide) thread pool, each on its own session with a connection from the
+connection pool of the engine, so the latency of the route is that of the
+slowest query instead of the sum of all queries.
+
+The tasks are run one after another on the session of the request when:
+
+- the session is bound to a single connection instead of an engine (as in the
+  tests, where all queries run inside one transaction that is rolled back
+  afterwards, so other connections can't see the test data); or
+- the environment variable ``TICCLAT_FANOUT_WORKERS`` is set to 0 or 1.
+
+Make sure the connection pool is large enough (``pool_size`` of the engine,
+default 5) for the number of concurrent requests times the number of tasks.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.environ.get('TICCLAT_FANOUT_WORKERS', 4))
+            if workers > 1:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ticclat-fanout')
+            else:
+                _executor = False
+    return _executor
+
+
+def _run_in_own_session(engine, task):
+    session = Session(bind=engine)
+    try:
+        return task(session)
+    finally:
+        session.close()
+
+
+def run_concurrently(session, *tasks) -> list:
+    """Run `tasks` concurrently and return their results (in the same order).
+
+    Args:
+        session (sqlalchemy.orm.session.Session): the session of the request.
+        tasks: functions that take a SQLAlchemy session as only argument. They
+            should only read from the database, and not call this function
+            themselves (that could exhaust the thread pool).
+
+    Returns:
+        list with the return value of each task. If a task raises an
+        exception, it is raised here.
+    """
+    executor = _get_executor()
+    bind = session.get_bind()
+    if not executor or len(tasks) < 2 or not isinstance(bind, Engine):
+        return [task(session) for task in tasks]
+
+    futures = [executor.submit(_run_in_own_session, bind, task) for task in tasks]
+    return [future.result() for future in futures]
@@ -7,7 +7,12 @@ from flask import Flask
 from flask_sqlalchemy_session import flask_scoped_session
 from sqlalchemy.orm import Session
 
+from ticclat.flask_app.autocomplete import autocomplete_index
+from ticclat.flask_app.cache import query_cache
 from ticclat.flask_app.db import database
+from ticclat.flask_app.metrics import init_metrics
+from ticclat.flask_app.paradigm_index import paradigm_index
+from ticclat.flask_app.resolver import wordform_resolver
 from ticclat.flask_app.routes import init_app
 
 
@@ -29,6 +34,20 @@ def create_app(dbsession: Session = None) -> Flask:
         database.setup(dbsession.bind.engine)
         database.session = dbsession
 
+    # (re)configure and empty the query result and wordform id caches
+    query_cache.setup()
+    wordform_resolver.setup()
+
+    # memory-map the autocomplete index (if configured using AUTOCOMPLETE_INDEX)
+    autocomplete_index.load()
+
+    # enable the in-memory paradigm index (if configured using PARADIGM_INDEX);
+    # it is loaded on first use
+    paradigm_index.setup()
+
+    # record per-route latency and SQL metrics (before the other request handlers are registered)
+    init_metrics(app, database.engine)
+
     # loads the routes
     init_app(app, database.session)
 
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Per-route performance metrics of the Flask app, in the Prometheus text format.
+
+For every request, the following is recorded per endpoint (route function):
+
+- the latency (from the start of the request until the response is returned
+  to the WSGI server) in a histogram;
+- the number of responses per status code;
+- the number of SQL statements and the time spent executing them (using the
+  ``before_cursor_execute``/``after_cursor_execute`` events of the SQLAlchemy
+  engine);
+- the time spent serializing JSON responses (``jsonify``).
+
+The metrics are exposed on the ``/metrics`` route. Note that the metrics are
+collected per process, so with multiple gunicorn workers, every scrape shows
+the metrics of one worker. Statements run in threads without a request context
+(see :mod:`ticclat.flask_app.fanout`) are not counted per endpoint.
+"""
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _new_histogram():
+    return {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+
+
+@dataclass
+class Metrics:
+    """Counters and latency histograms per endpoint.
+
+    Note:
+        There should only be one instance (also in this module, called `metrics`).
+    """
+
+    latency: dict = field(default_factory=lambda: defaultdict(_new_histogram))
+    responses: dict = field(default_factory=lambda: defaultdict(int))
+    sql_statements: dict = field(default_factory=lambda: defaultdict(int))
+    sql_seconds: dict = field(default_factory=lambda: defaultdict(float))
+    serialization_seconds: dict = field(default_factory=lambda: defaultdict(float))
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def clear(self) -> None:
+        """Reset all metrics."""
+        with self._lock:
+            for values in (self.latency, self.responses, self.sql_statements,
+                           self.sql_seconds, self.serialization_seconds):
+                values.clear()
+
+    def observe(self, endpoint: str, status: int, seconds: float,
+                sql_statements: int, sql_seconds: float, serialization_seconds: float) -> None:
+        """Record the metrics of one request."""
+        with self._lock:
+            histogram = self.latency[endpoint]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+            self.responses[(endpoint, status)] += 1
+            self.sql_statements[endpoint] += sql_statements
+            self.sql_seconds[endpoint] += sql_seconds
+            self.serialization_seconds[endpoint] += serialization_seconds
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def header(name, metric_type, description):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+        with self._lock:
+            name = 'ticclat_request_duration_seconds'
+            header(name, 'histogram', 'Request latency per endpoint.')
+            for endpoint, histogram in sorted(self.latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram["sum"]}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram["count"]}')
+
+            name = 'ticclat_responses_total'
+            header(name, 'counter', 'Number of responses per endpoint and status code.')
+            for (endpoint, status), count in sorted(self.responses.items()):
+                lines.append(f'{name}{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            for name, values, description in (
+                    ('ticclat_sql_statements_total', self.sql_statements,
+                     'Number of SQL statements executed per endpoint.'),
+                    ('ticclat_sql_duration_seconds_total', self.sql_seconds,
+                     'Time spent executing SQL statements per endpoint.'),
+                    ('ticclat_serialization_duration_seconds_total', self.serialization_seconds,
+                     'Time spent serializing JSON responses per endpoint.')):
+                header(name, 'counter', description)
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# The global metrics 'singleton'
+metrics: Metrics = Metrics()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that adds the time spent serializing to the request metrics."""
+
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and 'metrics_start' in g:
+                g.metrics_serialization_seconds += time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_start' in g:
+        g.metrics_sql_statements += 1
+        g.metrics_sql_seconds += time.perf_counter() - conn.info['metrics_query_start']
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_sql_statements = 0
+    g.metrics_sql_seconds = 0.0
+    g.metrics_serialization_seconds = 0.0
+
+
+def _record_request(response):
+    if 'metrics_start' in g:
+        endpoint = request.endpoint or 'not_found'
+        metrics.observe(endpoint, response.status_code, time.perf_counter() - g.metrics_start,
+                        g.metrics_sql_statements, g.metrics_sql_seconds,
+                        g.metrics_serialization_seconds)
+    return response
+
+
+def init_metrics(app, engine) -> None:
+    """Record metrics of the requests to `app` and the SQL statements run on `engine`.
+
+    Call this before any other ``before_request`` handlers are registered, so
+    the latency includes them.
+    """
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.json_provider_class = TimedJSONProvider
+    app.json = TimedJSONProvider(app)
+
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
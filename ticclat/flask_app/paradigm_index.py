@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""In-memory index of the morphological paradigms.
+
+A paradigm is identified by its (Z, Y, X, W) code. The index packs these four
+numbers into one 64-bit integer per row of the ``morphological_paradigms``
+table, with Z in the most significant bits, and keeps the rows sorted on this
+packed code. Because the order of the packed codes is the same as the
+lexicographic order of (Z, Y, X, W), all members of a paradigm (or all
+paradigms with the same Z, Y and X) form a contiguous range that is found with
+:func:`numpy.searchsorted`. A second pair of arrays, sorted on wordform id,
+maps wordforms to the codes of the paradigms they are part of.
+
+The number of bits used for each of Z, Y, X and W is determined from the data
+when the index is built.
+
+The index is loaded from the database on first use and reloaded when the
+database generation changes (i.e., after data has been (re-)ingested, see
+:mod:`ticclat.flask_app.cache`). It is enabled by setting the environment
+variable ``PARADIGM_INDEX=1``; otherwise the routes query the database.
+"""
+import logging
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas
+
+from ticclat.flask_app.cache import query_cache
+
+logger = logging.getLogger(__name__)
+
+CODE_COLUMNS = ['Z', 'Y', 'X', 'W']
+
+
+def _bits(values: np.ndarray) -> int:
+    return max(1, int(values.max()).bit_length()) if len(values) > 0 else 1
+
+
+@dataclass(frozen=True)
+class IndexState:
+    """The arrays of a loaded paradigm index.
+
+    A state is never modified; a reload builds a new one, which is published
+    with a single assignment, so concurrent readers always see a consistent
+    set of bit widths and arrays.
+    """
+
+    generation: int
+    bits: tuple
+    codes: np.ndarray
+    wordform_ids: np.ndarray
+    paradigm_ids: np.ndarray
+    word_type_codes: np.ndarray
+    wordform_order: np.ndarray
+    sorted_wordform_ids: np.ndarray
+
+    @property
+    def shifts(self) -> tuple:
+        return _shifts(self.bits)
+
+
+def _shifts(bits) -> tuple:
+    _, bits_y, bits_x, bits_w = bits
+    return bits_y + bits_x + bits_w, bits_x + bits_w, bits_w, 0
+
+
+def _fits(bits, **values) -> bool:
+    """True if all (scalar) code numbers in `values` fit in their number of bits."""
+    return all(value is None or 0 <= int(value) <= (1 << bits[CODE_COLUMNS.index(column)]) - 1
+               for column, value in values.items())
+
+
+def _pack(bits, Z, Y, X, W):
+    shift_z, shift_y, shift_x, _ = _shifts(bits)
+    return (np.uint64(Z) << np.uint64(shift_z)) | (np.uint64(Y) << np.uint64(shift_y)) \
+        | (np.uint64(X) << np.uint64(shift_x)) | np.uint64(W)
+
+
+def _unpack(bits, codes) -> dict:
+    codes = np.asarray(codes, dtype=np.uint64)
+    return {column: ((codes >> np.uint64(shift)) & np.uint64((1 << width) - 1)).astype(np.int64)
+            for column, shift, width in zip(CODE_COLUMNS, _shifts(bits), bits)}
+
+
+@dataclass
+class ParadigmIndex:
+    """Sorted arrays of packed paradigm codes and the wordforms in them.
+
+    The loaded arrays are kept in one immutable `IndexState` (``state``).
+
+    Note:
+        There should only be one instance per process (also in this module,
+        called `paradigm_index`).
+    """
+
+    enabled: bool = False
+    state: IndexState = None
+
+    def setup(self, enabled: bool = None) -> None:
+        """Enable or disable the index and drop the loaded data.
+
+        If `enabled` is not provided, the environment variable
+        ``PARADIGM_INDEX`` is used.
+        """
+        if enabled is None:
+            enabled = os.environ.get('PARADIGM_INDEX', '').strip().lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+        self.state = None
+
+    @property
+    def loaded(self) -> bool:
+        """True if the index contains data."""
+        return self.state is not None
+
+    @property
+    def generation(self) -> int:
+        """Database generation of the loaded data (None if nothing is loaded)."""
+        state = self.state
+        return None if state is None else state.generation
+
+    @property
+    def bits(self) -> tuple:
+        """Number of bits used for Z, Y, X and W."""
+        state = self.state
+        return (1, 1, 1, 1) if state is None else state.bits
+
+    def __len__(self):
+        state = self.state
+        return 0 if state is None else len(state.codes)
+
+    def pack(self, Z, Y, X, W):
+        """Pack paradigm code numbers (scalars or arrays) into 64-bit codes.
+
+        The numbers are not checked against the bit widths of the index.
+        """
+        return _pack(self.bits, Z, Y, X, W)
+
+    def unpack(self, codes) -> dict:
+        """Unpack 64-bit codes into a dict with Z, Y, X and W arrays."""
+        return _unpack(self.bits, codes)
+
+    def build(self, df: pandas.DataFrame, generation: int = None) -> None:
+        """Build the index from a DataFrame of the morphological paradigms.
+
+        Args:
+            df: DataFrame with columns ``paradigm_id``, ``Z``, ``Y``, ``X``,
+                ``W``, ``word_type_code`` and ``wordform_id``. Rows with
+                missing values are skipped.
+            generation: database generation of the data in `df`.
+
+        Raises:
+            ValueError: if the codes are negative or don't fit in 64 bits.
+        """
+        df = df.dropna(subset=CODE_COLUMNS + ['wordform_id'])
+        values = {column: df[column].to_numpy(dtype=np.int64) for column in CODE_COLUMNS}
+        if any(len(v) > 0 and v.min() < 0 for v in values.values()):
+            raise ValueError('Paradigm codes must be non-negative.')
+        bits = tuple(_bits(values[column]) for column in CODE_COLUMNS)
+        if sum(bits) > 64:
+            raise ValueError(f'Paradigm codes need {sum(bits)} bits, which does not fit in 64 bits.')
+
+        codes = _pack(bits, *(values[column] for column in CODE_COLUMNS))
+        wordform_ids = df['wordform_id'].to_numpy(dtype=np.int64)
+
+        # sort on code; members of a paradigm on wordform id
+        order = np.lexsort((wordform_ids, codes))
+        wordform_ids = wordform_ids[order]
+
+        # wordform id -> paradigm codes
+        wordform_order = np.argsort(wordform_ids, kind='stable')
+
+        self.state = IndexState(generation=generation,
+                                bits=bits,
+                                codes=codes[order],
+                                wordform_ids=wordform_ids,
+                                paradigm_ids=df['paradigm_id'].to_numpy(dtype=np.int64)[order],
+                                word_type_codes=df['word_type_code'].to_numpy(dtype=object)[order],
+                                wordform_order=wordform_order,
+                                sorted_wordform_ids=wordform_ids[wordform_order])
+        logger.info(f'Paradigm index loaded: {len(codes)} rows, {sum(bits)} bits per code.')
+
+    def load(self, connection, generation: int = None) -> None:
+        """Load the index from the ``morphological_paradigms`` table."""
+        query = """
+SELECT paradigm_id, Z, Y, X, W, word_type_code, wordform_id
+FROM morphological_paradigms
+        """
+        self.build(pandas.read_sql(query, connection), generation)
+
+    def ensure_loaded(self, session) -> bool:
+        """(Re)load the index if the database generation changed.
+
+        Returns whether the index can be used (False if it is disabled or
+        could not be built, in which case the database should be queried).
+        """
+        if not self.enabled:
+            return False
+        generation = query_cache.generation(session)
+        if not self.loaded or generation != self.generation:
+            try:
+                self.load(session.connection(), generation)
+            except ValueError as exception:
+                logger.warning(f'Paradigm index disabled: {exception}')
+                self.enabled = False
+                return False
+        return True
+
+    @staticmethod
+    def _code_range(state: IndexState, code, level: int = 4):
+        """Index range of the rows whose first `level` code numbers equal those of `code`."""
+        shift = np.uint64(state.shifts[level - 1])
+        low = (np.uint64(code) >> shift) << shift
+        high = low + (np.uint64(1) << shift)
+        return (int(np.searchsorted(state.codes, low, side='left')),
+                int(np.searchsorted(state.codes, high, side='left')))
+
+    @staticmethod
+    def _paradigm_codes(state: IndexState, wordform_id: int) -> np.ndarray:
+        start = np.searchsorted(state.sorted_wordform_ids, wordform_id, side='left')
+        end = np.searchsorted(state.sorted_wordform_ids, wordform_id, side='right')
+        return np.unique(state.codes[state.wordform_order[start:end]])
+
+    def paradigm_codes(self, wordform_id: int) -> np.ndarray:
+        """Return the (unique) codes of the paradigms `wordform_id` is part of."""
+        return self._paradigm_codes(self.state, wordform_id)
+
+    @classmethod
+    def _rows(cls, state: IndexState, codes, word_type_codes=None) -> np.ndarray:
+        rows = [np.arange(*cls._code_range(state, code)) for code in codes]
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        if word_type_codes is not None:
+            rows = rows[np.isin(state.word_type_codes[rows], list(word_type_codes))]
+        return rows
+
+    @staticmethod
+    def _frame(state: IndexState, rows) -> pandas.DataFrame:
+        df = pandas.DataFrame({'paradigm_id': state.paradigm_ids[rows],
+                               'wordform_id': state.wordform_ids[rows],
+                               'word_type_code': state.word_type_codes[rows]})
+        for column, values in _unpack(state.bits, state.codes[rows]).items():
+            df[column] = values
+        return df
+
+    def members(self, Z: int, Y: int, X: int, W: int, word_type_codes=None) -> pandas.DataFrame:
+        """Return the rows of the paradigm with code (Z, Y, X, W).
+
+        Codes that are negative or don't fit in the bits of the index have no
+        members.
+
+        Args:
+            word_type_codes: if provided, only return rows with one of these
+                word type codes.
+        """
+        state = self.state
+        codes = [_pack(state.bits, Z, Y, X, W)] if _fits(state.bits, Z=Z, Y=Y, X=X, W=W) else []
+        return self._frame(state, self._rows(state, codes, word_type_codes))
+
+    def siblings(self, wordform_id: int, word_type_codes=None) -> pandas.DataFrame:
+        """Return the rows of all paradigms `wordform_id` is part of."""
+        state = self.state
+        return self._frame(state, self._rows(state, self._paradigm_codes(state, wordform_id), word_type_codes))
+
+    def lemmas(self, wordform_id: int) -> pandas.DataFrame:
+        """Return the lemmas (HCL rows) of the paradigms of `wordform_id`."""
+        return self.siblings(wordform_id, word_type_codes=['HCL'])
+
+    def count(self, Z: int = None, Y: int = None, X: int = None) -> pandas.DataFrame:
+        """Count the paradigms per (X, Y, Z), optionally filtered on Z, Y and/or X.
+
+        Values that are negative or don't fit in the bits of the index match
+        no paradigms.
+
+        Returns:
+            DataFrame with columns ``X``, ``Y``, ``Z`` and ``num_paradigms``,
+            ordered by descending ``num_paradigms``.
+        """
+        state = self.state
+        shift_x = np.uint64(state.shifts[2])
+        zyx = state.codes >> shift_x
+        mask = np.full(len(zyx), _fits(state.bits, Z=Z, Y=Y, X=X))
+        for column, value in (('Z', Z), ('Y', Y), ('X', X)):
+            if value is not None and mask.any():
+                position = CODE_COLUMNS.index(column)
+                shift = np.uint64(state.shifts[position]) - shift_x
+                width = np.uint64((1 << state.bits[position]) - 1)
+                mask &= ((zyx >> shift) & width) == np.uint64(int(value))
+
+        # the codes are sorted, so the groups are contiguous
+        keys, counts = np.unique(zyx[mask], return_counts=True)
+        unpacked = _unpack(state.bits, keys << shift_x)
+        df = pandas.DataFrame({'X': unpacked['X'], 'Y': unpacked['Y'], 'Z': unpacked['Z'],
+                               'num_paradigms': counts})
+        return df.sort_values('num_paradigms', ascending=False, kind='stable').reset_index(drop=True)
+
+
+# The process-wide paradigm index
+paradigm_index: ParadigmIndex = ParadigmIndex()
@@ -17,26 +17,22 @@ def paradigm_network(connection, wordform):
     # append itself to the list of X values to query next
     if wxyz['X'] not in x_values:
         x_values.append(wxyz['X'])
-    nodes = []
-    links = []
-
-    def flatten(nested_list):
-        return [item for sublist in nested_list for item in sublist]
+    # get the most frequent lemmas for all X values in one query, and keep the
+    # top 50 per X (MySQL 5.7 has no window functions)
+    lemmas = pandas.read_sql(
+        raw_queries.get_most_frequent_lemmas_for_xlist(),
+        connection,
+        params={'Z': wxyz['Z'], 'Y': wxyz['Y'], 'x_list': tuple(x_values)}
+    )
+    lemmas = lemmas.groupby('X', sort=False).head(50)
 
-    nested_w = [
-        pandas.read_sql(
-            raw_queries.get_most_frequent_lemmas_for_xyz(),
-            connection,
-            params={'Z': wxyz['Z'], 'Y': wxyz['Y'], 'X': x, 'limit': 50}
-        ).reset_index(drop=True).to_dict(orient='records') for x in x_values
-    ]
-    W_list = flatten(nested_w)
-    for w in W_list:
+    w_nodes_per_x = {x: [] for x in x_values}
+    for w in lemmas.to_dict(orient='records'):
         frequency = w['frequency']
         if not frequency or math.isnan(frequency):
             frequency = 0
 
-        nodes.append({
+        w_nodes_per_x[w['X']].append({
             'id': str(w['wordform_id']),
             'tc_z': wxyz['Z'],
             'tc_y': wxyz['Y'],
@@ -46,8 +42,12 @@ def paradigm_network(connection, wordform):
             'frequency': frequency,
             'wordform': w['wordform']
         })
+
+    w_nodes = []
+    x_nodes = {}
+    links = []
     for x in x_values:
-        w_nodes_for_x = [node for node in nodes if node['tc_x'] == x]
+        w_nodes_for_x = w_nodes_per_x[x]
         frequency = sum([node['frequency'] for node in w_nodes_for_x if node['frequency']])
         if math.isnan(frequency):
             frequency = 0
@@ -62,11 +62,11 @@ def paradigm_network(connection, wordform):
             'frequency': frequency,
             'wordform': w_nodes_for_x[0]['wordform']
         }
-        nodes.append(x_node)
+        x_nodes[x] = x_node
 
-        if len(w_nodes_for_x) == 1:
-            nodes.remove(w_nodes_for_x[0])
-        else:
+        # an X with a single lemma is represented by the X node only
+        if len(w_nodes_for_x) > 1:
+            w_nodes.extend(w_nodes_for_x)
             for node in w_nodes_for_x:
                 links.append({
                     'source': node['id'],
@@ -74,18 +74,18 @@ def paradigm_network(connection, wordform):
                     'id': node['id'] + x_node['id'],
                     'type': 'XW'
                 })
-    root_node = list(filter(lambda node: node['tc_x'] == wxyz['X'] and node['type'] == 'x', nodes))[0]
+    root_node = x_nodes[wxyz['X']]
     root_node['wordform'] = wordform
     root_node['tc_w'] = wxyz['W']
-    other_x_nodes = filter(lambda node: node['type'] == 'x' and node['tc_x'] != wxyz['X'], nodes)
-    for node in other_x_nodes:
-        links.append({
-            'source': node['id'],
-            'target': root_node['id'],
-            'id': node['id'] + root_node['id'],
-            'type': 'XX'
-        })
+    for x, node in x_nodes.items():
+        if x != wxyz['X']:
+            links.append({
+                'source': node['id'],
+                'target': root_node['id'],
+                'id': node['id'] + root_node['id'],
+                'type': 'XX'
+            })
     return {
-        'nodes': nodes,
+        'nodes': w_nodes + list(x_nodes.values()),
         'links': links,
     }
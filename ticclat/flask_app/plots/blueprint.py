@@ -1,6 +1,20 @@
-from flask import Blueprint, jsonify, request
+"""Routes that return Bokeh plots (as ``json_item`` JSON).
+
+The plots aggregate whole tables, so they only change when data is ingested.
+The serialized JSON of each plot is stored in the query cache (see
+:mod:`ticclat.flask_app.cache`), keyed by the plot name and the ``var``
+parameter, and served as is. If the query cache has a shared backend
+(``TICCLAT_CACHE_DIR``), the plots can be rendered once after ingestion for all
+workers::
+
+    $ python -m ticclat.flask_app.plots.blueprint
+"""
+import json
+
+from flask import Blueprint, current_app, request
 from bokeh.embed import json_item
 
+from ticclat.flask_app.cache import query_cache
 from ticclat.flask_app.plots.corpus_size import corpus_size
 from ticclat.flask_app.plots.lexicon_size import lexicon_size
 from ticclat.flask_app.plots.paradigm_size import paradigm_size
@@ -8,22 +22,68 @@ from ticclat.flask_app.plots.word_count_per_year import word_count_per_year
 
 plots = Blueprint('plots', __name__)
 
+# functions that create the plots; `var` is only used by paradigm_size
+PLOTS = {
+    'word_count_per_year': lambda var: word_count_per_year(),
+    'corpus_size': lambda var: corpus_size(),
+    'lexicon_size': lambda var: lexicon_size(),
+    'paradigm_size': paradigm_size,
+}
+
+# all (plot name, var) combinations, used by warm_plot_cache
+PLOT_VARIANTS = [('word_count_per_year', None), ('corpus_size', None), ('lexicon_size', None),
+                 ('paradigm_size', 'X'), ('paradigm_size', 'Y'), ('paradigm_size', 'Z')]
+
+
+def render_plot(name: str, var: str = None) -> bytes:
+    """Create plot `name` and serialize it to JSON."""
+    return json.dumps(json_item(PLOTS[name](var))).encode('utf-8')
+
+
+def get_plot(name: str, var: str = None) -> bytes:
+    """Return the serialized plot for the current database generation.
+
+    The plot is taken from the query cache, or rendered (and cached) if it is
+    not in there.
+    """
+    return query_cache.get_or_compute(('plot', name, var), lambda: render_plot(name, var))
+
+
+def warm_plot_cache() -> int:
+    """Render all plots for the current database generation; returns the number of plots."""
+    for name, var in PLOT_VARIANTS:
+        get_plot(name, var)
+    return len(PLOT_VARIANTS)
+
+
+def _plot_response(name: str, var: str = None):
+    return current_app.response_class(get_plot(name, var), mimetype='application/json')
+
 
 @plots.route("/word_count_per_year")
 def _word_count_per_year():
-    return jsonify(json_item(word_count_per_year()))
+    return _plot_response('word_count_per_year')
 
 
 @plots.route("/corpus_size")
 def _corpus_size():
-    return jsonify(json_item(corpus_size()))
+    return _plot_response('corpus_size')
 
 
 @plots.route("/lexicon_size")
 def _lexicon_size():
-    return jsonify(json_item(lexicon_size()))
+    return _plot_response('lexicon_size')
 
 
 @plots.route("/paradigm_size")
 def _paradigm_size():
-    return jsonify(json_item(paradigm_size(request.args.get('var', 'X'))))
+    return _plot_response('paradigm_size', request.args.get('var', 'X'))
+
+
+if __name__ == '__main__':
+    from sqlalchemy.orm import Session
+    from ticclat.flask_app.db import database
+    database.setup()
+    database.session = Session(bind=database.engine.connect())
+    query_cache.setup()
+    print(warm_plot_cache(), 'plots rendered')
@@ -32,13 +32,11 @@ ORDER BY year
         tools=['hover', 'pan', 'wheel_zoom', 'save', 'reset'],
     )
 
-    corpus_names = sorted(df['name'].unique())
-
     palette = palettes.Category10[10]
 
-    for i, corpus_name in enumerate(corpus_names):
-        corpus_data = df[df['name'] == corpus_name]
-        corpus_data['color'] = palette[i]
+    # groupby sorts on corpus name
+    for i, (_, corpus_data) in enumerate(df.groupby('name')):
+        corpus_data = corpus_data.assign(color=palette[i])
         p.vbar(
             x='year',
             top='sum_word_count',
@@ -4,30 +4,47 @@ import numpy as np
 import pandas as pd
 
 from sqlalchemy import select, text
-from sqlalchemy.sql import func, distinct, and_, desc, alias
+from sqlalchemy.sql import func, distinct, and_, desc, alias, false
 
+from ticclat.flask_app import raw_queries
+from ticclat.flask_app.cache import query_cache
+from ticclat.flask_app.paradigm_index import paradigm_index
+from ticclat.flask_app.resolver import wordform_resolver
 from ticclat.ticclat_schema import Lexicon, Wordform, Anahash, Document, \
-    Corpus, lexical_source_wordform, corpusId_x_documentId, TextAttestation, \
+    Corpus, lexical_source_wordform, TextAttestation, \
     MorphologicalParadigm, WordformLinkSource, WordformLink, WordformFrequencies
 
 logger = logging.getLogger(__name__)
 
 
+def _is_wordform(column, wordform_id):
+    """Where clause for `column` == `wordform_id` that matches nothing if the id is None."""
+    return column == wordform_id if wordform_id is not None else false()
+
+
+def _in_corpus(session, corpus_name):
+    """Where clause for the text attestations of corpus `corpus_name`.
+
+    The corpus id is looked up first, so the query filters on a constant
+    `TextAttestation.corpus_id`, which allows MySQL to only read the partition
+    of the corpus (see `dbutils.partition_text_attestations`).
+    """
+    corpus_id = session.execute(select([Corpus.corpus_id]).where(Corpus.name == corpus_name)).scalar()
+    return TextAttestation.corpus_id == corpus_id if corpus_id is not None else false()
+
+
 def wordform_in_corpora(session, wf):
     """Given a wordform, return a list of corpora in which it occurs.
 
     Gives both the term frequency and document frequency.
     """
     q = select([Wordform.wordform_id, Wordform.wordform, Corpus.name,
-                func.count(Document.document_id).label('document_frequency'),
+                func.count(TextAttestation.document_id).label('document_frequency'),
                 func.sum(TextAttestation.frequency).label('term_frequency')]) \
-        .select_from(Corpus.__table__.join(corpusId_x_documentId,
+        .select_from(Corpus.__table__.join(TextAttestation,
                                            Corpus.corpus_id
-                                           == corpusId_x_documentId.c.corpus_id)
-                     .join(Document,
-                           Document.document_id
-                           == corpusId_x_documentId.c.document_id)
-                     .join(TextAttestation).join(Wordform)) \
+                                           == TextAttestation.corpus_id)
+                     .join(Wordform)) \
         .where(Wordform.wordform == wf) \
         .group_by(Corpus.name, Wordform.wordform, Wordform.wordform_id)
 
@@ -44,14 +61,8 @@ def wordform_in_corpus_over_time(session, wf, corpus_name):
     q = select([Wordform.wordform_id, Wordform.wordform, Document.pub_year,
                 func.count(Document.document_id).label('document_frequency'),
                 func.sum(TextAttestation.frequency).label('term_frequency')]) \
-        .select_from(Corpus.__table__.join(corpusId_x_documentId,
-                                           Corpus.corpus_id
-                                           == corpusId_x_documentId.c.corpus_id)
-                     .join(Document,
-                           Document.document_id
-                           == corpusId_x_documentId.c.document_id)
-                     .join(TextAttestation).join(Wordform)) \
-        .where(and_(Wordform.wordform == wf, Corpus.name == corpus_name)) \
+        .select_from(TextAttestation.__table__.join(Document).join(Wordform)) \
+        .where(and_(Wordform.wordform == wf, _in_corpus(session, corpus_name))) \
         .group_by(Document.pub_year, Wordform.wordform, Wordform.wordform_id)
 
     logger.debug(f'Executing query:\n{q}')
@@ -59,12 +70,14 @@ def wordform_in_corpus_over_time(session, wf, corpus_name):
     return session.execute(q)
 
 
+@query_cache.memoize
 def wordform_in_corpora_over_time(session, wf, start_year=None, end_year=None):
     """Given a wordform, and a corpus, return word frequencies over time.
 
     Gives both the term frequency and document frequency.
     """
     start_year, end_year = set_year_range(session, start_year, end_year)
+    wordform_id = wordform_resolver.resolve(session, wf)
 
     q = (
         select(
@@ -78,23 +91,19 @@ def wordform_in_corpora_over_time(session, wf, start_year=None, end_year=None):
         )
         .select_from(
             Corpus.__table__.join(
-                corpusId_x_documentId,
-                Corpus.corpus_id == corpusId_x_documentId.c.corpus_id,
+                TextAttestation,
+                Corpus.corpus_id == TextAttestation.corpus_id,
             )
-            .join(Document, Document.document_id == corpusId_x_documentId.c.document_id)
-            .join(TextAttestation)
-            .join(Wordform)
+            .join(Document)
         )
         .where(
             and_(
-                Wordform.wordform == wf,
+                _is_wordform(TextAttestation.wordform_id, wordform_id),
                 Document.pub_year >= start_year,
                 Document.pub_year <= end_year
             )
         )
-        .group_by(
-            Corpus.name, Document.pub_year, Wordform.wordform, Wordform.wordform_id
-        )
+        .group_by(Corpus.name, Document.pub_year)
         .order_by(Document.pub_year)
     )
 
@@ -185,7 +194,7 @@ def wfs_min_num_lexica(session, num=2):
     """
     subq = select([Wordform, func.count('lexicon_id').label('num_lexicons')]) \
         .select_from(lexical_source_wordform.join(Wordform)) \
-        .group_by(Wordform.wordform_id)
+        .group_by(*Wordform.__table__.columns)
 
     q = select(['*']).select_from(subq.alias()) \
         .where(text(f'num_lexicons >= {num}')) \
@@ -228,13 +237,9 @@ def count_wfs_per_document_corpus(session, corpus_name):
         SQLAlchemy query result.
     """
     q = select([Document.title,
-                func.count(distinct(Wordform.wordform_id)).label('tot_freq')])
-    q = q.select_from(
-        Corpus.__table__
-              .join(corpusId_x_documentId).join(Document)
-              .join(TextAttestation).join(Wordform)
-    )
-    q = q.where(Corpus.name == corpus_name).group_by(Document.title)
+                func.count(distinct(TextAttestation.wordform_id)).label('tot_freq')])
+    q = q.select_from(TextAttestation.__table__.join(Document))
+    q = q.where(_in_corpus(session, corpus_name)).group_by(Document.title)
 
     logger.debug(f'Executing query:\n{q}')
 
@@ -254,12 +259,13 @@ def count_wfs_per_document_corpus_and_lexicon(session, corpus_name,
         SQLAlchemy query result.
     """
     q = select([Document.title,
-                func.count(distinct(Wordform.wordform_id))
+                func.count(distinct(TextAttestation.wordform_id))
                     .label('lexicon_freq')]) \
-        .select_from(Corpus.__table__.join(corpusId_x_documentId)
-                     .join(Document).join(TextAttestation).join(Wordform)
-                     .join(lexical_source_wordform).join(Lexicon)) \
-        .where(and_(Corpus.name == corpus_name,
+        .select_from(TextAttestation.__table__.join(Document)
+                     .join(lexical_source_wordform,
+                           TextAttestation.wordform_id == lexical_source_wordform.c.wordform_id)
+                     .join(Lexicon)) \
+        .where(and_(_in_corpus(session, corpus_name),
                     Lexicon.lexicon_name == lexicon_name)) \
         .group_by(Document.title)
 
@@ -289,7 +295,7 @@ def num_wfs_per_anahash(session):
     """
     subq = select([Anahash, func.count('wordform_id').label('num_wf')]) \
         .select_from(Anahash.__table__.join(Wordform)) \
-        .group_by(Anahash.anahash_id)
+        .group_by(*Anahash.__table__.columns)
     q = select(['*']) \
         .select_from(subq.alias()) \
         .where(text('num_wf > 1')) \
@@ -301,16 +307,15 @@ def num_wfs_per_anahash(session):
 
 
 def count_unique_wfs_in_corpus(session, corpus_name):
-    q = select([func.count(distinct(Wordform.wordform_id))]) \
-        .select_from(Corpus.__table__.join(corpusId_x_documentId)
-                     .join(Document).join(TextAttestation).join(Wordform)) \
-        .where(Corpus.name == corpus_name)
+    q = select([func.count(distinct(TextAttestation.wordform_id))]) \
+        .where(_in_corpus(session, corpus_name))
 
     logger.debug(f'Executing query:\n{q}')
 
     return session.execute(q)
 
 
+@query_cache.memoize
 def get_wf_variants(session, wf, start_year=None, end_year=None):
     start_year, end_year = set_year_range(session, start_year, end_year)
 
@@ -379,7 +384,7 @@ def get_wf_paradigms(session, wf):
                 MorphologicalParadigm.W,
                 MorphologicalParadigm.word_type_code]) \
         .select_from(MorphologicalParadigm.__table__.join(Wordform)) \
-        .where(Wordform.wordform == wf)
+        .where(_is_wordform(MorphologicalParadigm.wordform_id, wordform_resolver.resolve(session, wf)))
     return session.execute(q)
 
 
@@ -399,21 +404,22 @@ def get_paradigm_variants(session, paradigm):
     return session.execute(q)
 
 
+@query_cache.memoize
 def get_lexica_data(session, wordform):
     lexica = session.query(Lexicon).all()
-    orm_wordform = session.query(Wordform).filter(Wordform.wordform == wordform).first()
+    wordform_id = wordform_resolver.resolve(session, wordform)
 
     def map_lexicon(lexicon):
         correct = None
         has_wordform = None
 
-        if not orm_wordform:
+        if wordform_id is None:
             has_wordform = False
 
         elif lexicon.vocabulary:
             has_wordform = session.execute(
                 "SELECT 1 FROM lexical_source_wordform WHERE lexicon_id = :lexicon_id AND wordform_id = :wordform_id",
-                {'lexicon_id': lexicon.lexicon_id, 'wordform_id': orm_wordform.wordform_id}
+                {'lexicon_id': lexicon.lexicon_id, 'wordform_id': wordform_id}
             ).rowcount > 0
             if has_wordform:
                 correct = True
@@ -422,7 +428,7 @@ def get_lexica_data(session, wordform):
             row = session.execute(
                 "SELECT wordform_from_correct FROM source_x_wordform_link WHERE lexicon_id = :lexicon_id "
                 + "AND wordform_from = :wordform_id",
-                {'lexicon_id': lexicon.lexicon_id, 'wordform_id': orm_wordform.wordform_id}
+                {'lexicon_id': lexicon.lexicon_id, 'wordform_id': wordform_id}
             ).first()
 
             if row:
@@ -443,6 +449,7 @@ def get_lexica_data(session, wordform):
     return sorted(result, key=lambda i: i['lexicon_name'])
 
 
+@query_cache.memoize
 def get_corpora_year_range(session):
     """Get the earliest and latest publication years over all the corpora.
 
@@ -460,7 +467,7 @@ def get_corpora_year_range(session):
                 func.max(Document.pub_year).label('max_year')]) \
         .select_from(Document)
     r = session.execute(q)
-    return r.fetchone()
+    return tuple(r.fetchone())
 
 
 def set_year_range(session, start_year, end_year):
@@ -493,25 +500,22 @@ def distinct_word_type_codes(session):
     return r.fetchall()
 
 
+@query_cache.memoize
 def get_ticcl_variants(session, wordform, lexicon_id, corpus_id):
     wf_to = alias(Wordform)
-    q = select([Wordform.wordform.label('wordform_from'),
-                WordformLinkSource.wordform_from_correct,
+    q = select([WordformLinkSource.wordform_from_correct,
                 wf_to.c.wordform.label('wordform_to'),
                 WordformLinkSource.wordform_to_correct,
                 WordformLinkSource.ld,
                 func.sum(TextAttestation.frequency).label('freq_in_corpus')]) \
         .select_from(WordformLink.__table__
                      .join(WordformLinkSource)
-                     .join(Wordform,
-                           onclause=WordformLink.wordform_from == Wordform.wordform_id)
                      .join(wf_to, onclause=WordformLink.wordform_to == wf_to.c.wordform_id)
                      .join(TextAttestation,
-                           onclause=wf_to.c.wordform_id == TextAttestation.wordform_id)
-                     .join(Document).join(corpusId_x_documentId).join(Corpus)) \
-        .where(and_(Wordform.wordform == wordform,
+                           onclause=wf_to.c.wordform_id == TextAttestation.wordform_id)) \
+        .where(and_(_is_wordform(WordformLink.wordform_from, wordform_resolver.resolve(session, wordform)),
                     WordformLinkSource.lexicon_id == lexicon_id,
-                    Corpus.corpus_id == corpus_id)) \
+                    TextAttestation.corpus_id == corpus_id)) \
         .group_by('wordform_to',
                   WordformLinkSource.wordform_from_correct,
                   WordformLinkSource.wordform_to_correct,
@@ -541,3 +545,204 @@ def get_wordform_matches(session, df, min_freq):
     logger.debug(f'Executing query:\n{q}')
     result = pd.read_sql(q, session.connection())
     return result
+
+
+def autocomplete(session, prefix, limit=10):
+    """Get the most frequent wordforms that start with `prefix`.
+
+    This is the database fallback for the memory-mapped
+    :class:`ticclat.flask_app.autocomplete.AutocompleteIndex`; like the index
+    (see :func:`ticclat.flask_app.autocomplete.build_autocomplete_index`),
+    it skips wordforms that do not occur in any corpus (frequency 0).
+
+    Args:
+        session (sqlalchemy.orm.session.Session): SQLAlchemy session object.
+        prefix (str): the prefix to complete.
+        limit (int): the maximum number of completions to return.
+
+    Returns:
+        list of dicts with keys ``wordform`` and ``frequency``.
+    """
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    q = select([WordformFrequencies.wordform, WordformFrequencies.frequency]) \
+        .where(WordformFrequencies.wordform.like(escaped + '%')) \
+        .where(WordformFrequencies.frequency > 0) \
+        .order_by(desc(WordformFrequencies.frequency), WordformFrequencies.wordform) \
+        .limit(limit)
+    logger.debug(f'Executing query:\n{q}')
+    return [{'wordform': row.wordform, 'frequency': int(row.frequency or 0)}
+            for row in session.execute(q)]
+
+
+def get_wordform_ids(session, wordforms):
+    """Get the ids of multiple wordforms in (at most) one query.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): SQLAlchemy session object.
+        wordforms (list of str): the wordforms to look up.
+
+    Returns:
+        dict mapping the wordforms that are in the database to their ids.
+    """
+    if not wordforms:
+        return {}
+    return wordform_resolver.resolve_many(session, wordforms)
+
+
+def _read_batch(session, query, wordform_ids):
+    """Run a batch query from `raw_queries` for `wordform_ids`; group the result by source_id."""
+    if not wordform_ids:
+        return {}
+    df = pd.read_sql(query, session.connection(),
+                     params={'wordform_ids': tuple(wordform_ids)})
+    return {source_id: group.drop(columns='source_id')
+            for source_id, group in df.groupby('source_id', sort=False)}
+
+
+def get_word_links_batch(session, wordforms):
+    """Get the lexicon, anahash and morphological variants of multiple wordforms.
+
+    This is the batch version of the ``/word/<word_name>`` route: each type of
+    variant is retrieved for all wordforms using a single query.
+
+    Returns:
+        dict mapping each wordform to a dict with keys ``lexicon_variants``,
+        ``anahash_variants`` and ``morph_variants``.
+    """
+    ids = get_wordform_ids(session, wordforms)
+    id_list = list(ids.values())
+    lexicon = _read_batch(session, raw_queries.query_word_links_batch(), id_list)
+    anahash = _read_batch(session, raw_queries.query_anahash_links_batch(), id_list)
+    morph = _read_batch(session, raw_queries.query_morph_links_batch(), id_list)
+
+    empty = pd.DataFrame(columns=['wordform', 'lexicon_name'])
+    result = {}
+    for wordform in wordforms:
+        wf_id = ids.get(wordform)
+        result[wordform] = {
+            'lexicon_variants': lexicon.get(wf_id, empty).to_dict(orient='records'),
+            'anahash_variants': anahash.get(wf_id, empty)['wordform'].to_list(),
+            'morph_variants': morph.get(wf_id, empty)['wordform'].to_list(),
+        }
+    return result
+
+
+def get_word_frequency_per_corpus_batch(session, wordforms):
+    """Get the relative frequency per corpus of multiple wordforms in one query.
+
+    Returns:
+        dict mapping each wordform to a list of dicts with keys
+        ``relative_frequency`` and ``corpus_name``.
+    """
+    ids = get_wordform_ids(session, wordforms)
+    frequencies = _read_batch(session, raw_queries.query_word_frequency_per_corpus_batch(),
+                              list(ids.values()))
+    return {wordform: frequencies[ids[wordform]].to_dict(orient='records')
+            if ids.get(wordform) in frequencies else []
+            for wordform in wordforms}
+
+
+def get_lexica_data_batch(session, wordforms):
+    """Get for multiple wordforms whether they are in each lexicon (and correct).
+
+    This is the batch version of :func:`get_lexica_data`; it uses one query for
+    the wordform ids, one for the lexica, one for the vocabulary lexica and one
+    for the linked lexica.
+
+    Returns:
+        dict mapping each wordform to the result of :func:`get_lexica_data`.
+    """
+    ids = get_wordform_ids(session, wordforms)
+    id_list = tuple(ids.values())
+    lexica = sorted(session.query(Lexicon).all(), key=lambda lexicon: lexicon.lexicon_name)
+
+    in_vocabulary = set()
+    link_correct = {}
+    if id_list:
+        q = select([lexical_source_wordform.c.lexicon_id, lexical_source_wordform.c.wordform_id]) \
+            .where(lexical_source_wordform.c.wordform_id.in_(id_list))
+        in_vocabulary = {(row.lexicon_id, row.wordform_id) for row in session.execute(q)}
+
+        q = select([WordformLinkSource.lexicon_id, WordformLinkSource.wordform_from,
+                    WordformLinkSource.wordform_from_correct]) \
+            .where(WordformLinkSource.wordform_from.in_(id_list))
+        for row in session.execute(q):
+            # like get_lexica_data, use the first link of a wordform in a lexicon
+            link_correct.setdefault((row.lexicon_id, row.wordform_from), row.wordform_from_correct)
+
+    result = {}
+    for wordform in wordforms:
+        wf_id = ids.get(wordform)
+        lexica_data = []
+        for lexicon in lexica:
+            correct = None
+            has_wordform = False
+            if wf_id is None:
+                pass
+            elif lexicon.vocabulary:
+                has_wordform = (lexicon.lexicon_id, wf_id) in in_vocabulary
+                if has_wordform:
+                    correct = True
+            elif (lexicon.lexicon_id, wf_id) in link_correct:
+                has_wordform = True
+                correct = link_correct[(lexicon.lexicon_id, wf_id)] == 1
+            lexica_data.append({
+                'lexicon_name': lexicon.lexicon_name,
+                'correct': correct,
+                'has_wordform': has_wordform
+            })
+        result[wordform] = lexica_data
+    return result
+
+
+def get_wordforms_by_ids(session, wordform_ids):
+    """Get the wordforms and total frequencies for multiple wordform ids in one query.
+
+    Returns:
+        DataFrame with columns ``wordform_id``, ``wordform`` and ``frequency``
+        (0 if the wordform is not in the ``wordform_frequency`` table).
+    """
+    if len(wordform_ids) == 0:
+        return pd.DataFrame(columns=['wordform_id', 'wordform', 'frequency'])
+    q = select([Wordform.wordform_id,
+                Wordform.wordform,
+                func.coalesce(WordformFrequencies.frequency, 0).label('frequency')]) \
+        .select_from(Wordform.__table__.outerjoin(
+            WordformFrequencies, WordformFrequencies.wordform_id == Wordform.wordform_id)) \
+        .where(Wordform.wordform_id.in_({int(wf_id) for wf_id in wordform_ids}))
+    return pd.read_sql(q, session.connection())
+
+
+def _with_wordforms(session, df):
+    """Add the wordform and frequency columns to a DataFrame from the paradigm index."""
+    return df.merge(get_wordforms_by_ids(session, df['wordform_id'].unique()),
+                    on='wordform_id', how='left')
+
+
+def get_paradigm_siblings_from_index(session, wordform):
+    """Get all wordforms in the paradigms of `wordform` from the paradigm index.
+
+    This is the in-memory version of ``raw_queries.query_morph_links``.
+    """
+    wordform_id = get_wordform_ids(session, [wordform]).get(wordform)
+    if wordform_id is None:
+        return []
+    return _with_wordforms(session, paradigm_index.siblings(wordform_id))['wordform'].to_list()
+
+
+def get_lemmas_for_wordform_from_index(session, wordform):
+    """Get the lemmas of the paradigms of `wordform` from the paradigm index.
+
+    This is the in-memory version of ``raw_queries.find_lemmas_for_wordform``.
+    """
+    wordform_id = get_wordform_ids(session, [wordform]).get(wordform)
+    if wordform_id is None:
+        return []
+    df = _with_wordforms(session, paradigm_index.lemmas(wordform_id))
+    return df[['paradigm_id', 'wordform', 'W', 'X', 'Y', 'Z']].to_dict(orient='records')
+
+
+def get_paradigm_members_from_index(session, W, X, Y, Z, word_type_codes=('HCL', 'HCM')):
+    """Get the wordforms and frequencies of the members of paradigm (Z, Y, X, W) from the paradigm index."""
+    df = _with_wordforms(session, paradigm_index.members(Z, Y, X, W, word_type_codes))
+    return df[['frequency', 'wordform']].to_dict(orient='records')
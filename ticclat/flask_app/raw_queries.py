@@ -7,9 +7,8 @@ CASE
 END) AS year
 FROM text_attestations
     LEFT JOIN documents ON text_attestations.document_id = documents.document_id
-    LEFT JOIN corpusId_x_documentId on documents.document_id = corpusId_x_documentId.document_id
-WHERE wordform_id = (SELECT wordform_id FROM wordforms WHERE wordform = %(lookup_word)s)
-{f"AND corpus_id={corpus_id}" if corpus_id else ""}
+WHERE wordform_id = %(wordform_id)s
+{f"AND text_attestations.corpus_id={corpus_id}" if corpus_id else ""}
 GROUP BY year
 HAVING year IS NOT NULL
 ORDER BY year ASC
@@ -21,13 +20,23 @@ def query_word_frequency_per_corpus():
 SELECT 1e9 * SUM(frequency) / SUM(word_count) AS relative_frequency, c.name as corpus_name
 FROM text_attestations
     LEFT JOIN documents ON text_attestations.document_id = documents.document_id
-    LEFT JOIN corpusId_x_documentId cIxdI on documents.document_id = cIxdI.document_id
-    LEFT JOIN corpora c on cIxdI.corpus_id = c.corpus_id
-WHERE wordform_id = (SELECT wordform_id FROM wordforms WHERE wordform = %(lookup_word)s)
+    LEFT JOIN corpora c on text_attestations.corpus_id = c.corpus_id
+WHERE wordform_id = %(wordform_id)s
 GROUP BY c.corpus_id
     """
 
 
+def query_word_frequency_per_corpus_batch():
+    return """
+SELECT wordform_id AS source_id, 1e9 * SUM(frequency) / SUM(word_count) AS relative_frequency, c.name as corpus_name
+FROM text_attestations
+    LEFT JOIN documents ON text_attestations.document_id = documents.document_id
+    LEFT JOIN corpora c on text_attestations.corpus_id = c.corpus_id
+WHERE wordform_id IN %(wordform_ids)s
+GROUP BY wordform_id, c.corpus_id
+    """
+
+
 def query_word_links():
     return """
 SELECT    wordforms.wordform,
@@ -40,12 +49,24 @@ ON        wordform_links.wordform_from = source_x_wordform_link.wordform_from
 AND       wordform_links.wordform_to = source_x_wordform_link.wordform_to
 LEFT JOIN lexica
 ON        source_x_wordform_link.lexicon_id = lexica.lexicon_id
-WHERE     wordform_links.wordform_from =
-          (
-                 SELECT wordform_id
-                 FROM   wordforms
-                 WHERE  wordform = %(lookup_word)s
-          )
+WHERE     wordform_links.wordform_from = %(wordform_id)s
+"""
+
+
+def query_word_links_batch():
+    return """
+SELECT    wordform_links.wordform_from AS source_id,
+          wordforms.wordform,
+          lexicon_name
+FROM      wordform_links
+LEFT JOIN wordforms
+ON        wordform_links.wordform_to = wordforms.wordform_id
+LEFT JOIN source_x_wordform_link
+ON        wordform_links.wordform_from = source_x_wordform_link.wordform_from
+AND       wordform_links.wordform_to = source_x_wordform_link.wordform_to
+LEFT JOIN lexica
+ON        source_x_wordform_link.lexicon_id = lexica.lexicon_id
+WHERE     wordform_links.wordform_from IN %(wordform_ids)s
 """
 
 
@@ -54,7 +75,16 @@ def query_anahash_links():
 SELECT wf2.wordform
 FROM wordforms
        LEFT JOIN wordforms AS wf2 ON wordforms.anahash_id = wf2.anahash_id
-WHERE wordforms.wordform = %(lookup_word)s
+WHERE wordforms.wordform_id = %(wordform_id)s
+"""
+
+
+def query_anahash_links_batch():
+    return """
+SELECT wordforms.wordform_id AS source_id, wf2.wordform
+FROM wordforms
+       LEFT JOIN wordforms AS wf2 ON wordforms.anahash_id = wf2.anahash_id
+WHERE wordforms.wordform_id IN %(wordform_ids)s
 """
 
 
@@ -62,7 +92,15 @@ def query_morph_links():
     return """
 SELECT wordform FROM morphological_paradigms AS m1 LEFT JOIN morphological_paradigms AS m2 ON m1.X = m2.X AND m1.Y = m2.Y AND m1.Z = m2.Z AND m1.W = m2.W
     LEFT JOIN wordforms w on m1.wordform_id = w.wordform_id
-WHERE m2.wordform_id = (SELECT wordform_id FROM wordforms WHERE wordform = %(lookup_word)s);
+WHERE m2.wordform_id = %(wordform_id)s
+"""
+
+
+def query_morph_links_batch():
+    return """
+SELECT m2.wordform_id AS source_id, wordform FROM morphological_paradigms AS m1 LEFT JOIN morphological_paradigms AS m2 ON m1.X = m2.X AND m1.Y = m2.Y AND m1.Z = m2.Z AND m1.W = m2.W
+    LEFT JOIN wordforms w on m1.wordform_id = w.wordform_id
+WHERE m2.wordform_id IN %(wordform_ids)s
 """
 
 
@@ -73,8 +111,7 @@ SELECT paradigm_id, wordform, W, X, Y, Z FROM morphological_paradigms
     WHERE (Z,Y,X,W) IN (
         SELECT Z, Y, X, W
         FROM morphological_paradigms
-                 LEFT JOIN wordforms w on morphological_paradigms.wordform_id = w.wordform_id
-        WHERE wordform = %(lookup_word)s
+        WHERE wordform_id = %(wordform_id)s
     )
     AND word_type_code = 'HCL'
     """
@@ -82,54 +119,30 @@ SELECT paradigm_id, wordform, W, X, Y, Z FROM morphological_paradigms
 
 def find_morphological_variants_for_lemma():
     return """
-SELECT V,
-       W,
-       X,
-       Y,
-       Z,
-       word_type_code,
+SELECT DISTINCT mp2.V,
+       mp2.W,
+       mp2.X,
+       mp2.Y,
+       mp2.Z,
+       mp2.word_type_code,
        wordform,
-       wordform_id,
-       COUNT(DISTINCT corpus_id) AS num_corpora,
-       COUNT(DISTINCT lexicon_id) AS num_lexica,
-       MIN(year) AS min_year,
-       MAX(year) AS max_year,
-       COUNT(DISTINCT code) AS num_paradigms,
-       SUM(frequency) AS frequency
-FROM (SELECT mp2.V,
-             mp2.W,
-             mp2.X,
-             mp2.Y,
-             mp2.Z,
-             mp2.word_type_code,
-             wordform,
-             wordforms.wordform_id,
-             d.document_id,
-             c.corpus_id,
-             lsw.lexicon_id,
-             ta.frequency,
-             (mp3.W + mp3.X + mp3.Y + mp3.Z) AS code,
-             CASE
-                 WHEN d.pub_year IS NOT NULL THEN d.pub_year
-                 ELSE ROUND((d.year_from + d.year_to) / 2)
-             END
-             AS year
-      FROM morphological_paradigms mp1
-               LEFT JOIN morphological_paradigms mp2 ON
-                mp1.W = mp2.W AND
-                mp1.X = mp2.X AND
-                mp1.Y = mp2.Y AND
-                mp1.Z = mp2.Z
-               LEFT JOIN wordforms ON mp2.wordform_id = wordforms.wordform_id
-               LEFT JOIN text_attestations ta on wordforms.wordform_id = ta.wordform_id
-               LEFT JOIN documents d on ta.document_id = d.document_id
-               LEFT JOIN corpusId_x_documentId cIxdI on d.document_id = cIxdI.document_id
-               LEFT JOIN corpora c on cIxdI.corpus_id = c.corpus_id
-               LEFT JOIN lexical_source_wordform lsw on wordforms.wordform_id = lsw.wordform_id
-               LEFT JOIN morphological_paradigms mp3 ON wordforms.wordform_id = mp3.wordform_id
-      WHERE mp1.paradigm_id = %(paradigm_id)s
-     ) AS wordform_stats
-GROUP BY V, W, X, Y, Z, word_type_code, wordform, wordform_id
+       wordforms.wordform_id,
+       ws.num_corpora,
+       ws.num_lexica,
+       ws.min_year,
+       ws.max_year,
+       ws.num_paradigms,
+       ws.frequency
+FROM morphological_paradigms mp1
+         JOIN morphological_paradigms mp2 ON
+          mp1.W = mp2.W AND
+          mp1.X = mp2.X AND
+          mp1.Y = mp2.Y AND
+          mp1.Z = mp2.Z
+         LEFT JOIN wordforms ON mp2.wordform_id = wordforms.wordform_id
+         LEFT JOIN wordform_stats ws ON mp2.wordform_id = ws.wordform_id
+WHERE mp1.paradigm_id = %(paradigm_id)s
+ORDER BY mp2.V, mp2.W, mp2.X, mp2.Y, mp2.Z, wordforms.wordform_id
 """
 
 
@@ -216,3 +229,16 @@ AND word_type_code = 'HCL'
 ORDER BY frequency DESC
 LIMIT %(limit)s
 """
+
+
+def get_most_frequent_lemmas_for_xlist():
+    return """
+SELECT X, W, morphological_paradigms.wordform_id, frequency, wordform FROM morphological_paradigms
+LEFT JOIN wordform_frequency
+ON morphological_paradigms.wordform_id = wordform_frequency.wordform_id
+WHERE Z = %(Z)s
+AND Y = %(Y)s
+AND X IN %(x_list)s
+AND word_type_code = 'HCL'
+ORDER BY X, frequency DESC
+"""
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Contains the :class:`WordformResolver` class and a 'singleton' instance called `wordform_resolver`.
+
+Most routes get a wordform string, while the tables refer to wordforms by id.
+Instead of looking up the id in a subquery of every query, the routes resolve
+the wordform once with the resolver and pass the id to the queries, which can
+then use the primary key (or foreign key) indexes directly.
+
+Resolved ids are kept in a (per process) LRU cache, including wordforms that
+are not in the database. The cache is emptied when the database generation
+changes (see :mod:`ticclat.flask_app.cache`), because ingestion may add
+wordforms. Its size is set using the environment variable
+``TICCLAT_WORDFORM_CACHE_SIZE`` (default 100000, 0 disables caching).
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+
+from ticclat.flask_app.cache import query_cache
+from ticclat.ticclat_schema import Wordform
+
+# marks wordforms that are not in the cache (None marks wordforms that are not in the database)
+_NOT_CACHED = object()
+
+
+@dataclass
+class WordformResolver:
+    """Bounded LRU cache that maps wordforms to their ids.
+
+    Note:
+        There should only be one instance (also in this module, called `wordform_resolver`).
+    """
+
+    max_size: int = 100000
+    hits: int = 0
+    misses: int = 0
+    _ids: OrderedDict = field(default_factory=OrderedDict)
+    _generation: int = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def setup(self, max_size: int = None) -> None:
+        """Configure the cache size and empty the cache.
+
+        If `max_size` is not provided, the environment variable
+        ``TICCLAT_WORDFORM_CACHE_SIZE`` is used.
+        """
+        self.max_size = int(os.environ.get('TICCLAT_WORDFORM_CACHE_SIZE', 100000)) \
+            if max_size is None else max_size
+        self.clear()
+
+    def clear(self) -> None:
+        """Empty the cache and reset the counters."""
+        with self._lock:
+            self._ids.clear()
+            self.hits = 0
+            self.misses = 0
+            self._generation = None
+
+    def _check_generation(self, session) -> None:
+        generation = query_cache.generation(session)
+        with self._lock:
+            if generation != self._generation:
+                self._ids.clear()
+                self._generation = generation
+
+    def resolve(self, session, wordform: str):
+        """Return the id of `wordform`, or None if it is not in the database."""
+        return self.resolve_many(session, [wordform]).get(wordform)
+
+    def resolve_many(self, session, wordforms) -> dict:
+        """Resolve multiple wordforms; the uncached ones are looked up in one query.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): SQLAlchemy session object.
+            wordforms (list of str): the wordforms to look up.
+
+        Returns:
+            dict mapping the wordforms that are in the database to their ids.
+        """
+        self._check_generation(session)
+
+        result = {}
+        missing = set()
+        with self._lock:
+            for wordform in set(wordforms):
+                wordform_id = self._ids.get(wordform, _NOT_CACHED)
+                if wordform_id is _NOT_CACHED:
+                    missing.add(wordform)
+                    continue
+                self._ids.move_to_end(wordform)
+                if wordform_id is not None:
+                    result[wordform] = wordform_id
+            self.hits += len(set(wordforms)) - len(missing)
+            self.misses += len(missing)
+
+        if not missing:
+            return result
+
+        q = select([Wordform.wordform, Wordform.wordform_id]) \
+            .where(Wordform.wordform.in_(missing))
+        found = {row.wordform: row.wordform_id for row in session.execute(q)}
+        result.update(found)
+
+        if self.max_size > 0:
+            with self._lock:
+                for wordform in missing:
+                    self._ids[wordform] = found.get(wordform)
+                    self._ids.move_to_end(wordform)
+                while len(self._ids) > self.max_size:
+                    self._ids.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the size of the cache."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._ids),
+            'max_size': self.max_size,
+        }
+
+
+# The global wordform resolver 'singleton'
+wordform_resolver: WordformResolver = WordformResolver()
@@ -4,17 +4,69 @@ from timeit import default_timer as timer
 
 import pandas
 import sqlalchemy
-from flask import jsonify, request
+from flask import jsonify, request, Response
+from werkzeug.exceptions import BadRequest
 
 from ticclat.flask_app import raw_queries, queries
+from ticclat.flask_app.autocomplete import autocomplete_index
+from ticclat.flask_app.cache import query_cache
+from ticclat.flask_app.conditional import init_conditional_responses
 from ticclat.flask_app.db import database
+from ticclat.flask_app.fanout import run_concurrently
+from ticclat.flask_app.metrics import metrics, PROMETHEUS_MIMETYPE
+from ticclat.flask_app.paradigm_index import paradigm_index
 from ticclat.flask_app.paradigm_network import paradigm_network
 from ticclat.flask_app.plots.blueprint import plots as plots_blueprint
+from ticclat.flask_app.resolver import wordform_resolver
+from ticclat.flask_app.streaming import wants_ndjson, stream_query, stream_records
+from ticclat.slow_queries import slow_query_log
 from ticclat.utils import chunk_df
 
 
-# CORS
+# maximum number of wordforms in a request to one of the /batch routes
+MAX_BATCH_SIZE = 10000
+
+# maximum number of completions returned by /autocomplete
+MAX_AUTOCOMPLETE_LIMIT = 100
+
+
+def get_batch_wordforms():
+    """Get the list of wordforms from the JSON body of a batch request.
+
+    The body is either a list of wordforms or an object with a ``wordforms``
+    list.
+    """
+    data = request.get_json(force=True, silent=True)
+    if isinstance(data, dict):
+        data = data.get('wordforms')
+    if not isinstance(data, list) or not all(isinstance(wf, str) for wf in data):
+        raise BadRequest('Expected a JSON list of wordforms (or an object with a "wordforms" list).')
+    if len(data) > MAX_BATCH_SIZE:
+        raise BadRequest(f'Too many wordforms, the maximum is {MAX_BATCH_SIZE}.')
+    # remove duplicates, but keep the order
+    return list(dict.fromkeys(data))
+
+
+def get_int_arg(name: str):
+    """Get integer query parameter `name` (None if it is missing or empty).
+
+    Raises BadRequest if the value is not an integer.
+    """
+    if not request.args.get(name):
+        return None
+    value = request.args.get(name, type=int)
+    if value is None:
+        raise BadRequest(f'The {name} parameter should be an integer.')
+    return value
+
+
+# CORS (not for the debug routes, which should not be readable by other sites)
+DEBUG_ENDPOINTS = {'slow_queries'}
+
+
 def add_cors_headers(response):
+    if request.endpoint in DEBUG_ENDPOINTS:
+        return response
     response.headers['Access-Control-Allow-Origin'] = '*'
     if request.method == 'OPTIONS':
         response.headers['Access-Control-Allow-Methods'] = 'DELETE, GET, POST, PUT'
@@ -26,6 +78,7 @@ def add_cors_headers(response):
 
 def init_app(app, session):
     app.after_request(add_cors_headers)
+    init_conditional_responses(app)
 
     app.register_blueprint(plots_blueprint, url_prefix='/plots')
 
@@ -49,6 +102,27 @@ def init_app(app, session):
         routes = [str(rule) for rule in route_iterator]
         return jsonify(sorted(routes))
 
+    @app.route('/cache_stats')
+    def cache_stats():
+        stats = query_cache.stats()
+        stats['wordform_ids'] = wordform_resolver.stats()
+        return jsonify(stats)
+
+    @app.route('/metrics')
+    def _metrics():
+        return Response(metrics.to_prometheus(), mimetype=PROMETHEUS_MIMETYPE)
+
+    # the slow query log contains statements with their parameters, so it is
+    # only served if it is enabled (or in debug mode)
+    if slow_query_log.enabled or app.debug:
+        @app.route('/debug/slow_queries')
+        def slow_queries():
+            return jsonify({
+                'enabled': slow_query_log.enabled,
+                'threshold_seconds': slow_query_log.threshold,
+                'queries': slow_query_log.entries(),
+            })
+
     @app.route('/tables')
     def tables():
         return jsonify(database.engine.table_names())
@@ -59,6 +133,7 @@ def init_app(app, session):
         return jsonify({i[0]: str(i[1].type) for i in table.c.items()})
 
     @app.route('/corpora')
+    @query_cache.cached_response
     def corpora():
         query = """
     SELECT corpora.corpus_id, corpora.name, SUM(word_count) AS word_count, COUNT(d.document_id) AS document_count
@@ -66,24 +141,31 @@ def init_app(app, session):
     LEFT JOIN documents d on cIxdI.document_id = d.document_id
     GROUP BY corpora.corpus_id, corpora.name
         """
+        if wants_ndjson():
+            return stream_query(session.connection(), query)
         df = pandas.read_sql(query, session.connection())
         return jsonify(df.to_dict(orient='record'))
 
     @app.route("/word_frequency_per_year/<word_name>")
+    @query_cache.cached_response
     def word_frequency_per_year(word_name: str):
         corpus_id = request.args.get('corpus_id')
         if corpus_id:
             corpus_id = int(corpus_id)
         query = raw_queries.query_word_frequency_per_year(corpus_id)
-        df = pandas.read_sql(query, session.connection(), params={'lookup_word': word_name})
+        # an unknown wordform resolves to None (NULL), which matches no rows
+        wordform_id = wordform_resolver.resolve(session, word_name)
+        df = pandas.read_sql(query, session.connection(), params={'wordform_id': wordform_id})
         resp = jsonify(df.to_dict(orient='record'))
         resp.headers['X-QUERY'] = json.dumps(query)
         return resp
 
     @app.route("/word_frequency_per_corpus/<word_name>")
+    @query_cache.cached_response
     def word_frequency_per_corpus(word_name: str):
         query = raw_queries.query_word_frequency_per_corpus()
-        df = pandas.read_sql(query, session.connection(), params={'lookup_word': word_name})
+        wordform_id = wordform_resolver.resolve(session, word_name)
+        df = pandas.read_sql(query, session.connection(), params={'wordform_id': wordform_id})
         return jsonify(df.to_dict(orient='record'))
 
     @app.route("/word_frequency_per_corpus_per_year/<word_name>")
@@ -98,19 +180,33 @@ def init_app(app, session):
         return jsonify({'wordform': word_name, 'metadata': md, 'corpora': r})
 
     @app.route("/word/<word_name>")
+    @query_cache.cached_response
     def word(word_name: str):
-        connection = session.connection()
-        query = raw_queries.query_word_links()
-        df = pandas.read_sql(query, connection, params={'lookup_word': word_name})
-        lexicon_variants = df.to_dict(orient='records')
+        wordform_id = wordform_resolver.resolve(session, word_name)
+        if wordform_id is None:
+            return jsonify({'lexicon_variants': [], 'anahash_variants': [], 'morph_variants': []})
+
+        params = {'wordform_id': wordform_id}
 
-        query = raw_queries.query_anahash_links()
-        df = pandas.read_sql(query, connection, params={'lookup_word': word_name})
-        anahash_variants = df['wordform'].to_list()
+        def get_lexicon_variants(task_session):
+            query = raw_queries.query_word_links()
+            df = pandas.read_sql(query, task_session.connection(), params=params)
+            return df.to_dict(orient='records')
 
-        query = raw_queries.query_morph_links()
-        df = pandas.read_sql(query, connection, params={'lookup_word': word_name})
-        morph_variants = df['wordform'].to_list()
+        def get_anahash_variants(task_session):
+            query = raw_queries.query_anahash_links()
+            df = pandas.read_sql(query, task_session.connection(), params=params)
+            return df['wordform'].to_list()
+
+        def get_morph_variants(task_session):
+            if paradigm_index.ensure_loaded(task_session):
+                return queries.get_paradigm_siblings_from_index(task_session, word_name)
+            query = raw_queries.query_morph_links()
+            df = pandas.read_sql(query, task_session.connection(), params=params)
+            return df['wordform'].to_list()
+
+        lexicon_variants, anahash_variants, morph_variants = run_concurrently(
+            session, get_lexicon_variants, get_anahash_variants, get_morph_variants)
 
         return jsonify({
             'lexicon_variants': lexicon_variants,
@@ -118,6 +214,18 @@ def init_app(app, session):
             'morph_variants': morph_variants,
         })
 
+    @app.route("/batch/word", methods=['POST'])
+    def batch_word():
+        return jsonify(queries.get_word_links_batch(session, get_batch_wordforms()))
+
+    @app.route("/batch/lexica", methods=['POST'])
+    def batch_lexica():
+        return jsonify(queries.get_lexica_data_batch(session, get_batch_wordforms()))
+
+    @app.route("/batch/word_frequency_per_corpus", methods=['POST'])
+    def batch_word_frequency_per_corpus():
+        return jsonify(queries.get_word_frequency_per_corpus_batch(session, get_batch_wordforms()))
+
     @app.route("/variants/<word_name>")
     @app.route("/variants/<word_name>/<start_year>")
     @app.route("/variants/<word_name>/<start_year>/<end_year>")
@@ -136,15 +244,22 @@ def init_app(app, session):
         return jsonify(result)
 
     @app.route("/lemmas_for_wordform/<word_form>")
+    @query_cache.cached_response
     def lemmas_for_wordform(word_form: str):
+        if paradigm_index.ensure_loaded(session):
+            return jsonify(queries.get_lemmas_for_wordform_from_index(session, word_form))
         query = raw_queries.find_lemmas_for_wordform()
-        df = pandas.read_sql(query, session.connection(), params={'lookup_word': word_form})
+        wordform_id = wordform_resolver.resolve(session, word_form)
+        df = pandas.read_sql(query, session.connection(), params={'wordform_id': wordform_id})
         df = df.fillna(0)
         return jsonify(df.to_dict(orient='record'))
 
     @app.route("/morphological_variants_for_lemma/<paradigm_id>")
+    @query_cache.cached_response
     def morphological_variants_for_lemma(paradigm_id: int):
         query = raw_queries.find_morphological_variants_for_lemma()
+        if wants_ndjson():
+            return stream_query(session.connection(), query, {'paradigm_id': paradigm_id}, fillna=0)
         df = pandas.read_sql(query, session.connection(), params={'paradigm_id': paradigm_id})
         df = df.fillna(0)
         return jsonify(df.to_dict(orient='record'))
@@ -156,8 +271,13 @@ def init_app(app, session):
         return jsonify({'start': start, 'end': end})
 
     @app.route("/regexp_search/<regexp>")
+    @query_cache.cached_response
     def regexp_search(regexp: str):
         connection = session.connection()
+        if wants_ndjson():
+            # stream all matches, without the limit
+            query = """SELECT wordform FROM wordforms wf1 WHERE wf1.wordform REGEXP %(regexp)s"""
+            return stream_query(connection, query, {'regexp': regexp})
         query = """SELECT SQL_CALC_FOUND_ROWS wordform FROM wordforms wf1 WHERE wf1.wordform REGEXP %(regexp)s LIMIT 500"""
         df = pandas.read_sql(query, connection, params={'regexp': regexp})
         words = df['wordform'].to_list()
@@ -167,7 +287,20 @@ def init_app(app, session):
             'words': words
         })
 
+    @app.route("/autocomplete/<prefix>")
+    def _autocomplete(prefix: str):
+        limit = get_int_arg('limit')
+        if limit is None:
+            limit = 10
+        limit = min(max(limit, 1), MAX_AUTOCOMPLETE_LIMIT)
+        if autocomplete_index.loaded:
+            completions = autocomplete_index.complete(prefix, limit)
+        else:
+            completions = queries.autocomplete(session, prefix, limit)
+        return jsonify(completions)
+
     @app.route("/word_type_codes")
+    @query_cache.cached_response
     def word_type_codes():
         codes = queries.distinct_word_type_codes(session)
 
@@ -176,15 +309,19 @@ def init_app(app, session):
         return jsonify(codes)
 
     @app.route('/paradigm_count')
+    @query_cache.cached_response
     def _paradigm_count():
-        X = request.args.get('X', None)
-        Y = request.args.get('Y', None)
-        Z = request.args.get('Z', None)
+        X = get_int_arg('X')
+        Y = get_int_arg('Y')
+        Z = get_int_arg('Z')
+        if paradigm_index.ensure_loaded(session):
+            df = paradigm_index.count(Z=Z, Y=Y, X=X)
+            return jsonify(df.to_dict(orient='records'))
         query = f"""
     SELECT X,Y,Z, COUNT(W) AS num_paradigms FROM morphological_paradigms WHERE 1
-    {'AND X = %(X)s' if X else ''}
-    {'AND Y = %(Y)s' if Y else ''}
-    {'AND Z = %(Z)s' if Z else ''}
+    {'AND X = %(X)s' if X is not None else ''}
+    {'AND Y = %(Y)s' if Y is not None else ''}
+    {'AND Z = %(Z)s' if Z is not None else ''}
     GROUP BY X,Y,Z
     ORDER BY num_paradigms DESC
     """
@@ -192,6 +329,7 @@ def init_app(app, session):
         return jsonify(df.to_dict(orient='record'))
 
     @app.route('/network/<wordform>')
+    @query_cache.cached_response
     def _network(wordform: str):
         connection = session.connection()
         return jsonify(paradigm_network(connection, wordform))
@@ -225,6 +363,16 @@ def init_app(app, session):
 
         half_way = timer()
 
+        if wants_ndjson():
+            # stream the pairs while the second suffix is matched chunk by chunk
+            def matched_pairs():
+                for chunk in chunk_df(df, batch_size=500):
+                    matches = queries.get_wordform_matches(session, chunk, min_freq)
+                    result = pandas.merge(chunk, matches, on='wordform2')
+                    result.columns = ['word1', 'word1_freq', 'word2', 'word2_freq']
+                    yield from result.to_dict(orient='records')
+            return stream_records(matched_pairs())
+
         pairs = []
 
         # match with second suffix
@@ -253,11 +401,15 @@ def init_app(app, session):
         })
 
     @app.route("/variants_by_wxyz")
+    @query_cache.cached_response
     def _variants_by_wxyz():
-        W = request.args.get('w')
-        X = request.args.get('x')
-        Y = request.args.get('y')
-        Z = request.args.get('z')
+        W = get_int_arg('w')
+        X = get_int_arg('x')
+        Y = get_int_arg('y')
+        Z = get_int_arg('z')
+
+        if None not in (W, X, Y, Z) and paradigm_index.ensure_loaded(session):
+            return jsonify(queries.get_paradigm_members_from_index(session, W, X, Y, Z))
 
         query = """
     SELECT IFNULL(frequency, 0) AS frequency, w.wordform FROM morphological_paradigms
@@ -275,10 +427,14 @@ def init_app(app, session):
         return jsonify(df.to_dict(orient="record"))
 
     @app.route("/corrections/<word_name>")
+    @query_cache.cached_response
     def corrections(word_name: str):
-        paradigms, md = queries.get_wf_variants(session, word_name)
-        q = "SELECT wordform, frequency, levenshtein_distance FROM ticcl_variants WHERE wordform_source = %(wordform)s"
-        df = pandas.read_sql(q, session.connection(), params={'wordform': word_name})
+        def get_corrections(task_session):
+            q = "SELECT wordform, frequency, levenshtein_distance FROM ticcl_variants WHERE wordform_source = %(wordform)s"
+            return pandas.read_sql(q, task_session.connection(), params={'wordform': word_name})
+
+        (paradigms, md), df = run_concurrently(
+            session, lambda task_session: queries.get_wf_variants(task_session, word_name), get_corrections)
         return jsonify({'wordform': word_name,
                         'paradigms': paradigms,
                         'metadata': md,
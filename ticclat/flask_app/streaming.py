@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Streaming newline-delimited JSON (NDJSON) responses.
+
+Routes that can return large results build a full DataFrame and serialize it
+in one go by default. If the client asks for NDJSON (using the
+``Accept: application/x-ndjson`` header or the ``format=ndjson`` query
+parameter), these routes instead read the query result from a server-side
+cursor in chunks and write one JSON object per line. This keeps the memory
+use of the worker flat and the first results arrive immediately.
+"""
+import datetime
+import decimal
+import json
+import math
+
+from flask import Response, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# number of rows fetched from the server-side cursor at a time
+CHUNK_SIZE = 1000
+
+
+def wants_ndjson() -> bool:
+    """True if the client asked for a streaming NDJSON response."""
+    if request.args.get('format') == 'ndjson':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        # numpy scalars (e.g. from DataFrame.to_dict)
+        return value.item()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _clean(record: dict, fillna) -> dict:
+    if fillna is None:
+        return record
+    return {key: fillna if value is None or (isinstance(value, float) and math.isnan(value)) else value
+            for key, value in record.items()}
+
+
+def ndjson_lines(records, fillna=None):
+    """Generator that serializes dicts from `records` to lines of JSON.
+
+    Args:
+        records: iterable of dicts.
+        fillna: if not None, missing values (None/NaN) are replaced by this
+            value (like ``DataFrame.fillna``).
+    """
+    for record in records:
+        yield json.dumps(_clean(record, fillna), default=_json_default) + '\n'
+
+
+def stream_records(records, fillna=None) -> Response:
+    """Return a streaming NDJSON response for an iterable of dicts."""
+    return Response(stream_with_context(ndjson_lines(records, fillna)),
+                    mimetype=NDJSON_MIMETYPE)
+
+
+def iterate_query(connection, query, params=None, chunk_size=CHUNK_SIZE):
+    """Generator that yields the rows of `query` as dicts.
+
+    The query is executed with a server-side cursor (``stream_results``), and
+    rows are fetched `chunk_size` at a time.
+    """
+    result = connection.execution_options(stream_results=True).execute(query, params or {})
+    try:
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        result.close()
+
+
+def stream_query(connection, query, params=None, fillna=None) -> Response:
+    """Return a streaming NDJSON response with the rows of `query`."""
+    return stream_records(iterate_query(connection, query, params), fillna)
@@ -12,9 +12,9 @@ import tempfile
 from ticclat.utils import set_logger
 from ticclat.ingest import elex, gb, opentaal, sonar, inl, sgd, edbo, \
     twente_spelling_correction_list, dbnl, morph_par, wf_frequencies, \
-    sgd_ticcl_variants, ticcl_variants
+    sgd_ticcl_variants, ticcl_variants, wordform_stats
 from ticclat.dbutils import get_db_name, update_anahashes_new, create_ticclat_database, \
-    get_session_maker, session_scope
+    get_session_maker, session_scope, bump_database_generation
 from ticclat.ticclat_schema import Anahash
 
 
@@ -33,10 +33,17 @@ ALL_SOURCES = {
     'dbnl': dbnl,
     'morph_par': morph_par,
     'wf_freqs': wf_frequencies,
+    'wordform_stats': wordform_stats,
     # 'sgd_ticcl': sgd_ticcl_variants
     'ticcl_variants': ticcl_variants
 }
 
+# Sources that are only ingested when they are in `include`. The full rebuild
+# of the wordform_frequency table re-sums all text attestations; it is only
+# needed to initialize or reconcile the table, because adding corpora and
+# lexica updates it incrementally.
+OPT_IN_SOURCES = {'wf_freqs'}
+
 
 def ingest_all(session_maker, base_dir='/data',
                include=None, exclude=None, **kwargs):
@@ -47,7 +54,8 @@ def ingest_all(session_maker, base_dir='/data',
     include or exclude kwargs (not both at the same time) to specify
     which sources to ingest. If include is used, only the sources in
     that list will be ingested. For exclude, all sources except those
-    in the list will be ingested. The sources are expected to be in
+    in the list will be ingested. The sources in OPT_IN_SOURCES are only
+    ingested when they are in include. The sources are expected to be in
     a certain format under one central base directory specfied using
     base_dir. See the specific ingestion functions for more on how
     the sources should be organized.
@@ -66,14 +74,18 @@ def ingest_all(session_maker, base_dir='/data',
     if len(include) > 0:
         sources = {k: ALL_SOURCES[k] for k in include}
     elif len(exclude) > 0:
-        sources = {k: v for k, v in ALL_SOURCES.items() if k not in exclude}
+        sources = {k: v for k, v in ALL_SOURCES.items()
+                   if k not in exclude and k not in OPT_IN_SOURCES}
     else:
-        sources = ALL_SOURCES
+        sources = {k: v for k, v in ALL_SOURCES.items() if k not in OPT_IN_SOURCES}
 
     for name, source in sources.items():
         LOGGER.info('ingesting %s...', name)
         source.ingest(session_maker, base_dir=base_dir, **kwargs)
 
+    with session_scope(session_maker) as session:
+        bump_database_generation(session)
+
 
 def run(reset_db=False,
         alphabet_file="/data/ALPH/nld.aspell.dict.clip20.lc.LD3.charconfus.clip20.lc.chars",
@@ -127,3 +139,7 @@ def run(reset_db=False,
         LOGGER.info("adding anahashes...")
         with session_scope(session_maker) as session:
             update_anahashes_new(session, alphabet_file)
+
+    if reset_anahashes or anahash:
+        with session_scope(session_maker) as session:
+            bump_database_generation(session)
@@ -3,7 +3,7 @@
 import os.path
 
 from ..ticclat_schema import MorphologicalParadigm
-from ..dbutils import session_scope, add_morphological_paradigms, empty_table
+from ..dbutils import session_scope, add_morphological_paradigms, shadow_table
 
 # ! In this version of the data, the first line contains noise and is removed
 # ! before ingesting the data.
@@ -17,9 +17,11 @@ def ingest(session_maker, base_dir='', morph_par_file=INPUT, **kwargs):
     """
     Ingest morphological paradigms into TICCLAT database.
 
-    Removes any existing data from the morphological_paradigms database table.
+    Replaces any existing data in the morphological_paradigms database table.
+    The paradigms are loaded into a shadow table, which replaces the live table
+    when it is complete, so the table can be queried during the ingestion.
     """
     with session_scope(session_maker) as session:
-        empty_table(session, MorphologicalParadigm)
-
-        add_morphological_paradigms(session, os.path.join(base_dir, morph_par_file))
+        with shadow_table(session, MorphologicalParadigm) as table:
+            add_morphological_paradigms(session, os.path.join(base_dir, morph_par_file),
+                                        table_object=table)
@@ -0,0 +1,8 @@
+from ..dbutils import session_scope, create_wordform_stats_table
+
+
+# Like wf_frequencies, this is not an ingestion, but an aggregation table created from existing data.
+
+def ingest(session_maker, **kwargs):
+    with session_scope(session_maker) as session:
+        create_wordform_stats_table(session)
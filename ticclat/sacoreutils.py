@@ -11,15 +11,17 @@ import numpy as np
 import pandas as pd
 
 from sqlalchemy import create_engine
-from sqlalchemy.sql import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.sql import select, func
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from tqdm import tqdm
 
 from ticclat.ticclat_schema import Wordform, Corpus, Document, \
-    TextAttestation, Anahash, corpusId_x_documentId
+    TextAttestation, Anahash, WordformFrequencies, corpusId_x_documentId
 from ticclat.utils import chunk_df, write_json_lines, read_json_lines, \
-    get_temp_file, iterate_wf, chunk_json_lines, count_lines
+    get_temp_file, iterate_wf, chunk_json_lines, count_lines, WordformMapping, \
+    map_wordforms
 
 LOGGER = logging.getLogger(__name__)
 
@@ -49,12 +51,12 @@ def sql_insert(engine, table_object, to_insert):
     Inputs:
         engine: SQLAlchemy engine or session
         table_object: object representing a table in the database (i.e., one
-            of the objects from ticclat_schema)
+            of the objects from ticclat_schema, or a sqlalchemy Table)
         to_insert (list of dicts): list containg dictionary representations of
             the objects (rows) to be inserted
     """
-
-    engine.execute(table_object.__table__.insert(), to_insert)
+    table = getattr(table_object, '__table__', table_object)
+    engine.execute(table.insert(), to_insert)
 
 
 def sql_query_batches(engine, query, iterator, total=0, batch_size=10000):
@@ -141,7 +143,57 @@ def bulk_add_anahashes_core(engine, iterator, **kwargs):
     sql_insert_batches(engine, Anahash, iterator, **kwargs)
 
 
-def get_tas(corpus, doc_ids, wf_mapping, word_from_tdmatrix_id):
+def merge_wordform_frequencies(engine, iterator, **kwargs):
+    """
+    Add the wordform frequency deltas in `iterator` to the wordform_frequency table.
+
+    The items are dicts with the `wordform_id`, `wordform` and `frequency`
+    (the delta) of a wordform. Wordforms that are not in the table yet are
+    inserted with the delta as frequency, for the other wordforms the delta is
+    added to the frequency (``INSERT ... ON DUPLICATE KEY UPDATE``). A delta of
+    0 makes sure a wordform has a row, without changing its frequency.
+
+    Convenience wrapper around `sql_query_batches`.
+    """
+    table = WordformFrequencies.__table__
+    statement = mysql_insert(table)
+    statement = statement.on_duplicate_key_update(
+        frequency=func.coalesce(table.c.frequency, 0) + statement.inserted.frequency)
+    sql_query_batches(engine, statement, iterator, **kwargs)
+
+
+def text_attestations_partitions(engine):
+    """
+    Return the names of the partitions of the text_attestations table.
+
+    The list is empty if the table is not partitioned (see
+    `dbutils.partition_text_attestations`).
+    """
+    result = engine.execute("""
+SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'text_attestations' AND PARTITION_NAME IS NOT NULL
+ORDER BY PARTITION_ORDINAL_POSITION
+    """)
+    return [row[0] for row in result]
+
+
+def add_corpus_partition(engine, corpus_id):
+    """
+    Add a partition for corpus `corpus_id` to the text_attestations table.
+
+    Does nothing if the table is not partitioned, or if the partition exists.
+    Take care: MySQL commits the current transaction of `engine` before
+    altering the table, so inside a transaction, run this on a separate
+    connection (like `add_corpus_core` does).
+    """
+    partitions = text_attestations_partitions(engine)
+    if partitions and f'p{corpus_id}' not in partitions:
+        LOGGER.info('Adding partition for corpus %s to text_attestations', corpus_id)
+        engine.execute(f'ALTER TABLE text_attestations '
+                       f'ADD PARTITION (PARTITION p{int(corpus_id)} VALUES IN ({int(corpus_id)}))')
+
+
+def get_tas(corpus, doc_ids, wf_mapping, word_from_tdmatrix_id, corpus_id=None):
     """
     Get term attestation from wordform frequency matrix.
 
@@ -152,16 +204,45 @@ def get_tas(corpus, doc_ids, wf_mapping, word_from_tdmatrix_id):
         corpus: the dense corpus term-document matrix, like from
                 `tokenize.terms_documents_matrix_ticcl_frequency`
         doc_ids: list of indices of documents in the term-document matrix
-        wf_mapping: dictionary mapping wordforms (key) to database wordform_id
+        wf_mapping: `utils.WordformMapping` (or dictionary) mapping wordforms
+                    to database wordform_id
         word_from_tdmatrix_id: mapping of term-document matrix column index
                                (key) to wordforms (value)
+        corpus_id: database id of the corpus the documents belong to
+
+    The attestations are sorted by (wordform_id, document_id), the primary
+    key of the text_attestations table, so they are inserted in the order of
+    the clustered index.
+    """
+    # converting to CSR sums duplicate entries
+    corpus_coo = scipy.sparse.csr_matrix(corpus).tocoo()
+    columns, column_ix = np.unique(corpus_coo.col, return_inverse=True)
+    words = [word_from_tdmatrix_id[col] for col in columns.tolist()]
+    wordform_ids = map_wordforms(wf_mapping, words)[column_ix.ravel()]
+    document_ids = np.asarray(doc_ids, dtype=np.int64)[corpus_coo.row]
+
+    for i in np.lexsort((document_ids, wordform_ids)):
+        yield {'wordform_id': int(wordform_ids[i]),
+               'document_id': int(document_ids[i]),
+               'corpus_id': corpus_id,
+               'frequency': int(corpus_coo.data[i])}
+
+
+def get_wf_frequency_deltas(corpus, wf_mapping, word_from_tdmatrix_id):
+    """
+    Get the total frequency of each wordform in a term-document matrix.
+
+    These are the deltas for the wordform_frequency table (see
+    `merge_wordform_frequencies`) when the corpus is added.
+
+    Inputs: see `get_tas`
     """
-    corpus_coo = scipy.sparse.coo_matrix(corpus)
-    for tdmatrix_doc_ix, tdmatrix_word_ix, tdmatrix_value in zip(corpus_coo.row, corpus_coo.col, corpus_coo.data):
-        word = word_from_tdmatrix_id[tdmatrix_word_ix]
-        freq = tdmatrix_value
-        yield {'wordform_id': wf_mapping[word],
-               'document_id': doc_ids[tdmatrix_doc_ix],
+    frequencies = np.asarray(scipy.sparse.csr_matrix(corpus).sum(axis=0)).ravel()
+    words = [word_from_tdmatrix_id[ix] for ix in range(len(frequencies))]
+    wordform_ids = map_wordforms(wf_mapping, words).tolist()
+    for word, wordform_id, freq in zip(words, wordform_ids, frequencies.tolist()):
+        yield {'wordform_id': wordform_id,
+               'wordform': word,
                'frequency': int(freq)}
 
 
@@ -174,7 +255,8 @@ def add_corpus_core(session, corpus_matrix, vectorizer, corpus_name,
     This function adds all words as wordforms to the database, records their
     "attestation" (the fact that they occur in a certain document and with what
     frequency), adds the documents they belong to, adds the corpus and adds the
-    corpus ID to the documents.
+    corpus ID to the documents. The frequencies of the wordforms in the corpus
+    are added to the wordform_frequency table.
 
     Inputs:
         session: SQLAlchemy session (e.g. from `dbutils.get_session`)
@@ -235,6 +317,12 @@ def add_corpus_core(session, corpus_matrix, vectorizer, corpus_name,
             session.flush()
             corpus_id = corpus.corpus_id
 
+            # Altering the table commits the transaction of the connection it
+            # runs on, so the partition is added on a separate connection.
+            # If the ingest fails, the (empty) partition is left behind.
+            with session.get_bind().engine.connect() as connection:
+                add_corpus_partition(connection, corpus_id)
+
             # Insert the wordforms that need to be added using SQLAlchemy core (much
             # faster than using the ORM)
             LOGGER.info('Adding the wordforms')
@@ -246,15 +334,19 @@ def add_corpus_core(session, corpus_matrix, vectorizer, corpus_name,
     df = df.reset_index()
 
     LOGGER.info('\tGetting the wordform ids')
-    wf_mapping = {}
+    wordforms, wordform_ids = [], []
 
     for chunk in chunk_df(df, batch_size=batch_size):
         to_select = list(chunk['index'])
-        select_statement = select([Wordform]).where(Wordform.wordform.in_(to_select))
+        select_statement = select([Wordform.wordform_id, Wordform.wordform]) \
+            .where(Wordform.wordform.in_(to_select))
         result = session.execute(select_statement).fetchall()
-        for wordform in result:
-            # wordform: (id, wordform, anahash_id, wordform_lowercase)
-            wf_mapping[wordform[1]] = wordform[0]
+        for wordform_id, wordform in result:
+            wordforms.append(wordform)
+            wordform_ids.append(wordform_id)
+
+    wf_mapping = WordformMapping(wordforms, wordform_ids)
+    del wordforms, wordform_ids
 
     LOGGER.info('\tGetting the document ids')
     # get doc_ids
@@ -271,9 +363,14 @@ def add_corpus_core(session, corpus_matrix, vectorizer, corpus_name,
 
     LOGGER.info('\tGetting the text attestations')
     with get_temp_file() as ta_file:
-        write_json_lines(ta_file, get_tas(corpus_matrix, doc_ids, wf_mapping, word_from_tdmatrix_id))
+        write_json_lines(ta_file, get_tas(corpus_matrix, doc_ids, wf_mapping, word_from_tdmatrix_id,
+                                          corpus_id=corpus_id))
 
         LOGGER.info('Adding the text attestations')
         total = count_lines(ta_file)
         bulk_add_textattestations_core(session, read_json_lines(ta_file),
                                        total=total, batch_size=batch_size)
+
+    LOGGER.info('Updating the wordform frequencies')
+    merge_wordform_frequencies(session, get_wf_frequency_deltas(corpus_matrix, wf_mapping, word_from_tdmatrix_id),
+                               total=len(word_from_tdmatrix_id), batch_size=batch_size)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Contains the :class:`SlowQueryLog` class and a 'singleton' instance called `slow_query_log`.
+
+The slow query log records SQL statements that take longer than a threshold,
+together with their parameters, the Flask route that ran them (if any) and
+the query plan of the statement (``EXPLAIN FORMAT=JSON``, MySQL only). The
+plan is obtained on a separate (raw DBAPI) connection, so it doesn't
+interfere with the transaction of the slow statement. The last statements are
+kept in a bounded ring buffer, which the Flask app serves on
+``/debug/slow_queries``.
+
+It is disabled by default, and configured using environment variables:
+
+- ``TICCLAT_SLOW_QUERY_MS``: threshold in milliseconds; when set, statements
+  taking longer are recorded (0 records all statements);
+- ``TICCLAT_SLOW_QUERY_LOG_SIZE``: number of statements to keep (default 100);
+- ``TICCLAT_SLOW_QUERY_EXPLAIN``: set to 0 to skip the ``EXPLAIN``.
+
+The engines created by :meth:`ticclat.flask_app.db.Database.setup` and
+:func:`ticclat.dbutils.get_engine` are instrumented automatically. This module
+does not depend on Flask; the Flask app sets :attr:`SlowQueryLog.route_info` to
+look up the route of the current request.
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# statements that can be explained (and that do not change data when explained)
+EXPLAINABLE = ('select', 'with')
+
+# maximum length of the repr of the parameters that is stored
+MAX_PARAMETERS_LENGTH = 2000
+
+
+@dataclass
+class SlowQueryLog:
+    """Ring buffer of the statements that took longer than `threshold` seconds.
+
+    Note:
+        There should only be one instance (also in this module, called `slow_query_log`).
+    """
+
+    threshold: float = None
+    max_entries: int = 100
+    explain: bool = True
+    # function that returns the route of the current request (or None)
+    route_info: Callable = None
+    _configured: bool = False
+    _entries: deque = field(default_factory=lambda: deque(maxlen=100))
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether slow statements are recorded."""
+        return self.threshold is not None
+
+    def setup(self, threshold: float = None, max_entries: int = None, explain: bool = None) -> None:
+        """Configure the log and empty it.
+
+        Arguments that are not provided are read from the environment
+        variables (see the module documentation). `threshold` is in seconds.
+        """
+        if threshold is None:
+            threshold_ms = os.environ.get('TICCLAT_SLOW_QUERY_MS', '').strip()
+            threshold = float(threshold_ms) / 1000 if threshold_ms else None
+        self.threshold = threshold
+        self.max_entries = int(os.environ.get('TICCLAT_SLOW_QUERY_LOG_SIZE', 100)) \
+            if max_entries is None else max_entries
+        self.explain = os.environ.get('TICCLAT_SLOW_QUERY_EXPLAIN', '1') != '0' \
+            if explain is None else explain
+        with self._lock:
+            self._entries = deque(maxlen=self.max_entries)
+        self._configured = True
+
+    def clear(self) -> None:
+        """Remove all recorded statements."""
+        with self._lock:
+            self._entries.clear()
+
+    def entries(self) -> list:
+        """Return the recorded statements, the slowest first."""
+        with self._lock:
+            entries = list(self._entries)
+        return sorted(entries, key=lambda entry: entry['seconds'], reverse=True)
+
+    def instrument(self, engine) -> None:
+        """Record the slow statements run on `engine`.
+
+        The event handlers are always added (once per engine), so the log can
+        be enabled later using :meth:`setup`. If the log was not set up yet, it
+        is set up using the environment variables.
+        """
+        if not self._configured:
+            self.setup()
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def record(self, engine, statement: str, parameters, seconds: float) -> None:
+        """Add a slow statement to the log (and explain it if possible)."""
+        entry = {
+            'statement': statement,
+            'parameters': _format_parameters(parameters),
+            'seconds': seconds,
+            'time': datetime.datetime.utcnow().isoformat(timespec='seconds'),
+            'route': None,
+            'plan': None,
+        }
+        if self.route_info is not None:
+            entry['route'] = self.route_info()
+        if self.explain and parameters is not None:
+            entry['plan'] = explain(engine, statement, parameters)
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning('Slow query (%.3f s): %s', seconds, statement)
+
+
+def _format_parameters(parameters):
+    if isinstance(parameters, dict):
+        formatted = {str(k): repr(v) for k, v in parameters.items()}
+    else:
+        formatted = [repr(v) for v in parameters or ()]
+    if len(repr(formatted)) > MAX_PARAMETERS_LENGTH:
+        return repr(formatted)[:MAX_PARAMETERS_LENGTH] + '...'
+    return formatted
+
+
+def explain(engine, statement: str, parameters):
+    """Return the query plan (``EXPLAIN FORMAT=JSON``) of `statement` as a string.
+
+    The plan is obtained on a separate connection of `engine`. Returns None if
+    the statement can't be explained (other database than MySQL, statements
+    other than ``SELECT``) or the ``EXPLAIN`` fails.
+    """
+    if engine.dialect.name != 'mysql' or not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    # a raw DBAPI connection, so the EXPLAIN itself doesn't trigger the event handlers
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('EXPLAIN FORMAT=JSON ' + statement, parameters)
+        row = cursor.fetchone()
+        cursor.close()
+        return row[0] if row else None
+    except Exception as exception:  # pylint: disable=broad-except
+        logger.warning('Could not explain slow query: %s', exception)
+        return None
+    finally:
+        connection.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if slow_query_log.enabled:
+        conn.info['slow_query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop('slow_query_start', None)
+    if start is None or not slow_query_log.enabled:
+        return
+    seconds = time.perf_counter() - start
+    if seconds >= slow_query_log.threshold:
+        slow_query_log.record(conn.engine, statement, None if executemany else parameters, seconds)
+
+
+# The global slow query log 'singleton'
+slow_query_log: SlowQueryLog = SlowQueryLog()
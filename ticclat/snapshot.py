@@ -0,0 +1,217 @@
+"""
+Read-optimized (columnar) snapshots of the TICCLAT database.
+
+The analytic queries in `ticclat.flask_app.queries` (counts per lexicon,
+corpus or document, `num_wfs_per_anahash`, `wfs_min_num_lexica`, ...) scan
+large parts of the tables, which is slow in MySQL and competes with the
+queries of the live API. A snapshot contains all tables as Parquet files,
+sorted (and for some tables partitioned) for the common access paths. The
+same query functions can be run on a snapshot using DuckDB::
+
+    from ticclat import snapshot
+    from ticclat.flask_app import queries
+
+    session = snapshot.get_snapshot_session('/data/snapshot')
+    queries.count_wfs_in_lexica(session).fetchall()
+
+Export a snapshot of the database in ``DATABASE_URL`` with::
+
+    $ python -m ticclat.snapshot /data/snapshot
+
+This module needs the ``snapshot`` extra (``pip install ticclat[snapshot]``,
+i.e. pyarrow, duckdb and duckdb_engine).
+
+The query result cache of the Flask app keys results by the database URL, so
+memoized queries can be run on a snapshot in the process of the app. The
+wordform id cache (:mod:`ticclat.flask_app.resolver`) is only keyed by the
+database generation (which is included in the snapshot), so don't resolve
+wordforms using a snapshot session in the process of the app.
+"""
+
+import datetime
+import json
+import logging
+import shutil
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, event, select, types
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ticclat.dbutils import get_engine
+from ticclat.ticclat_schema import Base
+
+LOGGER = logging.getLogger(__name__)
+
+MANIFEST = 'snapshot.json'
+
+# partition column and sort order of tables, for the common access paths;
+# other tables are sorted by their primary key
+TABLE_LAYOUTS = {
+    'text_attestations': {'order_by': ['wordform_id', 'document_id']},
+    'lexical_source_wordform': {'partition_by': 'lexicon_id', 'order_by': ['lexicon_id', 'wordform_id']},
+    'corpusId_x_documentId': {'partition_by': 'corpus_id', 'order_by': ['corpus_id', 'document_id']},
+    'morphological_paradigms': {'order_by': ['Z', 'Y', 'X', 'W', 'V']},
+    'wordforms': {'order_by': ['wordform_id']},
+    'wordform_links': {'order_by': ['wordform_from', 'wordform_to']},
+    'source_x_wordform_link': {'order_by': ['wordform_from', 'wordform_to']},
+}
+
+
+def arrow_type(column_type):
+    """Return the Arrow type for SQLAlchemy column type `column_type`."""
+    if isinstance(column_type, types.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, types.Integer):
+        return pa.int64()
+    if isinstance(column_type, types.Float):
+        return pa.float64()
+    if isinstance(column_type, types.Numeric):
+        return pa.float64()
+    if isinstance(column_type, types.DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, types.Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _layout(table):
+    layout = TABLE_LAYOUTS.get(table.name, {})
+    order_by = layout.get('order_by') or [c.name for c in table.primary_key.columns] \
+        or [c.name for c in table.columns]
+    return layout.get('partition_by'), [c for c in order_by if c in table.columns]
+
+
+def _write_parquet(rows, columns, schema, path):
+    arrays = [pa.array([row[i] for row in rows], type=field.type)
+              for i, field in enumerate(schema) if field.name in columns]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.Table.from_arrays(arrays, schema=pa.schema([f for f in schema if f.name in columns])),
+                   path, compression='zstd')
+
+
+def export_table(connection, table, path, chunk_size=1000000) -> dict:
+    """Export `table` to Parquet files in directory `path`.
+
+    The rows are read in the sort order of the table (see `TABLE_LAYOUTS`)
+    with a server-side cursor, and written to one file per `chunk_size` rows
+    (and per partition, in a ``<column>=<value>`` directory).
+
+    Returns:
+        dict with the number of rows, the number of files and the partition
+        column (None if the table is not partitioned).
+    """
+    partition_by, order_by = _layout(table)
+    column_names = [c.name for c in table.columns]
+    schema = pa.schema([(c.name, arrow_type(c.type)) for c in table.columns])
+    file_columns = [c for c in column_names if c != partition_by]
+
+    query = select([table]).order_by(*[table.c[c] for c in order_by])
+    result = connection.execution_options(stream_results=True).execute(query)
+    num_rows = 0
+    num_files = 0
+    try:
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            num_rows += len(rows)
+            if partition_by is None:
+                _write_parquet(rows, file_columns, schema, path / f'part-{num_files:05d}.parquet')
+                num_files += 1
+                continue
+            # rows are sorted by the partition column
+            partition_index = column_names.index(partition_by)
+            partitions = {}
+            for row in rows:
+                partitions.setdefault(row[partition_index], []).append(row)
+            for value, partition_rows in partitions.items():
+                _write_parquet(partition_rows, file_columns, schema,
+                               path / f'{partition_by}={value}' / f'part-{num_files:05d}.parquet')
+                num_files += 1
+    finally:
+        result.close()
+
+    if num_rows == 0:
+        # an empty file, so the table can be queried
+        _write_parquet([], column_names, schema, path / 'part-00000.parquet')
+        return {'rows': 0, 'files': 1, 'partition_by': None}
+    return {'rows': num_rows, 'files': num_files, 'partition_by': partition_by}
+
+
+def export_snapshot(bind, path, tables=None, chunk_size=1000000) -> dict:
+    """Export the tables of the TICCLAT database to a snapshot in directory `path`.
+
+    An existing snapshot in `path` is replaced.
+
+    Args:
+        bind: SQLAlchemy engine or connection of the database.
+        path: directory of the snapshot.
+        tables: names of the tables to export (default: all tables in the schema).
+        chunk_size: maximum number of rows per Parquet file.
+
+    Returns:
+        the manifest of the snapshot (also written to ``snapshot.json``).
+    """
+    path = Path(path)
+    if path.exists():
+        shutil.rmtree(path)
+    path.mkdir(parents=True)
+
+    manifest = {'created_at': datetime.datetime.utcnow().isoformat(timespec='seconds'),
+                'tables': {}}
+    connection = bind.connect() if isinstance(bind, Engine) else bind
+    try:
+        for table in Base.metadata.sorted_tables:
+            if tables is not None and table.name not in tables:
+                continue
+            LOGGER.info('Exporting table %s', table.name)
+            manifest['tables'][table.name] = export_table(connection, table, path / table.name,
+                                                          chunk_size=chunk_size)
+    finally:
+        if connection is not bind:
+            connection.close()
+
+    with open(path / MANIFEST, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+
+def create_views(connection, path) -> None:
+    """Create a view for every table of the snapshot in `path` in DuckDB `connection`."""
+    path = Path(path).resolve()
+    with open(path / MANIFEST) as manifest_file:
+        manifest = json.load(manifest_file)
+    cursor = connection.cursor()
+    for name, info in manifest['tables'].items():
+        files = str(path / name / '**' / '*.parquet').replace("'", "''")
+        hive = 'true' if info['partition_by'] else 'false'
+        cursor.execute(f'CREATE OR REPLACE VIEW "{name}" AS '
+                       f"SELECT * FROM read_parquet('{files}', hive_partitioning = {hive})")
+    cursor.close()
+
+
+def get_snapshot_engine(path):
+    """Return a SQLAlchemy engine on an in-memory DuckDB database with views of the snapshot in `path`."""
+    engine = create_engine('duckdb:///:memory:')
+
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):  # pylint: disable=unused-argument
+        create_views(dbapi_connection, path)
+
+    return engine
+
+
+def get_snapshot_session(path):
+    """Return a SQLAlchemy session to run (read-only) queries on the snapshot in `path`."""
+    return Session(bind=get_snapshot_engine(path))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 2:
+        sys.exit('Usage: python -m ticclat.snapshot <snapshot directory>')
+    export_snapshot(get_engine(), sys.argv[1])
@@ -18,10 +18,11 @@ Based on this, in TICCLAT, we added tables for:
 - anagram hashes from TICCL
 - spelling variants from TICCL
 - identifiers linking wordforms to external sources like the WNT, MNW, INT.
+- a version stamp that is increased whenever data is ingested.
 """
 
 from sqlalchemy import Column, String, Table, ForeignKey, Unicode, Boolean, \
-    Integer, BigInteger, ForeignKeyConstraint
+    Integer, BigInteger, ForeignKeyConstraint, DateTime
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -41,13 +42,24 @@ class TextAttestation(Base):
 
     A text attestation entry is defined in the INT schema as the occurrence
     and frequency of wordforms in documents.
+
+    The primary key is (wordform_id, document_id), so InnoDB stores the
+    attestations of a wordform together; there is a secondary index on
+    document_id.
+
+    The corpus of the document is stored with the attestation (documents
+    belong to a single corpus), so corpus-scoped queries don't need to go
+    through corpusId_x_documentId. In MySQL, the table can be partitioned by
+    corpus (see `dbutils.partition_text_attestations`); the foreign keys are
+    then only known to SQLAlchemy.
     """
     __tablename__ = 'text_attestations'
 
-    attestation_id = Column(BigInteger(), primary_key=True)
+    wordform_id = Column(BigInteger(), ForeignKey('wordforms.wordform_id'), primary_key=True)
+    document_id = Column(BigInteger(), ForeignKey('documents.document_id'), primary_key=True,
+                         index=True)
     frequency = Column(BigInteger())
-    wordform_id = Column(BigInteger(), ForeignKey('wordforms.wordform_id'))
-    document_id = Column(BigInteger(), ForeignKey('documents.document_id'))
+    corpus_id = Column(BigInteger())
 
     ta_document = relationship('Document', back_populates='document_wordforms')
     ta_wordform = relationship('Wordform', back_populates='wordform_documents')
@@ -340,6 +352,26 @@ class WordformFrequencies(Base):
     frequency = Column(BigInteger())
 
 
+class WordformStats(Base):
+    """Materialized view containing statistics of the wordforms in morphological paradigms
+
+    The statistics (number of corpora and lexica a wordform occurs in, the
+    range of years it is attested in, the number of paradigms it is part of
+    and its total frequency) are aggregated separately per source table, so
+    listing the variants of a lemma does not require joining all these tables
+    at query time.
+    """
+    __tablename__ = 'wordform_stats'
+
+    wordform_id = Column(BigInteger(), primary_key=True)
+    num_corpora = Column(Integer(), nullable=False, default=0)
+    num_lexica = Column(Integer(), nullable=False, default=0)
+    min_year = Column(Integer())
+    max_year = Column(Integer())
+    num_paradigms = Column(Integer(), nullable=False, default=0)
+    frequency = Column(BigInteger(), nullable=False, default=0)
+
+
 class TicclatVariant(Base):
     """Contains spelling variants of words, ingested from TICCL
     """
@@ -351,3 +383,17 @@ class TicclatVariant(Base):
     wordform_source_id = Column(BigInteger(), ForeignKey('wordforms.wordform_id'), index=True)
     levenshtein_distance = Column(BigInteger(), index=True)
     frequency = Column(BigInteger(), index=True)
+
+
+class DatabaseVersion(Base):
+    """Contains the version stamp ("generation") of the data in the database.
+
+    The generation is increased every time data is ingested (see
+    ``dbutils.bump_database_generation``), so caches of query results can be
+    invalidated by comparing generations. The table contains a single row.
+    """
+    __tablename__ = 'database_version'
+
+    database_version_id = Column(BigInteger(), primary_key=True)
+    generation = Column(BigInteger(), nullable=False, default=0)
+    updated_at = Column(DateTime())
@@ -277,3 +277,113 @@ def read_ticcl_variants_file(fname):
     df.columns = ['ocr_variant', 'corpus_frequency', 'correction_candidate',
                   '?1', 'ld', '?2', 'anahash']
     return df
+
+
+class WordformMapping:
+    """Compact mapping of wordforms to wordform ids.
+
+    A dict of millions of wordforms costs well over 100 bytes per entry (the
+    hash table entry and the str and int objects). This mapping only stores
+    two independent 64-bit hashes of each wordform (sorted) and the ids, in
+    numpy arrays: 24 bytes per entry. A wordform that is not in the mapping
+    would only get a wrong id if both its hashes collide with those of
+    another wordform, which in practice doesn't happen.
+
+    Lookups are vectorized: `get_indexer` and `get_ids` map a whole column of
+    wordforms at once. Single wordforms can be looked up like in a dict
+    (``mapping[wordform]``, ``in``), but mapping whole columns is much faster.
+    """
+
+    HASH_KEYS = ('ticclat-wordform', 'wordform-check!!')
+
+    def __init__(self, wordforms, wordform_ids):
+        """Create a mapping of `wordforms` to `wordform_ids` (for duplicate wordforms, the last id is used)."""
+        wordforms = pd.Index(np.asarray(wordforms, dtype=object))
+        wordform_ids = np.asarray(wordform_ids, dtype=np.int64)
+        if len(wordforms) != len(wordform_ids):
+            raise ValueError('wordforms and wordform_ids should have the same length.')
+        unique = ~wordforms.duplicated(keep='last')
+
+        hashes, checks = self._hash(wordforms[unique].to_numpy())
+        order = np.lexsort((checks, hashes))
+        self._hashes = hashes[order]
+        self._checks = checks[order]
+        self._ids = wordform_ids[unique][order]
+
+    @classmethod
+    def from_dict(cls, mapping):
+        """Create a mapping from a dict of wordforms to wordform ids."""
+        return cls(list(mapping.keys()), list(mapping.values()))
+
+    @classmethod
+    def _hash(cls, wordforms):
+        wordforms = np.asarray(wordforms, dtype=object)
+        return tuple(pd.util.hash_array(wordforms, hash_key=key, categorize=False) for key in cls.HASH_KEYS)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the mapping (in bytes)."""
+        return self._hashes.nbytes + self._checks.nbytes + self._ids.nbytes
+
+    def get_indexer(self, wordforms) -> np.ndarray:
+        """Return the positions of `wordforms` in the mapping (-1 for wordforms that are not in it)."""
+        indexer = np.full(len(wordforms), -1, dtype=np.int64)
+        if len(self._ids) == 0 or len(wordforms) == 0:
+            return indexer
+
+        num = len(self._ids)
+        hashes, checks = self._hash(wordforms)
+        start = np.minimum(np.searchsorted(self._hashes, hashes), num - 1)
+        found = (self._hashes[start] == hashes) & (self._checks[start] == checks)
+        indexer[found] = start[found]
+
+        # wordforms with the same first hash are sorted by the second hash
+        collisions = ~found & (self._hashes[start] == hashes) & (start + 1 < num)
+        collisions[collisions] = self._hashes[start[collisions] + 1] == hashes[collisions]
+        for i in np.flatnonzero(collisions).tolist():
+            end = np.searchsorted(self._hashes, hashes[i], side='right')
+            position = start[i] + np.searchsorted(self._checks[start[i]:end], checks[i])
+            if position < end and self._checks[position] == checks[i]:
+                indexer[i] = position
+        return indexer
+
+    def get_ids(self, wordforms, missing=None) -> np.ndarray:
+        """Return the ids of `wordforms`.
+
+        Wordforms that are not in the mapping get id `missing`, or raise a
+        KeyError if `missing` is None.
+        """
+        indexer = self.get_indexer(wordforms)
+        not_found = indexer == -1
+        if not not_found.any():
+            return self._ids[indexer]
+        if missing is None:
+            raise KeyError(np.asarray(wordforms, dtype=object)[not_found][0])
+        ids = np.full(len(indexer), missing, dtype=np.int64)
+        ids[~not_found] = self._ids[indexer[~not_found]]
+        return ids
+
+    def get(self, wordform, default=None):
+        """Return the id of `wordform`, or `default` if it is not in the mapping."""
+        position = self.get_indexer([wordform])[0]
+        return default if position == -1 else int(self._ids[position])
+
+    def __getitem__(self, wordform):
+        return int(self.get_ids([wordform])[0])
+
+    def __contains__(self, wordform):
+        return self.get_indexer([wordform])[0] != -1
+
+    def __len__(self):
+        return len(self._ids)
+
+
+def map_wordforms(wf_mapping, wordforms) -> np.ndarray:
+    """Return the ids of (a column of) `wordforms` in `wf_mapping`.
+
+    `wf_mapping` is a `WordformMapping` or a dict of wordforms to ids.
+    Raises a KeyError for wordforms that are not in the mapping.
+    """
+    if isinstance(wf_mapping, WordformMapping):
+        return wf_mapping.get_ids(wordforms)
+    return np.array([wf_mapping[wordform] for wordform in wordforms], dtype=np.int64)